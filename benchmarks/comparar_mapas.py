@@ -0,0 +1,167 @@
+"""
+Compara pixel por pixel los mapas estatales dibujados con plotly
+y kaleido contra los dibujados directamente con raster.py.
+
+Uso: python -m benchmarks.comparar_mapas --año 2025 --entidades 8 14 --umbral 0.02
+
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import estatal
+import render
+
+
+# La diferencia mínima en algún canal para que un pixel cuente como distinto.
+TOLERANCIA = 32
+
+
+def dibujar(año, entidad, conteos, motor, carpeta):
+    """
+    Dibuja un mapa con el motor especificado y lo guarda en la carpeta.
+
+    Parameters
+    ----------
+    año : int
+        El año que se desea graficar.
+
+    entidad : int
+        La clave de la entidad.
+
+    conteos : pandas.Series
+        Los casos de todo el país de estatal.contar_casos().
+
+    motor : str
+        'plotly' o 'raster'.
+
+    carpeta : str
+        La carpeta donde se guarda la imagen.
+
+    Returns
+    -------
+    tuple
+        La ruta de la imagen y los segundos que tomó dibujarla.
+
+    """
+
+    destino = os.path.join(carpeta, f"{motor}_{año}_{entidad}.png")
+
+    inicio = time.perf_counter()
+
+    directas = len(render._DIRECTAS)
+    pendientes, errores = render.construir(
+        [(estatal.crear_mapa, (año, entidad, conteos, motor))]
+    )
+
+    if errores:
+        raise RuntimeError(next(iter(errores.values())))
+
+    if motor == "plotly":
+        render._escribir(pendientes[0][0], destino)
+    else:
+        # raster.py guarda la imagen en el directorio actual.
+        shutil.move(render._DIRECTAS[directas], destino)
+
+    return destino, time.perf_counter() - inicio
+
+
+def comparar(ruta_a, ruta_b, ruta_diferencia):
+    """
+    Compara dos imágenes del mismo tamaño y guarda sus diferencias.
+
+    Parameters
+    ----------
+    ruta_a, ruta_b : str
+        Las rutas de las imágenes.
+
+    ruta_diferencia : str
+        La ruta de la imagen con la diferencia máxima por pixel,
+        amplificada para que sea visible.
+
+    Returns
+    -------
+    tuple
+        La diferencia absoluta promedio por canal (0-255) y la fracción
+        de pixeles cuya diferencia en algún canal supera TOLERANCIA.
+
+    """
+
+    a = np.asarray(Image.open(ruta_a).convert("RGB"), dtype=np.int16)
+    b = np.asarray(Image.open(ruta_b).convert("RGB"), dtype=np.int16)
+
+    if a.shape != b.shape:
+        raise ValueError(f"Las imágenes miden {a.shape} y {b.shape}.")
+
+    diferencia = np.abs(a - b)
+    maxima = diferencia.max(axis=2)
+
+    Image.fromarray(np.minimum(maxima * 4, 255).astype(np.uint8), "L").save(
+        ruta_diferencia
+    )
+
+    return diferencia.mean(), (maxima > TOLERANCIA).mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--año", type=int, default=2025)
+    parser.add_argument("--entidades", type=int, nargs="+", default=[8])
+    parser.add_argument(
+        "--umbral",
+        type=float,
+        default=None,
+        help="Fracción máxima de pixeles distintos; si se supera, termina con error.",
+    )
+    parser.add_argument("--salida", default="./diferencias")
+
+    args = parser.parse_args()
+
+    os.makedirs(args.salida, exist_ok=True)
+
+    conteos = estatal.contar_casos(args.año)
+    fallidas = list()
+
+    print(
+        f"{'Entidad':<22}{'plotly (s)':>12}{'raster (s)':>12}"
+        f"{'Dif. media':>12}{'Pixeles':>10}"
+    )
+
+    render.iniciar_renderizador()
+
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            for entidad in args.entidades:
+                ruta_plotly, tiempo_plotly = dibujar(
+                    args.año, entidad, conteos, "plotly", carpeta
+                )
+                ruta_raster, tiempo_raster = dibujar(
+                    args.año, entidad, conteos, "raster", carpeta
+                )
+
+                media, fraccion = comparar(
+                    ruta_plotly,
+                    ruta_raster,
+                    os.path.join(args.salida, f"diferencia_{args.año}_{entidad}.png"),
+                )
+
+                print(
+                    f"{estatal.ENTIDADES[entidad]:<22}{tiempo_plotly:>12.3f}"
+                    f"{tiempo_raster:>12.3f}{media:>12.2f}{fraccion:>10.2%}"
+                )
+
+                if args.umbral is not None and fraccion > args.umbral:
+                    fallidas.append(estatal.ENTIDADES[entidad])
+    finally:
+        render.detener_renderizador()
+
+    if fallidas:
+        print(f"Superan el umbral de {args.umbral:.2%}: {', '.join(fallidas)}")
+        sys.exit(1)
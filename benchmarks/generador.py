@@ -0,0 +1,100 @@
+"""
+Genera archivos sintéticos con el mismo formato que los datos de la SSA.
+
+Cada columna se toma al azar de los valores de un archivo real, por lo
+que se conservan los códigos, el formato de las fechas y la frecuencia
+de cada valor. La entidad y el municipio se toman en pares para que la
+distribución de los CVE sea la misma que la del archivo original.
+
+Uso: python -m benchmarks.generador ./sintetico.csv --filas 1000000
+
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# Estas columnas se toman juntas para conservar combinaciones válidas.
+PARES = [
+    ("ENTIDAD_RES", "MUNICIPIO_RES"),
+    ("ENTIDAD_UM_NOTIF", "MUNICIPIO_UM_NOTIF"),
+]
+
+
+def generar(ruta, filas, muestra="./data/2025.csv", semilla=0, bloque=1_000_000):
+    """
+    Escribe un archivo CSV sintético con el número de filas especificado.
+
+    El archivo se escribe por bloques, por lo que la memoria usada
+    no depende del número de filas.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo resultante.
+
+    filas : int
+        El número de registros que tendrá el archivo.
+
+    muestra : str, optional
+        El archivo real del que se toman los valores.
+
+    semilla : int, optional
+        La semilla del generador de números aleatorios.
+
+    bloque : int, optional
+        El número de registros que se escriben a la vez.
+
+    """
+
+    # Leemos todo como texto para copiar los valores tal cual.
+    base = pd.read_csv(muestra, dtype=str, keep_default_na=False)
+
+    rng = np.random.default_rng(semilla)
+
+    emparejadas = {columna for par in PARES for columna in par}
+    id_inicial = int(base["ID_REGISTRO"].astype(int).min())
+
+    escritas = 0
+
+    while escritas < filas:
+        n = min(bloque, filas - escritas)
+
+        df = dict()
+
+        for columna in base.columns:
+            if columna in emparejadas:
+                continue
+
+            valores = base[columna].to_numpy()
+            df[columna] = valores[rng.integers(0, len(valores), n)]
+
+        for par in PARES:
+            filas_base = rng.integers(0, len(base), n)
+
+            for columna in par:
+                df[columna] = base[columna].to_numpy()[filas_base]
+
+        df["ID_REGISTRO"] = np.arange(id_inicial + escritas, id_inicial + escritas + n)
+
+        df = pd.DataFrame(df)[base.columns]
+
+        df.to_csv(
+            ruta, mode="w" if escritas == 0 else "a", header=escritas == 0, index=False
+        )
+
+        escritas += n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("ruta")
+    parser.add_argument("--filas", type=int, default=10_000)
+    parser.add_argument("--muestra", default="./data/2025.csv")
+    parser.add_argument("--semilla", type=int, default=0)
+
+    args = parser.parse_args()
+
+    generar(args.ruta, args.filas, args.muestra, args.semilla)
@@ -0,0 +1,297 @@
+"""
+Mide el tiempo y la memoria de cada etapa de las gráficas
+con archivos sintéticos de distintos tamaños.
+
+Cada tamaño se ejecuta en un proceso nuevo dentro de una carpeta
+temporal, para que los cachés y la memoria de un tamaño no afecten
+al siguiente.
+
+Uso: python -m benchmarks.pipeline --filas 10000 1000000 10000000
+     python -m benchmarks.pipeline --guardar linea_base.json
+     python -m benchmarks.pipeline --comparar linea_base.json
+
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.generador import generar
+
+
+# El año con el que se guarda el archivo sintético.
+AÑO = 2025
+
+# La entidad que se usa para las gráficas estatales.
+ENTIDAD = 8
+
+
+def _reiniciar_rss():
+    """
+    Reinicia el máximo de memoria residente del proceso.
+    Solo funciona en Linux; en otros sistemas el máximo es acumulado.
+
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as archivo:
+            archivo.write("5")
+    except OSError:
+        pass
+
+
+def _rss_maximo():
+    """
+    Regresa el máximo de memoria residente del proceso en MB.
+
+    Returns
+    -------
+    float
+        La memoria en MB.
+
+    """
+
+    try:
+        with open("/proc/self/status", "r") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS reporta bytes y Linux kilobytes.
+    return maximo / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _medir(resultados, etapa, filas, funcion, *argumentos):
+    """
+    Ejecuta una función y guarda su tiempo, su rendimiento
+    y el máximo de memoria residente.
+
+    Parameters
+    ----------
+    resultados : dict
+        El diccionario donde se guardan los resultados.
+
+    etapa : str
+        El nombre de la etapa.
+
+    filas : int
+        El número de registros procesados, para calcular el rendimiento.
+
+    funcion : callable
+        La función que se desea medir.
+
+    Returns
+    -------
+    object
+        Lo que regresa la función.
+
+    """
+
+    _reiniciar_rss()
+
+    inicio = time.perf_counter()
+    resultado = funcion(*argumentos)
+    segundos = time.perf_counter() - inicio
+
+    resultados[etapa] = {
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos if segundos > 0 else None,
+        "rss_mb": _rss_maximo(),
+    }
+
+    return resultado
+
+
+def _ejecutar(filas, raiz, exportar):
+    """
+    Genera un archivo sintético y mide todas las etapas.
+    Esta función se ejecuta en un proceso nuevo.
+
+    Parameters
+    ----------
+    filas : int
+        El número de registros del archivo sintético.
+
+    raiz : str
+        La carpeta del repositorio, de donde se toman la muestra
+        y los archivos de población.
+
+    exportar : bool
+        Si es True, también se mide la exportación con kaleido.
+
+    Returns
+    -------
+    dict
+        Los resultados de cada etapa.
+
+    """
+
+    sys.path.insert(0, raiz)
+
+    import conteos
+    import cubo
+    import datos
+    import estatal
+    import poblacion
+    import render
+    import script
+
+    resultados = dict()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.makedirs(os.path.join(carpeta, "data"))
+        os.symlink(os.path.join(raiz, "assets"), os.path.join(carpeta, "assets"))
+
+        _medir(
+            resultados,
+            "generar",
+            filas,
+            generar,
+            os.path.join(carpeta, "data", f"{AÑO}.csv"),
+            filas,
+            os.path.join(raiz, "data", f"{AÑO}.csv"),
+        )
+
+        os.chdir(carpeta)
+
+        _medir(resultados, "carga_csv", filas, datos.cargar_casos, AÑO)
+
+        # La segunda carga viene de la copia procesada en el caché.
+        datos._CASOS.clear()
+        _medir(resultados, "carga_cache", filas, datos.cargar_casos, AÑO)
+
+        _medir(resultados, "cubo", filas, cubo.cargar_cubo, AÑO)
+        _medir(resultados, "poblacion", filas, poblacion._indice)
+        _medir(resultados, "curva_semanal", filas, conteos.curva_semanal, [AÑO])
+
+        tareas = [
+            (script.tsas_edad_sexo, (AÑO,)),
+            (script.evolucion_casos, (AÑO,)),
+            (script.tendencia, (AÑO,)),
+            (script.crear_tabla_absolutos, (AÑO,)),
+            (estatal.crear_tabla_absolutos, (AÑO, ENTIDAD)),
+        ]
+
+        if os.path.exists(f"./assets/{estatal.ENTIDADES[ENTIDAD]}.json"):
+            tareas.append((estatal.crear_mapa, (AÑO, ENTIDAD)))
+
+        # Cada figura se construye y se serializa, pero no se exporta.
+        pendientes = list()
+
+        for funcion, argumentos in tareas:
+            etapa = f"{funcion.__module__}.{funcion.__name__}"
+
+            especificaciones, errores = _medir(
+                resultados,
+                etapa,
+                filas,
+                render.construir,
+                [(funcion, argumentos)],
+            )
+
+            if errores:
+                resultados[etapa]["error"] = list(errores.values())[0]
+
+            pendientes.extend(especificaciones)
+
+        if exportar:
+            render.iniciar_renderizador()
+
+            for spec, ruta in pendientes:
+                _medir(
+                    resultados,
+                    f"exportar_{os.path.basename(ruta)}",
+                    filas,
+                    render._escribir,
+                    spec,
+                    ruta,
+                )
+
+            render.detener_renderizador()
+
+    return resultados
+
+
+def comparar(actual, base):
+    """
+    Imprime la razón entre el tiempo actual y el de la línea base
+    de cada etapa.
+
+    Parameters
+    ----------
+    actual : dict
+        Los resultados actuales por número de filas.
+
+    base : dict
+        Los resultados de la línea base por número de filas.
+
+    """
+
+    for filas, etapas in actual.items():
+        if filas not in base:
+            continue
+
+        print(f"\n{int(filas):,} filas")
+        print(f"{'Etapa':<40}{'Base':>10}{'Actual':>10}{'Razón':>10}")
+
+        for etapa, medicion in etapas.items():
+            if etapa not in base[filas]:
+                continue
+
+            razon = medicion["segundos"] / base[filas][etapa]["segundos"]
+
+            print(
+                f"{etapa:<40}{base[filas][etapa]['segundos']:>10.3f}"
+                f"{medicion['segundos']:>10.3f}{razon:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--exportar", action="store_true")
+    parser.add_argument("--guardar", default=None)
+    parser.add_argument("--comparar", default=None)
+
+    args = parser.parse_args()
+
+    raiz = os.path.abspath(".")
+    contexto = multiprocessing.get_context("spawn")
+
+    # Las llaves son texto para que coincidan con las del archivo JSON.
+    resultados = dict()
+
+    for filas in args.filas:
+        with contexto.Pool(1) as pool:
+            resultados[str(filas)] = pool.apply(_ejecutar, (filas, raiz, args.exportar))
+
+        print(f"\n{filas:,} filas")
+        print(f"{'Etapa':<40}{'Segundos':>10}{'Filas/s':>14}{'RSS (MB)':>10}")
+
+        for etapa, medicion in resultados[str(filas)].items():
+            rendimiento = medicion["filas_por_segundo"] or 0
+
+            print(
+                f"{etapa:<40}{medicion['segundos']:>10.3f}"
+                f"{rendimiento:>14,.0f}{medicion['rss_mb']:>10.1f}"
+            )
+
+            if "error" in medicion:
+                print(medicion["error"])
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=4)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as archivo:
+            comparar(resultados, json.load(archivo))
@@ -0,0 +1,93 @@
+"""
+Compara el tiempo de exportación de cada tipo de gráfica
+con un navegador de kaleido nuevo por imagen (en frío) y con
+un navegador persistente (en caliente).
+
+Uso: python -m benchmarks.renderizador --año 2025 --repeticiones 3
+
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import render
+
+
+def medir(pendientes, repeticiones, persistente):
+    """
+    Mide el tiempo de exportación de cada figura.
+
+    Parameters
+    ----------
+    pendientes : list
+        Una lista de tuplas (especificación JSON, ruta).
+
+    repeticiones : int
+        Cuántas veces se exporta cada figura.
+
+    persistente : bool
+        Si es True, se usa un solo navegador para todas las exportaciones.
+
+    Returns
+    -------
+    dict
+        Los tiempos en segundos agrupados por tipo de gráfica.
+
+    """
+
+    tiempos = dict()
+
+    if persistente:
+        render.iniciar_renderizador()
+
+        # La primera exportación incluye el arranque del navegador.
+        render._escribir(*pendientes[0])
+
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            for spec, ruta in pendientes:
+                # El tipo de gráfica es el nombre del archivo sin año ni entidad.
+                tipo = os.path.basename(ruta).split("_20")[0]
+                destino = os.path.join(carpeta, os.path.basename(ruta))
+
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    render._escribir(spec, destino)
+                    tiempos.setdefault(tipo, list()).append(
+                        time.perf_counter() - inicio
+                    )
+    finally:
+        if persistente:
+            render.detener_renderizador()
+
+    return tiempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--año", type=int, default=2025)
+    parser.add_argument("--entidades", type=int, nargs="+", default=[8])
+    parser.add_argument("--repeticiones", type=int, default=3)
+
+    args = parser.parse_args()
+
+    pendientes, errores = render.construir(
+        render.tareas_completas([args.año], args.entidades)
+    )
+
+    for nombre in errores:
+        print(f"No se pudo construir {nombre}.")
+
+    frio = medir(pendientes, args.repeticiones, persistente=False)
+    caliente = medir(pendientes, args.repeticiones, persistente=True)
+
+    print(f"{'Gráfica':<12}{'Frío (s)':>12}{'Caliente (s)':>15}{'Aceleración':>14}")
+
+    for tipo in frio:
+        a = statistics.median(frio[tipo])
+        b = statistics.median(caliente[tipo])
+
+        print(f"{tipo:<12}{a:>12.3f}{b:>15.3f}{a / b:>13.1f}x")
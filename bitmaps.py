@@ -0,0 +1,304 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datos import CACHE_DIR, cargar_casos, huella_casos
+from perfil import perfilar
+
+
+# Las columnas codificadas con pocos valores distintos. Cada valor
+# de cada columna tiene un bitmap con un bit por registro.
+COLUMNAS = [
+    "DIAGNOSTICO",
+    "SEXO",
+    "VACUNACION",
+    "COMPLICACIONES",
+    "DEFUNCION",
+    "ENTIDAD_RES",
+    "INSTITUCION_NOTIF",
+    "ORIGEN_CASO",
+]
+
+# El número de bits encendidos de cada byte posible.
+_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Los índices que ya fueron cargados durante esta ejecución.
+_INDICES = dict()
+
+
+@perfilar
+def _construir_indice(año, ruta_bitmaps, ruta_meta):
+    """
+    Crea un bitmap por cada valor de cada columna de COLUMNAS, con
+    ocho registros por byte gracias a np.packbits(), y los guarda
+    en una sola matriz.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    ruta_bitmaps : str
+        La ruta del archivo .npy con la matriz de bitmaps.
+
+    ruta_meta : str
+        La ruta del archivo JSON con los valores de cada fila de la matriz.
+
+    """
+
+    df = cargar_casos(año)
+
+    bitmaps = list()
+    valores = dict()
+
+    for columna in COLUMNAS:
+        # Los valores nulos tienen el código -1 y no reciben bitmap.
+        codigos, unicos = pd.factorize(df[columna], sort=True)
+
+        valores[columna] = [int(valor) for valor in unicos]
+
+        for codigo in range(len(unicos)):
+            bitmaps.append(np.packbits(codigos == codigo))
+
+    # Un año sin registros, o solo con nulos, no tiene ningún bitmap.
+    if not bitmaps:
+        bitmaps = [np.zeros((0, (len(df) + 7) // 8), dtype=np.uint8)]
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    np.save(ruta_bitmaps, np.vstack(bitmaps))
+
+    meta = {
+        "sha256": huella_casos(año),
+        "columnas": COLUMNAS,
+        "filas": len(df),
+        "valores": valores,
+    }
+
+    with open(ruta_meta, "w", encoding="utf-8") as archivo:
+        json.dump(meta, archivo)
+
+
+def cargar_indice(año):
+    """
+    Regresa el índice de bitmaps del año especificado.
+
+    El índice se construye una sola vez por cada versión del archivo
+    de datos y se guarda en CACHE_DIR. La matriz se abre como memory map,
+    por lo que solo se leen los bitmaps que se consultan.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    dict
+        Un diccionario con la matriz de bitmaps, el número de registros
+        y la fila de la matriz de cada valor de cada columna.
+
+    """
+
+    if año in _INDICES:
+        return _INDICES[año]
+
+    ruta_bitmaps = os.path.join(CACHE_DIR, f"bitmaps_{año}.npy")
+    ruta_meta = os.path.join(CACHE_DIR, f"bitmaps_{año}.json")
+
+    sha = huella_casos(año)
+    meta = None
+
+    if os.path.exists(ruta_bitmaps) and os.path.exists(ruta_meta):
+        with open(ruta_meta, "r", encoding="utf-8") as archivo:
+            meta = json.load(archivo)
+
+    if meta is None or meta["sha256"] != sha or meta["columnas"] != COLUMNAS:
+        _construir_indice(año, ruta_bitmaps, ruta_meta)
+
+        with open(ruta_meta, "r", encoding="utf-8") as archivo:
+            meta = json.load(archivo)
+
+    # Las filas de la matriz siguen el orden de COLUMNAS y de sus valores.
+    filas = dict()
+    fila = 0
+
+    for columna in COLUMNAS:
+        filas[columna] = dict()
+
+        for valor in meta["valores"][columna]:
+            filas[columna][valor] = fila
+            fila += 1
+
+    _INDICES[año] = {
+        "bitmaps": np.load(ruta_bitmaps, mmap_mode="r"),
+        "registros": meta["filas"],
+        "filas": filas,
+    }
+
+    return _INDICES[año]
+
+
+def _mascara(indice, filtros):
+    """
+    Combina los bitmaps de los filtros especificados.
+
+    Los valores de una misma columna se unen con OR y las distintas
+    columnas se intersectan con AND.
+
+    Parameters
+    ----------
+    indice : dict
+        El índice que regresa cargar_indice().
+
+    filtros : dict
+        Las columnas y el valor o la lista de valores aceptados.
+
+    Returns
+    -------
+    numpy.ndarray
+        El bitmap resultante como arreglo de uint8.
+
+    """
+
+    bitmaps = indice["bitmaps"]
+
+    # Sin filtros, todos los registros son aceptados. Los bits sobrantes
+    # del último byte ya son cero en todos los bitmaps.
+    mascara = np.full(bitmaps.shape[1], 255, dtype=np.uint8)
+
+    for columna, valores in filtros.items():
+        if columna not in indice["filas"]:
+            raise KeyError(f"La columna {columna} no tiene índice de bitmaps.")
+
+        if np.isscalar(valores):
+            valores = [valores]
+
+        filas = [
+            indice["filas"][columna][valor]
+            for valor in valores
+            if valor in indice["filas"][columna]
+        ]
+
+        if filas:
+            mascara &= np.bitwise_or.reduce(bitmaps[filas], axis=0)
+        else:
+            mascara[:] = 0
+
+    return mascara
+
+
+def _contar_bits(bitmap):
+    """
+    Cuenta los bits encendidos de un bitmap.
+
+    Parameters
+    ----------
+    bitmap : numpy.ndarray
+        El bitmap como arreglo de uint8.
+
+    Returns
+    -------
+    int
+        El número de bits encendidos.
+
+    """
+
+    return int(_BITS[bitmap].sum(dtype=np.int64))
+
+
+def contar(año, **filtros):
+    """
+    Cuenta los registros que cumplen con todos los filtros.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    **filtros
+        Las columnas de COLUMNAS y el valor o la lista de valores
+        aceptados, por ejemplo DIAGNOSTICO=1.
+
+    Returns
+    -------
+    int
+        El número de registros.
+
+    Examples
+    --------
+    >>> contar(2025, DIAGNOSTICO=1, SEXO=1, ENTIDAD_RES=[8, 9])
+
+    """
+
+    indice = cargar_indice(año)
+
+    if not filtros:
+        return indice["registros"]
+
+    return _contar_bits(_mascara(indice, filtros))
+
+
+def contar_por(año, columna, **filtros):
+    """
+    Cuenta los registros que cumplen con todos los filtros
+    por cada valor de una columna.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    columna : str
+        La columna de COLUMNAS por la que se desea agrupar.
+
+    **filtros
+        Las columnas de COLUMNAS y el valor o la lista de valores aceptados.
+
+    Returns
+    -------
+    pandas.Series
+        El número de registros con el valor de la columna como índice.
+        Los valores sin registros se omiten.
+
+    """
+
+    indice = cargar_indice(año)
+    mascara = _mascara(indice, filtros)
+
+    valores = list(indice["filas"][columna])
+    filas = list(indice["filas"][columna].values())
+
+    totales = _BITS[indice["bitmaps"][filas] & mascara].sum(axis=1, dtype=np.int64)
+
+    conteos = pd.Series(totales, index=pd.Index(valores, name=columna), name="total")
+
+    return conteos[conteos > 0]
+
+
+def seleccionar(año, **filtros):
+    """
+    Regresa los registros que cumplen con todos los filtros.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    **filtros
+        Las columnas de COLUMNAS y el valor o la lista de valores aceptados.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los registros del DataFrame que regresa cargar_casos().
+
+    """
+
+    indice = cargar_indice(año)
+
+    filas = np.unpackbits(_mascara(indice, filtros), count=indice["registros"])
+
+    return cargar_casos(año)[filas.astype(bool)]
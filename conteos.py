@@ -0,0 +1,352 @@
+import numpy as np
+import pandas as pd
+
+from datos import leer_bloques
+from fechas import fecha_semana_lunes
+from perfil import perfilar
+
+
+# Los nombres de cada valor de la columna SEXO.
+SEXOS = {1: "mujeres", 2: "hombres"}
+
+
+def _edad(df, unidad):
+    """
+    Regresa la edad de cada registro en la unidad especificada.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame con los registros.
+
+    unidad : str
+        'años' o 'meses'.
+
+    Returns
+    -------
+    numpy.ndarray
+        La edad de cada registro como entero.
+
+    """
+
+    años = df["EDAD_ANOS"].to_numpy(dtype=np.int32)
+
+    if unidad == "años":
+        return años
+    elif unidad == "meses":
+        # Los días no alcanzan a completar un mes, por lo que no se suman.
+        return años * 12 + df["EDAD_MESES"].to_numpy(dtype=np.int32)
+
+    raise ValueError(f"Unidad de edad desconocida: {unidad}")
+
+
+@perfilar
+def histograma_edad_sexo(
+    df, grupos, etiquetas=None, unidad="años", por=None, pesos=None
+):
+    """
+    Cuenta los registros por grupo de edad y sexo en una sola pasada.
+
+    Cada registro se asigna a su grupo de edad con una búsqueda binaria
+    sobre los límites inferiores y después se cuentan todas las
+    combinaciones con un solo np.bincount.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame con los registros.
+
+    grupos : list
+        Una lista de tuplas (a, b) ordenadas con los límites inclusivos
+        de cada grupo de edad.
+
+    etiquetas : list, optional
+        El nombre de cada grupo de edad. Por defecto se usa 'a-b'.
+
+    unidad : str, optional
+        La unidad de los límites de los grupos: 'años' o 'meses'.
+
+    por : list, optional
+        Columnas adicionales por las que se desea agrupar, por ejemplo
+        ['ENTIDAD_RES']. Cada combinación que aparece en los datos
+        tendrá su propio conjunto de grupos de edad.
+
+    pesos : str, optional
+        Una columna con el número de registros que representa cada fila,
+        por ejemplo la columna 'total' del cubo de conteos.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un DataFrame con una columna por sexo ('mujeres' y 'hombres').
+        El índice son las etiquetas de edad o, si se especificó 'por',
+        un MultiIndex con esas columnas y la etiqueta de edad.
+
+    """
+
+    if etiquetas is None:
+        etiquetas = [f"{a}-{b}" for a, b in grupos]
+
+    inferiores = np.array([a for a, _ in grupos])
+    superiores = np.array([b for _, b in grupos])
+
+    edad = _edad(df, unidad)
+
+    # Buscamos el último grupo cuyo límite inferior es menor o igual a la edad.
+    # Si la edad queda fuera de ese grupo se marca como -1.
+    grupo = np.searchsorted(inferiores, edad, side="right") - 1
+    grupo[(grupo < 0) | (edad > superiores[grupo.clip(0)])] = -1
+
+    # Los sexos 1 y 2 se convierten en 0 y 1.
+    sexo = df["SEXO"].to_numpy(dtype=np.int32) - 1
+    valido = (grupo >= 0) & ((sexo == 0) | (sexo == 1))
+
+    # Convertimos cada combinación de las columnas adicionales
+    # en un solo código entero.
+    if por:
+        codigos, niveles = pd.MultiIndex.from_frame(df[por]).factorize(sort=True)
+        n_niveles = len(niveles)
+    else:
+        codigos = np.zeros(len(df), dtype=np.int64)
+        niveles = None
+        n_niveles = 1
+
+    # Los registros con valores vacíos en las columnas adicionales se descartan.
+    valido &= codigos >= 0
+
+    n_grupos = len(grupos)
+
+    llave = (codigos[valido] * n_grupos + grupo[valido]) * 2 + sexo[valido]
+
+    # Cada fila cuenta como un registro, a menos que se especifiquen pesos.
+    if pesos is not None:
+        pesos = df[pesos].to_numpy()[valido]
+
+    conteos = np.bincount(llave, weights=pesos, minlength=n_niveles * n_grupos * 2)
+    conteos = conteos.astype(np.int64).reshape(-1, 2)
+
+    if por:
+        indice = pd.MultiIndex.from_tuples(
+            [(*nivel, etiqueta) for nivel in niveles for etiqueta in etiquetas],
+            names=[*por, "edad"],
+        )
+    else:
+        indice = pd.Index(etiquetas, name="edad")
+
+    return pd.DataFrame(conteos, index=indice, columns=list(SEXOS.values()))
+
+
+@perfilar
+def curva_semanal(años, tamaño_bloque=100_000):
+    """
+    Cuenta los registros por semana de diagnóstico y diagnóstico
+    de varios años, leyendo los archivos por bloques.
+
+    Solo se conservan en memoria el bloque actual y los conteos
+    acumulados, por lo que el consumo de memoria no depende del
+    tamaño de los archivos.
+
+    Parameters
+    ----------
+    años : list
+        Los años que se desean incluir.
+
+    tamaño_bloque : int, optional
+        El número de registros que se leen a la vez.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por semana, desde la primera hasta la última,
+        y una columna por cada valor de DIAGNOSTICO.
+
+    """
+
+    conteos = np.zeros((0, 0), dtype=np.int64)
+    inicio = None
+
+    for año in años:
+        for bloque in leer_bloques(
+            año, ["FECHA_DIAGNOSTICO", "DIAGNOSTICO"], tamaño_bloque
+        ):
+            # Las fechas inválidas tienen la semana -1 y se omiten.
+            semana = bloque["SEMANA_LUNES"].to_numpy()
+            valido = semana >= 0
+
+            semana = semana[valido].astype(np.int64)
+            diagnostico = bloque["DIAGNOSTICO"].to_numpy()[valido].astype(np.int64)
+
+            if len(semana) == 0:
+                continue
+
+            # Ampliamos la matriz acumulada si el bloque tiene semanas
+            # o diagnósticos que no habíamos visto.
+            nuevo_inicio = semana.min() if inicio is None else min(inicio, semana.min())
+            fin = max(semana.max() + 1, nuevo_inicio + len(conteos))
+            columnas = max(diagnostico.max() + 1, conteos.shape[1])
+
+            temp = np.zeros((fin - nuevo_inicio, columnas), dtype=np.int64)
+
+            if inicio is not None:
+                desfase = inicio - nuevo_inicio
+                temp[desfase : desfase + len(conteos), : conteos.shape[1]] = conteos
+
+            conteos, inicio = temp, nuevo_inicio
+
+            # Contamos cada combinación de semana y diagnóstico con un solo bincount.
+            llave = (semana - inicio) * columnas + diagnostico
+            conteos += np.bincount(llave, minlength=conteos.size).reshape(conteos.shape)
+
+    df = pd.DataFrame(
+        conteos,
+        index=fecha_semana_lunes(np.arange(inicio, inicio + len(conteos))),
+    )
+
+    # Solo conservamos los diagnósticos que aparecen en los datos.
+    return df.loc[:, df.sum() > 0]
+
+
+@perfilar
+def flujo(df, columnas, valores=None, pesos=None):
+    """
+    Calcula todos los nodos de un diagrama de flujo en el que cada
+    nivel divide los registros según una columna codificada.
+
+    Todos los conteos salen de una sola agrupación por las columnas
+    especificadas, sin importar cuántos niveles tenga el diagrama.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame con los registros.
+
+    columnas : list
+        Las columnas en el orden de los niveles del diagrama,
+        por ejemplo ['VACUNACION', 'COMPLICACIONES', 'DEFUNCION'].
+
+    valores : dict, optional
+        Los códigos conocidos de cada columna, en el orden en que
+        se mostrarán. Estos nodos se crean aunque no tengan registros.
+        Cualquier otro código se agrupa en un nodo con el valor None.
+        Las columnas que no aparecen usan los códigos de los datos.
+
+    pesos : str, optional
+        Una columna con el número de registros que representa cada fila,
+        por ejemplo la columna 'total' del cubo de conteos.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por nodo, ordenada por nivel, con las columnas 'nivel',
+        'ruta' (una tupla con el código de cada nivel, la raíz es ()) y
+        'total'.
+
+    """
+
+    if valores is None:
+        valores = dict()
+
+    temp = pd.DataFrame(index=df.index)
+
+    # Los códigos desconocidos se convierten en valores vacíos
+    # para que queden en su propio grupo.
+    for columna in columnas:
+        serie = df[columna].astype("Int16")
+
+        if columna in valores:
+            serie = serie.where(serie.isin(valores[columna]))
+
+        temp[columna] = serie
+
+    if pesos is None:
+        hojas = temp.groupby(columnas, dropna=False).size()
+    else:
+        temp["total"] = df[pesos]
+        hojas = temp.groupby(columnas, dropna=False)["total"].sum()
+
+    totales = {(): 0}
+
+    # Sumamos cada combinación en todos sus nodos ancestros.
+    for llave, total in hojas.items():
+        if not isinstance(llave, tuple):
+            llave = (llave,)
+
+        llave = tuple(None if pd.isna(valor) else int(valor) for valor in llave)
+
+        for nivel in range(len(llave) + 1):
+            totales[llave[:nivel]] = totales.get(llave[:nivel], 0) + int(total)
+
+    # Agregamos los nodos de los códigos conocidos que no tuvieron registros.
+    rutas = [()]
+
+    for columna in columnas:
+        # Solo podemos enumerar los niveles cuyos códigos conocemos.
+        if columna not in valores:
+            break
+
+        rutas = [(*ruta, valor) for ruta in rutas for valor in valores[columna]]
+
+        for ruta in rutas:
+            totales.setdefault(ruta, 0)
+
+    # Ordenamos los nodos por nivel y después por el orden de los códigos.
+    # Los códigos desconocidos van al final.
+    def orden(ruta):
+        llave = list()
+
+        for columna, valor in zip(columnas, ruta):
+            conocidos = valores.get(columna, [])
+
+            if valor is None:
+                llave.append((2, 0))
+            elif valor in conocidos:
+                llave.append((0, conocidos.index(valor)))
+            else:
+                llave.append((1, valor))
+
+        return (len(ruta), llave)
+
+    rutas = sorted(totales, key=orden)
+
+    return pd.DataFrame(
+        {
+            "nivel": [len(ruta) for ruta in rutas],
+            "ruta": rutas,
+            "total": [totales[ruta] for ruta in rutas],
+        }
+    )
+
+
+def sankey(nodos):
+    """
+    Convierte los nodos de flujo() en los enlaces de un diagrama sankey.
+
+    Los nodos se pueden filtrar antes de llamar a esta función.
+    Los enlaces hacia nodos cuyo padre fue quitado se omiten.
+
+    Parameters
+    ----------
+    nodos : pandas.DataFrame
+        Los nodos que regresa flujo().
+
+    Returns
+    -------
+    tuple
+        Las listas de origen, destino y valor de cada enlace.
+        Los índices corresponden a la posición de cada nodo.
+
+    """
+
+    posicion = {ruta: i for i, ruta in enumerate(nodos["ruta"])}
+
+    fuente = list()
+    destino = list()
+    valor = list()
+
+    for i, (ruta, total) in enumerate(zip(nodos["ruta"], nodos["total"])):
+        if ruta and ruta[:-1] in posicion:
+            fuente.append(posicion[ruta[:-1]])
+            destino.append(i)
+            valor.append(total)
+
+    return fuente, destino, valor
@@ -0,0 +1,275 @@
+import json
+import os
+
+import pandas as pd
+
+from datos import CACHE_DIR, cargar_casos, huella_casos
+from fechas import fecha_semana_lunes
+from perfil import perfilar
+
+
+# Las dimensiones del cubo. Cada combinación de valores
+# que aparece en los datos es una celda con su total de registros.
+DIMENSIONES = [
+    "AÑO",
+    "SEMANA",
+    "ENTIDAD_RES",
+    "CVE",
+    "SEXO",
+    "EDAD_ANOS",
+    "DIAGNOSTICO",
+    "VACUNACION",
+    "COMPLICACIONES",
+    "DEFUNCION",
+]
+
+# Los cubos que ya fueron cargados durante esta ejecución.
+_CUBOS = dict()
+
+
+def _agrupar(df, año):
+    """
+    Agrupa los registros especificados por todas las dimensiones.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Los registros con el esquema aplicado.
+
+    año : int
+        El año al que pertenecen los registros.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por cada celda no vacía con las dimensiones
+        y la columna 'total'.
+
+    """
+
+    df = df.copy(deep=False)
+
+    df["AÑO"] = año
+
+    # Cada semana inicia en lunes y se identifica por la fecha de ese lunes.
+    df["SEMANA"] = fecha_semana_lunes(df["SEMANA_LUNES"]).where(
+        df["SEMANA_LUNES"].to_numpy() >= 0
+    )
+
+    # Las fechas inválidas se conservan como NaT para no perder esos registros.
+    cubo = df.groupby(DIMENSIONES, dropna=False, observed=True).size()
+
+    cubo = cubo.astype("int32").to_frame("total").reset_index()
+
+    # La columna del año no necesita 64 bits.
+    cubo["AÑO"] = cubo["AÑO"].astype("int16")
+
+    return cubo
+
+
+@perfilar
+def _construir_cubo(año):
+    """
+    Agrupa los registros del año especificado por todas las dimensiones.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por cada celda no vacía con las dimensiones
+        y la columna 'total'.
+
+    """
+
+    return _agrupar(cargar_casos(año), año)
+
+
+def _guardar_cubo(año, cubo, sha):
+    """
+    Guarda el cubo en CACHE_DIR junto con el hash del archivo
+    de datos del que proviene.
+
+    Parameters
+    ----------
+    año : int
+        El año del cubo.
+
+    cubo : pandas.DataFrame
+        El cubo de conteos.
+
+    sha : str
+        El hash SHA-256 del archivo de datos.
+
+    """
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cubo.to_pickle(os.path.join(CACHE_DIR, f"cubo_{año}.pkl"))
+
+    with open(
+        os.path.join(CACHE_DIR, f"cubo_{año}.json"), "w", encoding="utf-8"
+    ) as archivo:
+        json.dump({"sha256": sha, "dimensiones": DIMENSIONES}, archivo)
+
+    _CUBOS[año] = cubo
+
+
+def cargar_cubo(año):
+    """
+    Regresa el cubo de conteos del año especificado.
+
+    El cubo se construye una sola vez por cada versión del archivo
+    de datos y se guarda en CACHE_DIR.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por cada celda no vacía con las dimensiones
+        y la columna 'total'.
+
+    """
+
+    if año in _CUBOS:
+        return _CUBOS[año]
+
+    sha = huella_casos(año)
+    cubo = cubo_guardado(año, sha)
+
+    if cubo is None:
+        cubo = _construir_cubo(año)
+        _guardar_cubo(año, cubo, sha)
+
+    _CUBOS[año] = cubo
+
+    return cubo
+
+
+def cubo_guardado(año, sha):
+    """
+    Regresa el cubo que está en CACHE_DIR si fue construido
+    a partir del archivo con el hash especificado.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    sha : str
+        El hash SHA-256 del archivo de datos esperado.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El cubo de conteos, o None si no existe o no corresponde.
+
+    """
+
+    ruta_cubo = os.path.join(CACHE_DIR, f"cubo_{año}.pkl")
+    ruta_meta = os.path.join(CACHE_DIR, f"cubo_{año}.json")
+
+    if not os.path.exists(ruta_cubo) or not os.path.exists(ruta_meta):
+        return None
+
+    with open(ruta_meta, "r", encoding="utf-8") as archivo:
+        meta = json.load(archivo)
+
+    if meta["sha256"] != sha or meta["dimensiones"] != DIMENSIONES:
+        return None
+
+    return pd.read_pickle(ruta_cubo)
+
+
+@perfilar
+def actualizar_cubo(año, cubo, agregados, quitados, sha):
+    """
+    Aplica los registros agregados y quitados a un cubo existente
+    sin volver a agrupar todos los registros del año.
+
+    Parameters
+    ----------
+    año : int
+        El año del cubo.
+
+    cubo : pandas.DataFrame
+        El cubo construido con la versión anterior de los datos.
+
+    agregados : pandas.DataFrame
+        Los registros nuevos o la versión nueva de los registros actualizados.
+
+    quitados : pandas.DataFrame
+        Los registros eliminados o la versión anterior de los actualizados.
+
+    sha : str
+        El hash SHA-256 del archivo de datos nuevo.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El cubo actualizado, igual al que se obtendría con _construir_cubo().
+
+    """
+
+    restar = _agrupar(quitados, año)
+    restar["total"] = -restar["total"]
+
+    cubo = pd.concat([cubo, _agrupar(agregados, año), restar], ignore_index=True)
+
+    cubo = cubo.groupby(DIMENSIONES, dropna=False, observed=True)["total"].sum()
+
+    # Las celdas que se quedaron sin registros se eliminan.
+    cubo = cubo[cubo != 0].astype("int32").to_frame("total").reset_index()
+    cubo["AÑO"] = cubo["AÑO"].astype("int16")
+
+    _guardar_cubo(año, cubo, sha)
+
+    return cubo
+
+
+@perfilar
+def consultar(cubo, por=None, **filtros):
+    """
+    Filtra el cubo y suma los totales por las dimensiones especificadas.
+
+    Parameters
+    ----------
+    cubo : pandas.DataFrame
+        El cubo que regresa cargar_cubo().
+
+    por : list, optional
+        Las dimensiones por las que se desea agrupar. Si no se
+        especifica, se regresa la suma total.
+
+    **filtros
+        Las dimensiones que se desean filtrar y el valor o la lista
+        de valores aceptados, por ejemplo DIAGNOSTICO=1.
+
+    Returns
+    -------
+    pandas.Series or int
+        Los totales por cada combinación de las dimensiones de 'por'
+        o la suma total si no se especificó 'por'.
+
+    Examples
+    --------
+    >>> consultar(cubo, ["CVE"], DIAGNOSTICO=1, ENTIDAD_RES=8)
+
+    """
+
+    for dimension, valor in filtros.items():
+        if isinstance(valor, (list, tuple, set)):
+            cubo = cubo[cubo[dimension].isin(valor)]
+        else:
+            cubo = cubo[cubo[dimension] == valor]
+
+    if not por:
+        return int(cubo["total"].sum())
+
+    return cubo.groupby(por, observed=True)["total"].sum()
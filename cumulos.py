@@ -0,0 +1,875 @@
+"""
+Busca cúmulos de casos confirmados con la estadística de escaneo de Kulldorff.
+
+El escaneo espacial compara los casos de cada grupo de municipios vecinos
+contra los que se esperarían según su población (modelo de Poisson).
+El escaneo espacio-temporal busca cilindros de municipios y semanas con
+más casos de los esperados según la distribución de los casos en el
+tiempo y en el espacio (modelo de permutaciones), por lo que no
+necesita la población.
+
+La significancia se obtiene con simulaciones de Monte Carlo, que se
+calculan por bloques de forma vectorizada y se pueden repartir entre
+varios procesos.
+
+Uso: python sarampion.py cumulos --año 2025 --jobs 4
+     python sarampion.py cumulos --año 2025 --espacio-tiempo --prospectivo
+
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cubo import cargar_cubo, consultar
+from datos import CACHE_DIR
+from estatal import ENTIDADES, contar_casos
+from fechas import fecha_semana_lunes, semana_lunes
+from geometria import ASSETS_DIR, _fuentes_nacionales, centroides
+from perfil import perfilar
+from poblacion import poblacion_municipios
+
+
+# El radio medio de la Tierra en kilómetros.
+RADIO_TIERRA = 6371.0
+
+# El número de simulaciones de cada bloque. Los bloques tienen una semilla
+# propia, por lo que el resultado no depende del número de procesos.
+BLOQUE_SIMULACIONES = 25
+
+# El número máximo de elementos de los arreglos de cada lote de
+# simulaciones. Con enteros de 64 bits son unos 160 MB.
+ELEMENTOS_LOTE = 20_000_000
+
+# Los índices de vecinos que ya fueron cargados durante esta ejecución.
+_INDICES = dict()
+
+# Los arreglos que comparten las simulaciones de cada proceso.
+_DATOS = dict()
+
+
+def _nombres():
+    """
+    Regresa los nombres de las entidades de las que tenemos el GeoJSON.
+
+    """
+
+    return [
+        nombre
+        for clave, nombre in ENTIDADES.items()
+        if clave != 99 and os.path.exists(os.path.join(ASSETS_DIR, f"{nombre}.json"))
+    ]
+
+
+def _distancias(longitud, latitud, longitud0, latitud0):
+    """
+    Regresa la distancia en kilómetros sobre la superficie de la Tierra
+    entre cada punto y el punto de referencia.
+
+    """
+
+    longitud, latitud = np.radians(longitud), np.radians(latitud)
+    longitud0, latitud0 = np.radians(longitud0), np.radians(latitud0)
+
+    a = (
+        np.sin((latitud - latitud0) / 2) ** 2
+        + np.cos(latitud) * np.cos(latitud0) * np.sin((longitud - longitud0) / 2) ** 2
+    )
+
+    return 2 * RADIO_TIERRA * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+@perfilar
+def _construir_indice(nombres, ruta_cache):
+    """
+    Calcula el centroide de cada municipio y ordena los demás municipios
+    de cada uno por su distancia, y guarda el resultado en un archivo .npz.
+
+    """
+
+    tabla = centroides(nombres).dropna()
+
+    longitud = tabla["longitud"].to_numpy()
+    latitud = tabla["latitud"].to_numpy()
+
+    distancias = _distancias(
+        longitud[None, :], latitud[None, :], longitud[:, None], latitud[:, None]
+    )
+
+    # Con menos de 32,768 municipios las posiciones caben en 16 bits.
+    orden = np.argsort(distancias, axis=1, kind="stable")
+    orden = orden.astype(np.int16 if len(tabla) < 2**15 else np.int32)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    np.savez(
+        ruta_cache,
+        cves=tabla.index.to_numpy(dtype=np.int32),
+        longitud=longitud,
+        latitud=latitud,
+        orden=orden,
+        fuentes=_fuentes_nacionales(nombres),
+    )
+
+
+def indice_vecinos(nombres=None):
+    """
+    Regresa el índice de vecinos de todos los municipios: su centroide
+    y los demás municipios ordenados del más cercano al más lejano.
+
+    El índice se calcula a partir de los GeoJSON una sola vez y se guarda
+    en CACHE_DIR hasta que alguno de ellos cambie.
+
+    Parameters
+    ----------
+    nombres : list, optional
+        Los nombres de los archivos GeoJSON de cada entidad. Por defecto,
+        todas las entidades de las que tenemos el GeoJSON.
+
+    Returns
+    -------
+    dict
+        Los arreglos 'cves', 'longitud', 'latitud' y 'orden', donde cada
+        fila de 'orden' tiene las posiciones de todos los municipios,
+        empezando por el mismo municipio.
+
+    """
+
+    if nombres is None:
+        nombres = _nombres()
+
+    llave = tuple(nombres)
+
+    if llave in _INDICES:
+        return _INDICES[llave]
+
+    ruta_cache = os.path.join(CACHE_DIR, "vecinos.npz")
+    fuentes = _fuentes_nacionales(nombres)
+
+    vigente = False
+
+    if os.path.exists(ruta_cache):
+        with np.load(ruta_cache) as cache:
+            vigente = str(cache["fuentes"]) == fuentes
+
+    if not vigente:
+        _construir_indice(nombres, ruta_cache)
+
+    with np.load(ruta_cache) as cache:
+        _INDICES[llave] = {
+            nombre: cache[nombre] for nombre in ["cves", "longitud", "latitud", "orden"]
+        }
+
+    return _INDICES[llave]
+
+
+def _subindice(indice, cves):
+    """
+    Restringe el índice de vecinos a los municipios especificados.
+
+    Parameters
+    ----------
+    indice : dict
+        El índice de indice_vecinos().
+
+    cves : numpy.ndarray
+        Los CVE de los municipios, todos presentes en el índice.
+
+    Returns
+    -------
+    tuple
+        La longitud y la latitud de cada municipio y la matriz con
+        el orden de sus vecinos, con posiciones dentro de 'cves'.
+
+    """
+
+    posiciones = pd.Index(indice["cves"]).get_indexer(cves)
+
+    seleccionados = np.zeros(len(indice["cves"]), dtype=bool)
+    seleccionados[posiciones] = True
+
+    # Cada fila tiene a todos los municipios, así que al quitar los que
+    # no nos interesan quedan exactamente len(cves) en cada una.
+    filas = indice["orden"][posiciones]
+    filas = filas[seleccionados[filas]].reshape(len(posiciones), len(posiciones))
+
+    nuevas = np.full(len(indice["cves"]), -1, dtype=np.int32)
+    nuevas[posiciones] = np.arange(len(posiciones))
+
+    return (
+        indice["longitud"][posiciones],
+        indice["latitud"][posiciones],
+        nuevas[filas],
+    )
+
+
+def _llr(casos, esperados, total):
+    """
+    Calcula el logaritmo del cociente de verosimilitudes de Poisson de
+    cada ventana. Solo buscamos cúmulos de riesgo alto, por lo que las
+    ventanas sin más casos que los esperados valen cero.
+
+    Parameters
+    ----------
+    casos : numpy.ndarray
+        Los casos observados dentro de cada ventana.
+
+    esperados : numpy.ndarray
+        Los casos esperados dentro de cada ventana.
+
+    total : int
+        El total de casos.
+
+    Returns
+    -------
+    numpy.ndarray
+        El logaritmo del cociente de cada ventana.
+
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dentro = casos * np.log(casos / esperados)
+        fuera = (total - casos) * np.log((total - casos) / (total - esperados))
+
+    # Si todos los casos están dentro de la ventana, el segundo término es cero.
+    fuera = np.where(casos < total, fuera, 0)
+
+    return np.where(casos > esperados, dentro + fuera, 0)
+
+
+def _mejores_intervalos(
+    acumulados, totales_zona, semanas, total, longitud_maxima, prospectivo
+):
+    """
+    Busca el intervalo de semanas con el mayor cociente de verosimilitudes
+    de cada ventana espacial, con el modelo de permutaciones.
+
+    Parameters
+    ----------
+    acumulados : numpy.ndarray
+        Los casos acumulados en el tiempo de cada ventana espacial, con las
+        dimensiones lote × centro × vecinos × (semanas + 1), empezando en cero.
+
+    totales_zona : numpy.ndarray
+        Los casos de todo el periodo de cada ventana espacial.
+
+    semanas : numpy.ndarray
+        Los casos acumulados de todo el país en cada semana, empezando en cero.
+
+    total : int
+        El total de casos.
+
+    longitud_maxima : int
+        El número máximo de semanas de un intervalo.
+
+    prospectivo : bool
+        Si es True, solo se consideran los intervalos que terminan
+        en la última semana.
+
+    Returns
+    -------
+    tuple
+        El mayor cociente de cada ventana, la longitud y la última
+        semana de su intervalo, con las dimensiones lote × centro × vecinos.
+
+    """
+
+    periodo = acumulados.shape[-1] - 1
+
+    mejor = np.zeros(acumulados.shape[:-1])
+    mejor_longitud = np.zeros(acumulados.shape[:-1], dtype=np.int64)
+    mejor_fin = np.zeros(acumulados.shape[:-1], dtype=np.int64)
+
+    for longitud in range(1, longitud_maxima + 1):
+        # La posición j corresponde al intervalo de la semana j a la j + longitud - 1.
+        if prospectivo:
+            inicios = np.array([periodo - longitud])
+        else:
+            inicios = np.arange(periodo - longitud + 1)
+
+        casos = acumulados[..., inicios + longitud] - acumulados[..., inicios]
+        esperados = (
+            totales_zona[..., None] * (semanas[inicios + longitud] - semanas[inicios])
+        ) / total
+
+        llr = _llr(casos, esperados, total)
+
+        posicion = llr.argmax(axis=-1)
+        valor = np.take_along_axis(llr, posicion[..., None], axis=-1)[..., 0]
+
+        mejora = valor > mejor
+
+        mejor = np.where(mejora, valor, mejor)
+        mejor_longitud = np.where(mejora, longitud, mejor_longitud)
+        mejor_fin = np.where(mejora, inicios[posicion] + longitud - 1, mejor_fin)
+
+    return mejor, mejor_longitud, mejor_fin
+
+
+def _maximos_poisson(rng, simulaciones):
+    """
+    Simula la distribución de los casos según la población y regresa
+    el mayor cociente de verosimilitudes de cada simulación.
+
+    """
+
+    orden = _DATOS["orden"]
+    total = _DATOS["total"]
+
+    lote = max(1, ELEMENTOS_LOTE // orden.size)
+    maximos = list()
+
+    for inicio in range(0, simulaciones, lote):
+        tamaño = min(lote, simulaciones - inicio)
+
+        casos = rng.multinomial(total, _DATOS["probabilidades"], size=tamaño)
+        acumulados = casos[:, orden].cumsum(axis=2)
+
+        llr = np.where(
+            _DATOS["validas"], _llr(acumulados, _DATOS["esperados"], total), 0
+        )
+        maximos.append(llr.reshape(tamaño, -1).max(axis=1))
+
+    return np.concatenate(maximos)
+
+
+def _maximos_permutaciones(rng, simulaciones):
+    """
+    Permuta las semanas de los casos entre sí, conservando los totales
+    por municipio y por semana, y regresa el mayor cociente de
+    verosimilitudes de cada simulación.
+
+    """
+
+    orden = _DATOS["orden"]
+    zonas = _DATOS["zonas"]
+    semanas = _DATOS["semanas"]
+    periodo = _DATOS["periodo"]
+
+    celdas = len(orden) * periodo
+
+    lote = max(1, ELEMENTOS_LOTE // (orden.size * (periodo + 1)))
+    maximos = list()
+
+    for inicio in range(0, simulaciones, lote):
+        tamaño = min(lote, simulaciones - inicio)
+
+        permutadas = rng.permuted(np.tile(semanas, (tamaño, 1)), axis=1)
+
+        # Contamos los casos por simulación, municipio y semana con un solo bincount.
+        llave = (
+            np.arange(tamaño)[:, None] * celdas + zonas[None, :] * periodo + permutadas
+        )
+        matriz = np.bincount(llave.ravel(), minlength=tamaño * celdas)
+        matriz = matriz.reshape(tamaño, len(orden), periodo)
+
+        acumulados = matriz[:, orden].cumsum(axis=2).cumsum(axis=3)
+        acumulados = np.pad(acumulados, ((0, 0), (0, 0), (0, 0), (1, 0)))
+
+        llr = _mejores_intervalos(
+            acumulados,
+            _DATOS["totales_zona"],
+            _DATOS["acumulado_semanas"],
+            len(semanas),
+            _DATOS["longitud_maxima"],
+            _DATOS["prospectivo"],
+        )[0]
+
+        llr = np.where(_DATOS["validas"], llr, 0)
+        maximos.append(llr.reshape(tamaño, -1).max(axis=1))
+
+    return np.concatenate(maximos)
+
+
+def _iniciar(datos):
+    """
+    Guarda los arreglos de las simulaciones en cada proceso del pool.
+
+    """
+
+    _DATOS.clear()
+    _DATOS.update(datos)
+
+
+def _simular(semilla, simulaciones):
+    """
+    Ejecuta un bloque de simulaciones con los arreglos de _DATOS.
+    Esta función se ejecuta dentro de los procesos del pool.
+
+    """
+
+    rng = np.random.default_rng(semilla)
+
+    if _DATOS["modelo"] == "poisson":
+        return _maximos_poisson(rng, simulaciones)
+
+    return _maximos_permutaciones(rng, simulaciones)
+
+
+@perfilar
+def _montecarlo(datos, simulaciones, jobs, semilla):
+    """
+    Reparte las simulaciones en bloques entre varios procesos.
+
+    Parameters
+    ----------
+    datos : dict
+        Los arreglos que necesitan las simulaciones y el 'modelo'.
+
+    simulaciones : int
+        El número total de simulaciones.
+
+    jobs : int
+        El número de procesos.
+
+    semilla : int
+        La semilla del generador de números aleatorios.
+
+    Returns
+    -------
+    numpy.ndarray
+        El mayor cociente de verosimilitudes de cada simulación.
+
+    """
+
+    bloques = [
+        min(BLOQUE_SIMULACIONES, simulaciones - inicio)
+        for inicio in range(0, simulaciones, BLOQUE_SIMULACIONES)
+    ]
+    semillas = np.random.SeedSequence(semilla).spawn(len(bloques))
+
+    # Con un solo proceso no vale la pena crear el pool.
+    if jobs <= 1:
+        _iniciar(datos)
+
+        try:
+            maximos = [_simular(*bloque) for bloque in zip(semillas, bloques)]
+        finally:
+            _DATOS.clear()
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_iniciar, initargs=(datos,)
+        ) as pool:
+            maximos = list(pool.map(_simular, semillas, bloques))
+
+    return np.concatenate(maximos) if maximos else np.array([])
+
+
+def _seleccionar(llr, orden, maximo):
+    """
+    Elige las ventanas con mayor cociente de verosimilitudes que no
+    comparten municipios con las ventanas elegidas antes.
+
+    Parameters
+    ----------
+    llr : numpy.ndarray
+        El cociente de cada ventana con las dimensiones centro × vecinos.
+
+    orden : numpy.ndarray
+        Los vecinos de cada centro.
+
+    maximo : int
+        El número máximo de ventanas.
+
+    Returns
+    -------
+    list
+        Una tupla (centro, último vecino) por ventana, de mayor a menor.
+
+    """
+
+    disponibles = llr.copy()
+    usados = np.zeros(len(orden), dtype=bool)
+    elegidas = list()
+
+    while len(elegidas) < maximo:
+        centro, vecino = np.unravel_index(disponibles.argmax(), disponibles.shape)
+
+        if disponibles[centro, vecino] <= 0:
+            break
+
+        elegidas.append((centro, vecino))
+        usados[orden[centro, : vecino + 1]] = True
+
+        # Descartamos las ventanas que incluyen algún municipio ya usado.
+        disponibles[np.logical_or.accumulate(usados[orden], axis=1)] = 0
+
+    return elegidas
+
+
+def _tabla(elegidas, orden, cves, longitud, latitud, llr, maximos, columnas):
+    """
+    Arma la tabla de resultados de las ventanas elegidas.
+
+    Parameters
+    ----------
+    columnas : dict
+        Las columnas propias de cada escaneo, con un valor por ventana.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por cúmulo, de mayor a menor cociente.
+
+    """
+
+    filas = list()
+
+    for numero, (centro, vecino) in enumerate(elegidas):
+        miembros = orden[centro, : vecino + 1]
+
+        filas.append(
+            {
+                "centro": int(cves[centro]),
+                "municipios": len(miembros),
+                "radio_km": _distancias(
+                    longitud[miembros[-1]],
+                    latitud[miembros[-1]],
+                    longitud[centro],
+                    latitud[centro],
+                ),
+                **{nombre: valores[numero] for nombre, valores in columnas.items()},
+                "llr": llr[centro, vecino],
+                # La prueba incluye a los datos observados como una simulación más.
+                "p_valor": (1 + (maximos >= llr[centro, vecino]).sum())
+                / (len(maximos) + 1),
+                "cves": sorted(int(cve) for cve in cves[miembros]),
+            }
+        )
+
+    tabla = pd.DataFrame(filas)
+    tabla.index = pd.RangeIndex(1, len(tabla) + 1, name="cumulo")
+
+    return tabla
+
+
+def _zonas(cves, entidades):
+    """
+    Regresa los CVE del índice de vecinos que pertenecen a las entidades
+    especificadas, o todos si no se especifican.
+
+    """
+
+    if entidades is None:
+        return cves
+
+    return cves[np.isin(cves // 1000, entidades)]
+
+
+@perfilar
+def escaneo_espacial(
+    año,
+    entidades=None,
+    fraccion=0.5,
+    simulaciones=999,
+    jobs=1,
+    semilla=0,
+    maximo=10,
+):
+    """
+    Busca los grupos de municipios vecinos con una tasa de incidencia
+    significativamente mayor que la del resto, con el modelo de Poisson.
+
+    Cada ventana es un municipio con sus vecinos más cercanos, hasta
+    que su población supera la fracción especificada de la población total.
+    Los casos de municipios sin población o sin geometría no se consideran.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    entidades : list, optional
+        Las entidades donde se buscan los cúmulos. Por defecto, todas
+        las entidades de las que tenemos el GeoJSON.
+
+    fraccion : float, optional
+        La fracción máxima de la población dentro de una ventana.
+
+    simulaciones : int, optional
+        El número de simulaciones de Monte Carlo.
+
+    jobs : int, optional
+        El número de procesos entre los que se reparten las simulaciones.
+
+    semilla : int, optional
+        La semilla del generador de números aleatorios.
+
+    maximo : int, optional
+        El número máximo de cúmulos. Los cúmulos no comparten municipios.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por cúmulo con el CVE de su municipio central, su número
+        de municipios, su radio, sus casos observados y esperados, el riesgo
+        relativo, el cociente de verosimilitudes, su valor p y la lista de
+        CVE de sus municipios.
+
+    """
+
+    indice = indice_vecinos()
+
+    poblacion = poblacion_municipios(año)
+    poblacion = poblacion[poblacion > 0]
+
+    cves = _zonas(indice["cves"], entidades)
+    cves = cves[np.isin(cves, poblacion.index)]
+
+    longitud, latitud, orden = _subindice(indice, cves)
+
+    casos = contar_casos(año).reindex(cves, fill_value=0).to_numpy(dtype=np.int64)
+    poblacion = poblacion.reindex(cves).to_numpy(dtype=np.float64)
+
+    total = int(casos.sum())
+
+    if total == 0:
+        raise ValueError(f"No hay casos confirmados en {año} en la región.")
+
+    # La población acumulada de cada ventana decide cuántos vecinos se usan.
+    acumulada = poblacion[orden].cumsum(axis=1)
+    validas = acumulada <= fraccion * poblacion.sum()
+
+    vecinos = max(int(validas.sum(axis=1).max()), 1)
+
+    orden = orden[:, :vecinos]
+    validas = validas[:, :vecinos]
+    esperados = total * acumulada[:, :vecinos] / poblacion.sum()
+
+    observados = casos[orden].cumsum(axis=1)
+    llr = np.where(validas, _llr(observados, esperados, total), 0)
+
+    maximos = _montecarlo(
+        {
+            "modelo": "poisson",
+            "orden": orden,
+            "esperados": esperados,
+            "validas": validas,
+            "probabilidades": poblacion / poblacion.sum(),
+            "total": total,
+        },
+        simulaciones,
+        jobs,
+        semilla,
+    )
+
+    elegidas = _seleccionar(llr, orden, maximo)
+
+    casos_cumulo = np.array([observados[ventana] for ventana in elegidas])
+    esperados_cumulo = np.array([esperados[ventana] for ventana in elegidas])
+
+    return _tabla(
+        elegidas,
+        orden,
+        cves,
+        longitud,
+        latitud,
+        llr,
+        maximos,
+        {
+            "casos": casos_cumulo,
+            "esperados": esperados_cumulo,
+            "riesgo_relativo": (casos_cumulo / esperados_cumulo)
+            / ((total - casos_cumulo) / (total - esperados_cumulo)),
+        },
+    )
+
+
+@perfilar
+def escaneo_espacio_tiempo(
+    año,
+    entidades=None,
+    fraccion=0.5,
+    semanas=None,
+    prospectivo=False,
+    simulaciones=999,
+    jobs=1,
+    semilla=0,
+    maximo=10,
+):
+    """
+    Busca los brotes: grupos de municipios vecinos con más casos de los
+    esperados durante un intervalo de semanas, con el modelo de
+    permutaciones espacio-temporal.
+
+    Los casos esperados de cada cilindro se obtienen de los totales por
+    municipio y por semana, por lo que solo se consideran los municipios
+    con casos y no se necesita la población. Cada ventana espacial tiene
+    a lo mucho la fracción especificada del total de casos.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    entidades : list, optional
+        Las entidades donde se buscan los cúmulos. Por defecto, todas
+        las entidades de las que tenemos el GeoJSON.
+
+    fraccion : float, optional
+        La fracción máxima de los casos dentro de una ventana espacial.
+
+    semanas : int, optional
+        El número máximo de semanas de un intervalo. Por defecto,
+        la mitad del periodo con casos.
+
+    prospectivo : bool, optional
+        Si es True, solo se buscan brotes que siguen activos,
+        es decir, que terminan en la última semana con casos.
+
+    simulaciones : int, optional
+        El número de simulaciones de Monte Carlo.
+
+    jobs : int, optional
+        El número de procesos entre los que se reparten las simulaciones.
+
+    semilla : int, optional
+        La semilla del generador de números aleatorios.
+
+    maximo : int, optional
+        El número máximo de cúmulos. Los cúmulos no comparten municipios.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Las mismas columnas de escaneo_espacial(), más el lunes de la
+        primera y de la última semana de cada cúmulo en 'inicio' y 'fin'.
+
+    """
+
+    indice = indice_vecinos()
+
+    conteos = consultar(cargar_cubo(año), ["CVE", "SEMANA"], DIAGNOSTICO=1)
+    conteos = conteos[conteos > 0]
+
+    numeros = semana_lunes(
+        pd.Series(conteos.index.get_level_values("SEMANA"))
+    ).to_numpy(dtype=np.int64)
+
+    cves_casos = conteos.index.get_level_values("CVE").to_numpy(dtype=np.int64)
+
+    cves = _zonas(indice["cves"], entidades)
+    cves = cves[np.isin(cves, cves_casos)]
+
+    seleccion = np.isin(cves_casos, cves) & (numeros >= 0)
+
+    if not seleccion.any():
+        raise ValueError(f"No hay casos confirmados en {año} en la región.")
+
+    longitud, latitud, orden = _subindice(indice, cves)
+
+    primera = numeros[seleccion].min()
+    periodo = int(numeros[seleccion].max() - primera + 1)
+
+    if semanas is None:
+        semanas = max(periodo // 2, 1)
+
+    semanas = min(semanas, periodo)
+
+    # La matriz de casos por municipio y semana.
+    matriz = np.zeros((len(cves), periodo), dtype=np.int64)
+    np.add.at(
+        matriz,
+        (
+            pd.Index(cves).get_indexer(cves_casos[seleccion]),
+            numeros[seleccion] - primera,
+        ),
+        conteos.to_numpy(dtype=np.int64)[seleccion],
+    )
+
+    total = int(matriz.sum())
+
+    # Los casos de todo el periodo de cada ventana espacial deciden
+    # cuántos vecinos se usan.
+    acumulada = matriz.sum(axis=1)[orden].cumsum(axis=1)
+    validas = acumulada <= fraccion * total
+
+    vecinos = max(int(validas.sum(axis=1).max()), 1)
+
+    orden = orden[:, :vecinos]
+    validas = validas[:, :vecinos]
+    totales_zona = acumulada[:, :vecinos]
+
+    acumulado_semanas = np.concatenate([[0], matriz.sum(axis=0).cumsum()])
+
+    acumulados = matriz[orden].cumsum(axis=1).cumsum(axis=2)
+    acumulados = np.pad(acumulados, ((0, 0), (0, 0), (1, 0)))
+
+    llr, longitudes, fines = _mejores_intervalos(
+        acumulados[None],
+        totales_zona,
+        acumulado_semanas,
+        total,
+        semanas,
+        prospectivo,
+    )
+    llr = np.where(validas, llr[0], 0)
+
+    # Cada caso es un municipio y una semana; las simulaciones
+    # permutan las semanas entre los casos.
+    zonas, semanas_casos = np.nonzero(matriz)
+    repeticiones = matriz[zonas, semanas_casos]
+
+    maximos = _montecarlo(
+        {
+            "modelo": "permutaciones",
+            "orden": orden,
+            "zonas": np.repeat(zonas, repeticiones),
+            "semanas": np.repeat(semanas_casos, repeticiones),
+            "periodo": periodo,
+            "totales_zona": totales_zona,
+            "acumulado_semanas": acumulado_semanas,
+            "validas": validas,
+            "longitud_maxima": semanas,
+            "prospectivo": prospectivo,
+        },
+        simulaciones,
+        jobs,
+        semilla,
+    )
+
+    elegidas = _seleccionar(llr, orden, maximo)
+
+    inicios = list()
+    finales = list()
+    casos_cumulo = list()
+    esperados_cumulo = list()
+
+    for centro, vecino in elegidas:
+        fin = fines[0, centro, vecino]
+        inicio = fin - longitudes[0, centro, vecino] + 1
+
+        inicios.append(primera + inicio)
+        finales.append(primera + fin)
+
+        casos_cumulo.append(
+            acumulados[centro, vecino, fin + 1] - acumulados[centro, vecino, inicio]
+        )
+        esperados_cumulo.append(
+            totales_zona[centro, vecino]
+            * (acumulado_semanas[fin + 1] - acumulado_semanas[inicio])
+            / total
+        )
+
+    casos_cumulo = np.array(casos_cumulo)
+    esperados_cumulo = np.array(esperados_cumulo)
+
+    return _tabla(
+        elegidas,
+        orden,
+        cves,
+        longitud,
+        latitud,
+        llr,
+        maximos,
+        {
+            "inicio": fecha_semana_lunes(inicios),
+            "fin": fecha_semana_lunes(finales),
+            "casos": casos_cumulo,
+            "esperados": esperados_cumulo,
+            "riesgo_relativo": (casos_cumulo / esperados_cumulo)
+            / ((total - casos_cumulo) / (total - esperados_cumulo)),
+        },
+    )
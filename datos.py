@@ -0,0 +1,632 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from fechas import (
+    convertir_fechas,
+    semana_epidemiologica,
+    semana_iso,
+    semana_lunes,
+)
+from perfil import perfilar
+
+
+# Carpeta donde guardaremos las copias ya procesadas de cada dataset.
+CACHE_DIR = "./cache"
+
+# Carpeta con las particiones por año del archivo nacional comprimido,
+# creadas con ingesta.ingerir_zip(). Cada columna de cada año se guarda
+# en su propio archivo binario.
+PARTICIONES_DIR = "./data/particiones"
+
+# Esta versión se guarda junto con cada copia procesada. Si el esquema
+# cambia, debemos incrementarla para que las copias anteriores se descarten.
+VERSION_ESQUEMA = 3
+
+# El esquema de los conjuntos de datos de la SSA.
+# Las columnas codificadas se leen con el tipo entero más pequeño
+# que puede contener todos sus valores. Las columnas que pueden tener
+# valores vacíos usan los tipos enteros que aceptan nulos de pandas.
+ESQUEMA = {
+    "FECHA_ACTUALIZACION": "fecha",
+    "ID_REGISTRO": "int32",
+    "EDAD_ANOS": "int8",
+    "EDAD_MESES": "int8",
+    "EDAD_DIAS": "int8",
+    "SEXO": "int8",
+    "HABLA_LENGUA_INDIG": "int8",
+    "INDIGENA": "int8",
+    "ENTIDAD_UM_NOTIF": "int8",
+    "MUNICIPIO_UM_NOTIF": "int16",
+    "ENTIDAD_RES": "int8",
+    "MUNICIPIO_RES": "int16",
+    "INSTITUCION_NOTIF": "int8",
+    "VACUNACION": "int8",
+    "EXANTEMA": "int8",
+    "FIEBRE": "Int8",
+    "COMPLICACIONES": "int8",
+    "DEFUNCION": "int8",
+    "DIAGNOSTICO": "int8",
+    "CRITERIO_DIAGNOSTICO": "int8",
+    "FECHA_DIAGNOSTICO": "fecha",
+    "ORIGEN_CASO": "Int8",
+}
+
+# Los DataFrames que ya fueron cargados durante esta ejecución.
+_CASOS = dict()
+
+
+def _huella(ruta):
+    """
+    Calcula la huella de un archivo: su tamaño, su fecha
+    de modificación y el hash SHA-256 de su contenido.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo.
+
+    Returns
+    -------
+    dict
+        Un diccionario con las llaves 'tamaño', 'mtime' y 'sha256'.
+
+    """
+
+    estado = os.stat(ruta)
+
+    sha = hashlib.sha256()
+
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            sha.update(bloque)
+
+    return {
+        "esquema": VERSION_ESQUEMA,
+        "tamaño": estado.st_size,
+        "mtime": estado.st_mtime_ns,
+        "sha256": sha.hexdigest(),
+    }
+
+
+def _tipos(columnas=None):
+    """
+    Regresa los tipos con los que pd.read_csv() debe leer cada columna.
+
+    Parameters
+    ----------
+    columnas : list, optional
+        Las columnas que se van a leer. Por defecto, todas las del esquema.
+
+    Returns
+    -------
+    dict
+        Un diccionario con el nombre de cada columna y su tipo.
+
+    """
+
+    if columnas is None:
+        columnas = list(ESQUEMA)
+
+    # Las fechas se leen como texto y se convierten después.
+    return {
+        columna: str if ESQUEMA[columna] == "fecha" else ESQUEMA[columna]
+        for columna in columnas
+    }
+
+
+def _aplicar_esquema(df):
+    """
+    Convierte las columnas de fecha y agrega las columnas de semanas
+    y CVE a un DataFrame leído con los tipos de _tipos().
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame recién leído.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El mismo DataFrame con las columnas convertidas.
+
+    """
+
+    # Algunos años usan el formato DD/MM/AAAA y otros AAAA-MM-DD.
+    # Las fechas inválidas, como 9999-99-99, se convierten en NaT.
+    # Las fechas de las particiones ya vienen convertidas.
+    for columna in df.columns:
+        if ESQUEMA.get(columna) == "fecha" and not pd.api.types.is_datetime64_dtype(
+            df[columna]
+        ):
+            df[columna] = convertir_fechas(df[columna])
+
+    # Precalculamos las semanas de la fecha de diagnóstico para poder
+    # agrupar por semana con enteros en lugar de fechas.
+    if "FECHA_DIAGNOSTICO" in df.columns:
+        df["SEMANA_EPI"] = semana_epidemiologica(df["FECHA_DIAGNOSTICO"])
+        df["SEMANA_ISO"] = semana_iso(df["FECHA_DIAGNOSTICO"])
+        df["SEMANA_LUNES"] = semana_lunes(df["FECHA_DIAGNOSTICO"])
+
+    # Creamos el CVE para entidad y municipio como un entero.
+    # Por ejemplo, 08017 se guarda como 8017.
+    if "ENTIDAD_RES" in df.columns and "MUNICIPIO_RES" in df.columns:
+        df["CVE"] = df["ENTIDAD_RES"].astype("int32") * 1000 + df["MUNICIPIO_RES"]
+
+    return df
+
+
+@perfilar
+def _leer_csv(ruta):
+    """
+    Lee un archivo CSV de la SSA usando el esquema declarado
+    y agrega la columna CVE.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo CSV.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El DataFrame con los registros del archivo.
+
+    """
+
+    return _aplicar_esquema(pd.read_csv(ruta, dtype=_tipos()))
+
+
+def ruta_fuente(año):
+    """
+    Regresa la ruta del archivo del que se leen los registros del año.
+
+    Si el año tiene una partición creada con ingesta.ingerir_zip(),
+    se usa en lugar de ./data/{año}.csv.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    str
+        La ruta del archivo meta.json de la partición o del archivo CSV.
+
+    """
+
+    ruta_meta = os.path.join(PARTICIONES_DIR, str(año), "meta.json")
+
+    if os.path.exists(ruta_meta):
+        return ruta_meta
+
+    return f"./data/{año}.csv"
+
+
+@perfilar
+def leer_particion(año, columnas=None):
+    """
+    Lee la partición del año especificado y agrega las columnas
+    de semanas y CVE.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa leer.
+
+    columnas : list, optional
+        Las columnas que se desean leer. Por defecto, todas.
+        Solo se leen los archivos de estas columnas.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los registros con los mismos tipos que regresa cargar_casos().
+
+    """
+
+    carpeta = os.path.join(PARTICIONES_DIR, str(año))
+
+    with open(os.path.join(carpeta, "meta.json"), "r", encoding="utf-8") as archivo:
+        meta = json.load(archivo)
+
+    if columnas is None:
+        columnas = list(meta["columnas"])
+
+    datos = dict()
+
+    for columna in columnas:
+        info = meta["columnas"][columna]
+
+        valores = np.fromfile(
+            os.path.join(carpeta, f"{columna}.bin"), dtype=info["dtype"]
+        )
+
+        # Las columnas que aceptan nulos guardan aparte cuáles valores son nulos.
+        if info["nulos"]:
+            nulos = np.fromfile(os.path.join(carpeta, f"{columna}.nulos"), dtype=bool)
+            valores = pd.arrays.IntegerArray(valores, nulos)
+
+        datos[columna] = valores
+
+    return _aplicar_esquema(pd.DataFrame(datos))
+
+
+def leer_bloques(año, columnas=None, tamaño=100_000):
+    """
+    Lee el archivo del año especificado en bloques de registros,
+    sin cargarlo completo en memoria.
+
+    Si el año tiene partición, se leen solo los archivos de las columnas
+    solicitadas y se regresan en bloques del mismo tamaño.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa leer.
+
+    columnas : list, optional
+        Las columnas que se desean leer. Por defecto, todas.
+
+    tamaño : int, optional
+        El número de registros de cada bloque.
+
+    Yields
+    ------
+    pandas.DataFrame
+        Un bloque de registros con el esquema aplicado.
+
+    """
+
+    ruta = ruta_fuente(año)
+
+    if not ruta.endswith(".csv"):
+        df = leer_particion(año, columnas)
+
+        for inicio in range(0, len(df), tamaño):
+            yield df.iloc[inicio : inicio + tamaño]
+
+        return
+
+    with pd.read_csv(
+        ruta,
+        usecols=columnas,
+        dtype=_tipos(columnas),
+        chunksize=tamaño,
+    ) as lector:
+        for bloque in lector:
+            yield _aplicar_esquema(bloque)
+
+
+def reporte_memoria(df):
+    """
+    Calcula cuántos bytes ocupa cada columna del DataFrame
+    y cuántos ocuparía si se hubiera leído sin el esquema.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame que se desea analizar.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una tabla con el tipo, los bytes actuales y los bytes
+        con tipos de 64 bits de cada columna.
+
+    """
+
+    data = list()
+
+    for columna in df.columns:
+        data.append(
+            {
+                "columna": columna,
+                "tipo": str(df[columna].dtype),
+                "bytes": df[columna].memory_usage(index=False, deep=True),
+                "bytes_int64": len(df) * 8,
+            }
+        )
+
+    reporte = pd.DataFrame.from_records(data, index="columna")
+
+    # Agregamos el total de todas las columnas.
+    reporte.loc["Total"] = ["", reporte["bytes"].sum(), reporte["bytes_int64"].sum()]
+
+    return reporte
+
+
+@perfilar
+def cargar_casos(año):
+    """
+    Regresa el DataFrame con los registros del año especificado.
+
+    El CSV, o la partición del año si existe, solo se procesa la primera
+    vez. El resultado se guarda en CACHE_DIR junto con la huella del archivo
+    original y en las siguientes ejecuciones se lee directamente de ahí. Dentro de una
+    misma ejecución, todas las funciones comparten el mismo DataFrame.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa cargar.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una copia superficial del DataFrame del año especificado.
+
+    """
+
+    if año in _CASOS:
+        return _CASOS[año].copy(deep=False)
+
+    ruta = ruta_fuente(año)
+    ruta_cache = os.path.join(CACHE_DIR, f"{año}.pkl")
+    ruta_huella = os.path.join(CACHE_DIR, f"{año}.json")
+
+    estado = os.stat(ruta)
+    huella_guardada = None
+
+    if os.path.exists(ruta_cache) and os.path.exists(ruta_huella):
+        with open(ruta_huella, "r", encoding="utf-8") as archivo:
+            huella_guardada = json.load(archivo)
+
+    df = None
+
+    # Las copias hechas con otra versión del esquema se descartan.
+    if (
+        huella_guardada is not None
+        and huella_guardada.get("esquema") == VERSION_ESQUEMA
+    ):
+        # Si el tamaño y la fecha de modificación coinciden no
+        # es necesario volver a calcular el hash del archivo.
+        if (
+            huella_guardada["tamaño"] == estado.st_size
+            and huella_guardada["mtime"] == estado.st_mtime_ns
+        ):
+            df = pd.read_pickle(ruta_cache)
+        else:
+            huella = _huella(ruta)
+
+            # El archivo fue tocado pero su contenido es el mismo.
+            if huella["sha256"] == huella_guardada["sha256"]:
+                df = pd.read_pickle(ruta_cache)
+
+                if "publicacion" in huella_guardada:
+                    huella["publicacion"] = huella_guardada["publicacion"]
+
+                with open(ruta_huella, "w", encoding="utf-8") as archivo:
+                    json.dump(huella, archivo)
+
+    if df is None:
+        if ruta.endswith(".csv"):
+            df = _leer_csv(ruta)
+        else:
+            df = leer_particion(año)
+
+        guardar_casos(año, df)
+
+    _CASOS[año] = df
+
+    return df.copy(deep=False)
+
+
+def guardar_casos(año, df):
+    """
+    Guarda en CACHE_DIR el DataFrame procesado del año especificado
+    junto con la huella del archivo que está en ./data
+    o de su partición y la fecha de publicación de los datos.
+
+    Parameters
+    ----------
+    año : int
+        El año al que pertenecen los registros.
+
+    df : pandas.DataFrame
+        Los registros con el esquema aplicado.
+
+    """
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df.to_pickle(os.path.join(CACHE_DIR, f"{año}.pkl"))
+
+    huella = _huella(ruta_fuente(año))
+    huella["publicacion"] = _publicacion(df)
+
+    with open(os.path.join(CACHE_DIR, f"{año}.json"), "w", encoding="utf-8") as archivo:
+        json.dump(huella, archivo)
+
+    _CASOS[año] = df
+
+
+def casos_guardados(año):
+    """
+    Regresa el DataFrame procesado que está en CACHE_DIR y su huella,
+    sin verificar que correspondan al archivo actual de ./data.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    tuple
+        El DataFrame y el diccionario de su huella, o None
+        si el año no ha sido procesado con el esquema actual.
+
+    """
+
+    ruta_cache = os.path.join(CACHE_DIR, f"{año}.pkl")
+    ruta_huella = os.path.join(CACHE_DIR, f"{año}.json")
+
+    if not os.path.exists(ruta_cache) or not os.path.exists(ruta_huella):
+        return None
+
+    with open(ruta_huella, "r", encoding="utf-8") as archivo:
+        huella = json.load(archivo)
+
+    if huella.get("esquema") != VERSION_ESQUEMA:
+        return None
+
+    return pd.read_pickle(ruta_cache), huella
+
+
+def desde_texto(df):
+    """
+    Aplica el esquema a un DataFrame leído con todas sus columnas
+    como texto, por ejemplo con pd.read_csv(ruta, dtype=str).
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Los registros como texto. Los valores vacíos deben ser NaN.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los registros con los mismos tipos que regresa cargar_casos().
+
+    """
+
+    df = df.copy()
+
+    for columna, tipo in ESQUEMA.items():
+        if tipo != "fecha":
+            df[columna] = pd.to_numeric(df[columna]).astype(tipo)
+
+    return _aplicar_esquema(df)
+
+
+def fecha_publicacion(fechas):
+    """
+    Regresa la fecha de publicación de un archivo a partir
+    de su columna FECHA_ACTUALIZACION.
+
+    La SSA publica cada archivo el día siguiente a su última
+    actualización, por lo que usamos la fecha más reciente más un día.
+
+    Parameters
+    ----------
+    fechas : pandas.Series
+        La columna FECHA_ACTUALIZACION convertida a datetime64.
+
+    Returns
+    -------
+    pandas.Timestamp
+        La fecha de publicación.
+
+    """
+
+    return fechas.max() + pd.Timedelta(days=1)
+
+
+def _publicacion(df):
+    """
+    Regresa la fecha de publicación de los registros en formato AAAA-MM-DD.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Los registros con el esquema aplicado.
+
+    Returns
+    -------
+    str
+        La fecha de publicación, o None si no hay ninguna fecha de actualización.
+
+    """
+
+    fecha = fecha_publicacion(df["FECHA_ACTUALIZACION"])
+
+    if pd.isna(fecha):
+        return None
+
+    return fecha.strftime("%Y-%m-%d")
+
+
+def fecha_fuente(año):
+    """
+    Regresa la fecha de publicación de los datos del año especificado.
+
+    La fecha se guarda junto con la huella de los datos procesados,
+    por lo que normalmente no es necesario cargar los registros.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    str
+        La fecha en formato DD/MM/AAAA.
+
+    """
+
+    sha = huella_casos(año)
+    ruta_huella = os.path.join(CACHE_DIR, f"{año}.json")
+
+    huella = dict()
+
+    if os.path.exists(ruta_huella):
+        with open(ruta_huella, "r", encoding="utf-8") as archivo:
+            huella = json.load(archivo)
+
+    if huella.get("sha256") == sha and "publicacion" in huella:
+        publicacion = huella["publicacion"]
+    else:
+        publicacion = _publicacion(cargar_casos(año))
+
+        # Las huellas guardadas antes de incluir la fecha se completan.
+        with open(ruta_huella, "r", encoding="utf-8") as archivo:
+            huella = json.load(archivo)
+
+        huella["publicacion"] = publicacion
+
+        with open(ruta_huella, "w", encoding="utf-8") as archivo:
+            json.dump(huella, archivo)
+
+    return pd.Timestamp(publicacion).strftime("%d/%m/%Y")
+
+
+def huella_casos(año):
+    """
+    Regresa el hash SHA-256 del archivo del año especificado.
+    Sirve para saber si los datos derivados de ese archivo
+    siguen vigentes.
+
+    No carga los registros: si el tamaño y la fecha de modificación
+    del archivo coinciden con la huella guardada en CACHE_DIR, se usa
+    su hash; si no, se calcula a partir del archivo.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    str
+        El hash SHA-256 del archivo CSV o del meta.json de su partición.
+
+    """
+
+    ruta = ruta_fuente(año)
+    ruta_huella = os.path.join(CACHE_DIR, f"{año}.json")
+
+    estado = os.stat(ruta)
+
+    if os.path.exists(ruta_huella):
+        with open(ruta_huella, "r", encoding="utf-8") as archivo:
+            huella = json.load(archivo)
+
+        if huella["tamaño"] == estado.st_size and huella["mtime"] == estado.st_mtime_ns:
+            return huella["sha256"]
+
+    return _huella(ruta)["sha256"]
@@ -1,12 +1,21 @@
-import json
+import os
 
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
 
+from cubo import cargar_cubo, consultar
+from datos import fecha_fuente
+from geometria import (
+    cargar_geometria,
+    cargar_nacional,
+    fronteras_estatales,
+    nivel_detalle,
+    seleccionar,
+)
+from perfil import perfilar
+from poblacion import poblacion_municipios, tabla_municipios
+from render import exportar, exportar_imagen
 
-# La fecha del corte de los datos.
-FECHA_FUENTE = "12/06/2025"
 
 # Estos colores serán la paleta para todas las gráficas.
 PLOT_COLOR = "#1A1A1D"
@@ -50,7 +59,89 @@ ENTIDADES = {
 }
 
 
-def crear_mapa(año, entidad):
+@perfilar
+def contar_casos(año):
+    """
+    Cuenta los casos confirmados de sarampión por municipio
+    de residencia de todo el país.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    pandas.Series
+        El número de casos confirmados con el CVE como índice,
+        ordenado de mayor a menor.
+
+    """
+
+    # Cargamos el cubo de conteos del año especificado.
+    cubo = cargar_cubo(año)
+
+    # Contamos los casos confirmados por municipio.
+    conteos = consultar(cubo, ["CVE"], DIAGNOSTICO=1)
+
+    return conteos.sort_values(ascending=False, kind="stable")
+
+
+@perfilar
+def tasas_municipios(año, entidad=None, conteos=None):
+    """
+    Calcula los casos confirmados y la tasa de incidencia
+    de cada municipio con al menos un caso.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    entidad : int, optional
+        Si se especifica, solo se regresan los municipios de esa entidad.
+
+    conteos : pandas.Series, optional
+        Los casos confirmados por CVE de todo el país, como los
+        regresa contar_casos(). Si no se especifica, se calculan.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un DataFrame con las columnas 'total', 'entidad', 'municipio',
+        'poblacion' y 'tasa' y el CVE como índice, ordenado por
+        número de casos de mayor a menor.
+
+    """
+
+    # Cargamos la población por municipio del año especificado.
+    pop = tabla_municipios(año)
+
+    # Contamos los casos confirmados por municipio si no fueron proporcionados.
+    if conteos is None:
+        conteos = contar_casos(año)
+
+    # Seleccionamos solo los municipios de la entidad especificada.
+    if entidad is not None:
+        conteos = conteos[conteos.index // 1000 == entidad]
+
+    df = conteos.to_frame("total")
+
+    # Unimos los DataFrames.
+    df = df.join(pop)
+
+    # Calculamos la tasa por cada 100k habitantes.
+    df["tasa"] = df["total"] / df["poblacion"] * 100000
+
+    # Ordenamos los resultados por número de registros de mayor a menor.
+    # Los empates quedan ordenados por CVE.
+    df = df.sort_index().sort_values("total", ascending=False, kind="stable")
+
+    return df
+
+
+@perfilar
+def crear_mapa(año, entidad, conteos=None, motor="plotly"):
     """
     Genera un mapa choropleth con la incidencia de sarampión
     por municipio de la entidad y año especificados.
@@ -63,47 +154,29 @@ def crear_mapa(año, entidad):
     entidad : int
         La entidad que se desea graficar.
 
-    """
+    conteos : pandas.Series, optional
+        Los casos confirmados por CVE de todo el país, como los
+        regresa contar_casos(). Si no se especifica, se calculan.
 
-    # Cargamos el dataset de población por municipio.
-    pop = pd.read_csv("./assets/poblacion.csv", dtype={"CVE": str}, index_col=0)
-
-    # Renombramos algunos estados a sus nombres más comunes.
-    pop["Entidad"] = pop["Entidad"].replace(
-        {
-            "Coahuila de Zaragoza": "Coahuila",
-            "México": "Estado de México",
-            "Michoacán de Ocampo": "Michoacán",
-            "Veracruz de Ignacio de la Llave": "Veracruz",
-        }
-    )
+    motor : str, optional
+        'plotly' para exportar la figura con kaleido o 'raster' para
+        dibujarla directamente con Pillow (ver raster.py).
 
-    # Seleccionamos solo los municipios de la entidad de nuestro interés.
-    pop = pop[pop["Entidad"] == ENTIDADES[entidad]]
+    """
 
-    # Seleccionamos la población del año especificado.
-    pop = pop[str(año)]
+    # Seleccionamos la población del año especificado
+    # de los municipios de la entidad de nuestro interés.
+    pop = poblacion_municipios(año, entidad)
 
     # Calculamos la población total de la entidad.
     poblacion_total = pop.sum()
 
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv(
-        f"./data/{año}.csv",
-        dtype={"ENTIDAD_RES": str, "MUNICIPIO_RES": str},
-    )
-
-    # Creamos el CVE para entidad y municipio.
-    df["CVE"] = df["ENTIDAD_RES"].str.zfill(2) + df["MUNICIPIO_RES"].str.zfill(3)
+    # Contamos los casos confirmados por municipio si no fueron proporcionados.
+    if conteos is None:
+        conteos = contar_casos(año)
 
-    # Seleccionamos los casos confirmados de sarampión.
-    df = df[df["DIAGNOSTICO"] == 1]
-
-    # Seleccionamos solo los registros de la entidad especificada.
-    df = df[df["ENTIDAD_RES"] == str(entidad)]
-
-    # Contamos los registros por municipio.
-    df = df["CVE"].value_counts().to_frame("total")
+    # Seleccionamos solo los municipios de la entidad especificada.
+    df = conteos[conteos.index // 1000 == entidad].to_frame("total")
 
     # Agregamos la población para cada municipio.
     df["poblacion"] = pop
@@ -142,10 +215,75 @@ def crear_mapa(año, entidad):
     # A la última etiqueta le agregamos el símbolo de 'mayor o igual que'.
     etiquetas[-1] = f"≥{valor_max:,.0f}"
 
-    # Cargamos el archivo GeoJSON de la enitdad especificada.
-    geojson = json.load(
-        open(f"./assets/{ENTIDADES[entidad]}.json", "r", encoding="utf-8")
-    )
+    # Cargamos las geometrías de los municipios de la entidad especificada.
+    geojson = cargar_geometria(ENTIDADES[entidad])
+
+    # Las dos capas comparten los mismos features. La primera solo
+    # necesita los municipios con casos.
+    locations = df.index.astype(str).str.zfill(5)
+
+    # Las anotaciones son las mismas con ambos motores.
+    anotaciones = [
+        dict(
+            x=0.5,
+            y=1.015,
+            xanchor="center",
+            yanchor="top",
+            text=f"Tasas de incidencia de sarampión en <b>{ENTIDADES[entidad]}</b> durante el {año}",
+            font_size=40,
+        ),
+        dict(
+            x=0.06,
+            y=0.48,
+            textangle=-90,
+            xanchor="center",
+            yanchor="middle",
+            text="Tasa bruta por cada 100,000 habitantes",
+        ),
+        dict(
+            x=0.05,
+            y=-0.03,
+            xanchor="left",
+            yanchor="top",
+            text=f"Fuente: SSA ({fecha_fuente(año)})",
+        ),
+        dict(
+            x=0.5,
+            y=-0.03,
+            xanchor="center",
+            yanchor="top",
+            text=subtitulo,
+        ),
+        dict(
+            x=0.96,
+            y=-0.03,
+            xanchor="right",
+            yanchor="top",
+            text="🧁 @lapanquecita",
+        ),
+    ]
+
+    # El motor raster dibuja el mismo mapa con Pillow, sin plotly ni kaleido.
+    if motor == "raster":
+        from raster import dibujar_mapa
+
+        imagen = dibujar_mapa(
+            geojson,
+            df["tasa"].set_axis(locations),
+            pop.index.astype(str).str.zfill(5),
+            valor_min,
+            valor_max,
+            marcas,
+            etiquetas,
+            anotaciones,
+            fondo=PAPER_COLOR,
+        )
+
+        exportar_imagen(imagen, f"./mapa_{año}_{entidad}.png")
+
+        return
+
+    import plotly.graph_objects as go
 
     # Nuestro mapa choropleth tendrá dos capas.
     # La primera mostrará la intensidad de la incidencia
@@ -154,10 +292,9 @@ def crear_mapa(año, entidad):
 
     fig.add_traces(
         go.Choropleth(
-            geojson=geojson,
-            locations=df.index,
+            geojson=seleccionar(geojson, locations),
+            locations=locations,
             z=df["tasa"],
-            featureidkey="properties.CVEGEO",
             colorscale="portland",
             zmin=valor_min,
             zmax=valor_max,
@@ -182,9 +319,8 @@ def crear_mapa(año, entidad):
     fig.add_traces(
         go.Choropleth(
             geojson=geojson,
-            locations=pop.index,
+            locations=pop.index.astype(str).str.zfill(5),
             z=[1 for _ in range(len(pop))],
-            featureidkey="properties.CVEGEO",
             colorscale=["hsla(0,0,0,0)", "hsla(0,0,0,0)"],
             marker_line_color="#FFFFFF",
             marker_line_width=2,
@@ -226,13 +362,171 @@ def crear_mapa(año, entidad):
         width=2000,
         height=2000,
         paper_bgcolor=PAPER_COLOR,
+        annotations=anotaciones,
+    )
+
+    # Nombramos el archivo resultante con los parámetros de la función.
+    exportar(fig, f"./mapa_{año}_{entidad}.png")
+
+
+@perfilar
+def crear_mapa_nacional(año, conteos=None, ancho=3000):
+    """
+    Genera un mapa choropleth con la incidencia de sarampión
+    por municipio de todo el país.
+
+    Las geometrías se simplifican según el ancho de la imagen,
+    sin que las fronteras entre municipios vecinos dejen de coincidir.
+
+    Parameters
+    ----------
+    año : int
+        El año que se desea graficar.
+
+    conteos : pandas.Series, optional
+        Los casos confirmados por CVE de todo el país, como los
+        regresa contar_casos(). Si no se especifica, se calculan.
+
+    ancho : int, optional
+        El ancho de la imagen en pixeles.
+
+    """
+
+    import plotly.graph_objects as go
+
+    # Calculamos la tasa de los municipios con casos.
+    df = tasas_municipios(año, conteos=conteos)
+
+    # Calculamos la tasa de incidencia nacional.
+    total_casos = df["total"].sum()
+    tasa_nacional = total_casos / poblacion_municipios(año).sum() * 100000
+
+    # Preparamos el subtítulo.
+    subtitulo = f"Tasa nacional: <b>{tasa_nacional:,.1f}</b> (con <b>{total_casos:,.0f}</b> casos confirmados)"
+
+    # Quitamos los municipios sin población, como los que se desconocen.
+    df = df.dropna(subset=["tasa"])
+
+    # Usamos la misma escala de 13 intervalos que en los mapas estatales.
+    valor_min = df["tasa"].min()
+    valor_max = df["tasa"].quantile(0.95)
+
+    marcas = np.linspace(valor_min, valor_max, 13)
+    etiquetas = list()
+
+    for item in marcas:
+        if item >= 10:
+            etiquetas.append(f"{item:,.0f}")
+        else:
+            etiquetas.append(f"{item:,.1f}")
+
+    etiquetas[-1] = f"≥{valor_max:,.0f}"
+
+    # Usamos las entidades de las que tenemos el GeoJSON.
+    nombres = [
+        nombre
+        for clave, nombre in ENTIDADES.items()
+        if clave != 99 and os.path.exists(f"./assets/{nombre}.json")
+    ]
+
+    if not nombres:
+        raise ValueError("No se encontró el GeoJSON de ninguna entidad.")
+
+    # El nivel de detalle depende del ancho de la imagen.
+    tolerancia = nivel_detalle(ancho)
+
+    geojson = cargar_nacional(nombres, tolerancia)
+    locations = df.index.astype(str).str.zfill(5)
+
+    fig = go.Figure()
+
+    fig.add_traces(
+        go.Choropleth(
+            geojson=seleccionar(geojson, locations),
+            locations=locations,
+            z=df["tasa"],
+            colorscale="portland",
+            zmin=valor_min,
+            zmax=valor_max,
+            marker_line_width=0,
+            colorbar=dict(
+                x=0.065,
+                y=0.5,
+                ypad=50,
+                ticks="outside",
+                outlinewidth=2,
+                outlinecolor="#FFFFFF",
+                tickvals=marcas,
+                ticktext=etiquetas,
+                tickwidth=3,
+                tickcolor="#FFFFFF",
+                ticklen=10,
+                tickfont_size=24,
+            ),
+        )
+    )
+
+    # Esta es la capa de la división municipal.
+    fig.add_traces(
+        go.Choropleth(
+            geojson=geojson,
+            locations=[feature["id"] for feature in geojson["features"]],
+            z=[1 for _ in range(len(geojson["features"]))],
+            colorscale=["hsla(0,0,0,0)", "hsla(0,0,0,0)"],
+            marker_line_color="#FFFFFF",
+            marker_line_width=0.5,
+            zmin=0,
+            zmax=1,
+            showscale=False,
+        )
+    )
+
+    # Las fronteras estatales se dibujan encima con una línea más gruesa.
+    longitudes, latitudes = fronteras_estatales(nombres, tolerancia)
+
+    fig.add_traces(
+        go.Scattergeo(
+            lon=longitudes,
+            lat=latitudes,
+            mode="lines",
+            line_color="#FFFFFF",
+            line_width=2,
+            hoverinfo="skip",
+        )
+    )
+
+    fig.update_geos(
+        fitbounds="geojson",
+        projection_type="mercator",
+        showocean=True,
+        oceancolor="#000000",
+        showcountries=False,
+        framecolor="#FFFFFF",
+        framewidth=2,
+        showlakes=False,
+        coastlinewidth=0,
+        landcolor="#000000",
+    )
+
+    fig.update_layout(
+        showlegend=False,
+        font_family="Inter",
+        font_color="#FFFFFF",
+        font_size=28,
+        margin_t=80,
+        margin_r=0,
+        margin_b=80,
+        margin_l=0,
+        width=ancho,
+        height=round(ancho * 0.65),
+        paper_bgcolor=PAPER_COLOR,
         annotations=[
             dict(
                 x=0.5,
                 y=1.015,
                 xanchor="center",
                 yanchor="top",
-                text=f"Tasas de incidencia de sarampión en <b>{ENTIDADES[entidad]}</b> durante el {año}",
+                text=f"Tasas de incidencia de sarampión en <b>México</b> durante el {año}",
                 font_size=40,
             ),
             dict(
@@ -248,7 +542,7 @@ def crear_mapa(año, entidad):
                 y=-0.03,
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(año)})",
             ),
             dict(
                 x=0.5,
@@ -267,11 +561,11 @@ def crear_mapa(año, entidad):
         ],
     )
 
-    # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./mapa_{año}_{entidad}.png")
+    exportar(fig, f"./mapa_{año}_nacional.png")
 
 
-def crear_tabla_absolutos(año, entidad):
+@perfilar
+def crear_tabla_absolutos(año, entidad, conteos=None):
     """
     Genera una tabla con la incidencia de sarampión
     por municipio de la entidad y año especificados.
@@ -284,53 +578,16 @@ def crear_tabla_absolutos(año, entidad):
     entidad : int
         La entidad que se desea graficar.
 
-    """
-
-    # Cargamos el dataset de población por municipio.
-    pop = pd.read_csv("./assets/poblacion.csv", dtype={"CVE": str}, index_col=0)
-
-    # Renombramos algunos estados a sus nombres más comunes.
-    pop["Entidad"] = pop["Entidad"].replace(
-        {
-            "Coahuila de Zaragoza": "Coahuila",
-            "México": "Estado de México",
-            "Michoacán de Ocampo": "Michoacán",
-            "Veracruz de Ignacio de la Llave": "Veracruz",
-        }
-    )
-
-    # Seleccionamos las columnas de nuestro interés.
-    pop = pop[["Entidad", "Municipio", str(año)]]
-
-    # Renombramos las columnas.
-    pop.columns = ["entidad", "municipio", "poblacion"]
-
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv(
-        f"./data/{año}.csv",
-        dtype={"ENTIDAD_RES": str, "MUNICIPIO_RES": str},
-    )
-
-    # Creamos el CVE para entidad y municipio.
-    df["CVE"] = df["ENTIDAD_RES"].str.zfill(2) + df["MUNICIPIO_RES"].str.zfill(3)
-
-    # Seleccionamos los casos confirmados de sarampión.
-    df = df[df["DIAGNOSTICO"] == 1]
-
-    # Seleccionamos solo los registros de la entidad especificada.
-    df = df[df["ENTIDAD_RES"] == str(entidad)]
-
-    # Contamos los registros por municipio.
-    df = df["CVE"].value_counts().to_frame("total")
+    conteos : pandas.Series, optional
+        Los casos confirmados por CVE de todo el país, como los
+        regresa contar_casos(). Si no se especifica, se calculan.
 
-    # Unimos los DataFrames.
-    df = df.join(pop)
+    """
 
-    # Calculamos la tasa por cada 100k habitantes.
-    df["tasa"] = df["total"] / df["poblacion"] * 100000
+    import plotly.graph_objects as go
 
-    # Ordenamos los resultados por número de registros de mayor a menor.
-    df.sort_values("total", ascending=False, inplace=True)
+    # Calculamos los casos y la tasa de cada municipio de la entidad.
+    df = tasas_municipios(año, entidad, conteos)
 
     # Reseteamos el índice y solo escogemos el top 30.
     df.reset_index(inplace=True)
@@ -393,7 +650,7 @@ def crear_tabla_absolutos(año, entidad):
                 y=0.02,
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(año)})",
             ),
             dict(
                 x=0.57,
@@ -409,9 +666,78 @@ def crear_tabla_absolutos(año, entidad):
     )
 
     # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./tabla_{año}_{entidad}.png")
+    exportar(fig, f"./tabla_{año}_{entidad}.png")
+
+
+@perfilar
+def tareas_estatales(año, entidades=None, motor="plotly"):
+    """
+    Regresa las tareas para generar el mapa y la tabla de varias
+    entidades, contando los casos de todo el país una sola vez.
+
+    Parameters
+    ----------
+    año : int
+        El año que se desea graficar.
+
+    entidades : list, optional
+        Las entidades que se desean graficar. Por defecto
+        se grafican todas las entidades con casos confirmados.
+
+    motor : str, optional
+        El motor con el que se dibujan los mapas: 'plotly' o 'raster'.
+
+    Returns
+    -------
+    list
+        Una lista de tuplas (función, argumentos).
+
+    """
+
+    # Contamos los casos de todo el país una sola vez.
+    conteos = contar_casos(año)
+
+    if entidades is None:
+        entidades = sorted(
+            entidad
+            for entidad in (conteos.index // 1000).unique()
+            if entidad in ENTIDADES and entidad != 99
+        )
+
+    tareas = list()
+
+    for entidad in entidades:
+        # El mapa solo se puede crear si tenemos el GeoJSON de la entidad.
+        if os.path.exists(f"./assets/{ENTIDADES[entidad]}.json"):
+            tareas.append((crear_mapa, (año, entidad, conteos, motor)))
+        else:
+            print(f"No se encontró el GeoJSON de {ENTIDADES[entidad]}.")
+
+        tareas.append((crear_tabla_absolutos, (año, entidad, conteos)))
+
+    return tareas
+
+
+@perfilar
+def crear_estatales(año, entidades=None):
+    """
+    Genera el mapa y la tabla de varias entidades
+    cargando y agrupando los datos una sola vez.
+
+    Parameters
+    ----------
+    año : int
+        El año que se desea graficar.
+
+    entidades : list, optional
+        Las entidades que se desean graficar. Por defecto
+        se grafican todas las entidades con casos confirmados.
+
+    """
+
+    for funcion, argumentos in tareas_estatales(año, entidades):
+        funcion(*argumentos)
 
 
 if __name__ == "__main__":
-    crear_mapa(2025, 8)
-    crear_tabla_absolutos(2025, 8)
+    crear_estatales(2025, [8])
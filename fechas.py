@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+
+# El 5 de enero de 1970 fue lunes. Las semanas que inician en lunes
+# se numeran a partir de esa fecha.
+LUNES_INICIAL = np.datetime64("1970-01-05", "D")
+
+# Las fechas que ya fueron convertidas durante esta ejecución.
+_FECHAS = dict()
+
+
+def convertir_fechas(serie):
+    """
+    Convierte una serie de texto a datetime64, convirtiendo
+    cada fecha distinta una sola vez.
+
+    Los archivos tienen miles de registros pero solo unos cientos
+    de fechas distintas, por lo que primero obtenemos los valores
+    únicos, convertimos los que no hemos visto antes y después
+    los asignamos a cada registro.
+
+    Parameters
+    ----------
+    serie : pandas.Series
+        Las fechas como texto en formato DD/MM/AAAA o AAAA-MM-DD.
+        Los valores que no son fechas válidas, como 9999-99-99,
+        se convierten en NaT.
+
+    Returns
+    -------
+    pandas.Series
+        Las fechas convertidas, con el mismo índice que 'serie'.
+
+    """
+
+    codigos, unicos = pd.factorize(serie)
+
+    nuevos = [valor for valor in unicos if valor not in _FECHAS]
+
+    if nuevos:
+        nuevos = pd.Series(nuevos, dtype=str)
+
+        # Intentamos primero con DD/MM/AAAA y después con AAAA-MM-DD.
+        convertidos = pd.to_datetime(nuevos, format="%d/%m/%Y", errors="coerce")
+        convertidos = convertidos.fillna(
+            pd.to_datetime(nuevos, format="%Y-%m-%d", errors="coerce")
+        )
+        _FECHAS.update(zip(nuevos, convertidos.to_numpy()))
+
+    # Agregamos un NaT al final para los valores vacíos, cuyo código es -1.
+    valores = np.array(
+        [_FECHAS[valor] for valor in unicos] + [np.datetime64("NaT")],
+        dtype="datetime64[us]",
+    )
+
+    return pd.Series(valores[codigos], index=serie.index, name=serie.name)
+
+
+def semana_lunes(fechas):
+    """
+    Regresa el número de semana, iniciando en lunes, de cada fecha
+    contado desde el 5 de enero de 1970.
+
+    Parameters
+    ----------
+    fechas : pandas.Series
+        Una serie de tipo datetime64.
+
+    Returns
+    -------
+    pandas.Series
+        El número de semana como int16. Los NaT se convierten en -1.
+
+    """
+
+    dias = fechas.to_numpy().astype("datetime64[D]")
+    semanas = (dias - LUNES_INICIAL).astype(np.int64) // 7
+
+    return pd.Series(
+        np.where(np.isnat(dias), -1, semanas).astype(np.int16),
+        index=fechas.index,
+    )
+
+
+def fecha_semana_lunes(semanas):
+    """
+    Regresa la fecha del lunes de cada número de semana.
+    Es la operación inversa de semana_lunes().
+
+    Parameters
+    ----------
+    semanas : array-like
+        Los números de semana.
+
+    Returns
+    -------
+    pandas.DatetimeIndex
+        La fecha de cada lunes.
+
+    """
+
+    dias = LUNES_INICIAL + np.asarray(semanas, dtype=np.int64) * 7
+
+    return pd.DatetimeIndex(dias.astype("datetime64[us]"))
+
+
+def semana_iso(fechas):
+    """
+    Regresa el número de semana ISO 8601 de cada fecha.
+
+    Parameters
+    ----------
+    fechas : pandas.Series
+        Una serie de tipo datetime64.
+
+    Returns
+    -------
+    pandas.Series
+        El número de semana (1 a 53) como int16. Los NaT se convierten en -1.
+
+    """
+
+    semanas = fechas.dt.isocalendar()["week"].astype("Int16")
+
+    return semanas.fillna(-1).astype(np.int16)
+
+
+def semana_epidemiologica(fechas):
+    """
+    Regresa el número de semana epidemiológica de cada fecha.
+
+    Las semanas epidemiológicas inician en domingo y la primera semana
+    del año es la que tiene al menos cuatro días de enero. Por lo tanto,
+    cada semana pertenece al año de su miércoles.
+
+    Parameters
+    ----------
+    fechas : pandas.Series
+        Una serie de tipo datetime64.
+
+    Returns
+    -------
+    pandas.Series
+        El número de semana (1 a 53) como int16. Los NaT se convierten en -1.
+
+    """
+
+    # Nos movemos al miércoles de la semana de domingo a sábado.
+    domingo = fechas - pd.to_timedelta((fechas.dt.weekday + 1) % 7, unit="D")
+    miercoles = domingo + pd.Timedelta(days=3)
+
+    semanas = (miercoles.dt.dayofyear - 1) // 7 + 1
+
+    return semanas.fillna(-1).astype(np.int16)
@@ -0,0 +1,889 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datos import CACHE_DIR, _huella
+from perfil import perfilar
+
+
+# Carpeta con los archivos GeoJSON de cada entidad.
+ASSETS_DIR = "./assets"
+
+# Los decimales con los que se guardan las coordenadas. Cuatro decimales
+# equivalen a unos 11 metros, menos de un pixel en un mapa de 2000 pixeles
+# incluso para las entidades más pequeñas.
+DECIMALES = 4
+
+# Las tolerancias en grados de los niveles de detalle de la geometría
+# nacional, de mayor a menor detalle. 0.0005 grados son unos 55 metros.
+NIVELES = [0.0005, 0.002, 0.008, 0.032]
+
+# La extensión aproximada del país en grados de longitud. Sirve para
+# calcular cuántos grados ocupa cada pixel del mapa nacional.
+EXTENSION_NACIONAL = 32
+
+# Las geometrías que ya fueron cargadas durante esta ejecución.
+_GEOMETRIAS = dict()
+
+
+def _poligonos(geometria):
+    """
+    Regresa los polígonos de una geometría Polygon o MultiPolygon.
+
+    Parameters
+    ----------
+    geometria : dict
+        La geometría de un feature de GeoJSON.
+
+    Returns
+    -------
+    list
+        Una lista de polígonos, cada uno una lista de anillos.
+
+    """
+
+    if geometria["type"] == "Polygon":
+        return [geometria["coordinates"]]
+
+    return geometria["coordinates"]
+
+
+def _cuantizar(anillo):
+    """
+    Redondea las coordenadas de un anillo a enteros con DECIMALES
+    decimales y quita los puntos consecutivos repetidos.
+
+    Parameters
+    ----------
+    anillo : list
+        Las coordenadas [longitud, latitud] del anillo.
+
+    Returns
+    -------
+    numpy.ndarray
+        Las coordenadas como enteros de 32 bits.
+
+    """
+
+    puntos = np.rint(np.asarray(anillo, dtype=np.float64) * 10**DECIMALES)
+    puntos = puntos.astype(np.int32)
+
+    # Después de redondear, varios puntos seguidos pueden quedar iguales.
+    distintos = np.ones(len(puntos), dtype=bool)
+    distintos[1:] = (puntos[1:] != puntos[:-1]).any(axis=1)
+
+    return puntos[distintos]
+
+
+@perfilar
+def _construir_geometria(ruta_geojson, ruta_cache):
+    """
+    Lee un archivo GeoJSON y guarda sus geometrías cuantizadas
+    en un archivo .npz, sin las propiedades de cada municipio.
+
+    Las coordenadas de todos los anillos se guardan en un solo arreglo
+    y los anillos, polígonos y municipios se delimitan con arreglos
+    de posiciones.
+
+    Parameters
+    ----------
+    ruta_geojson : str
+        La ruta del archivo GeoJSON.
+
+    ruta_cache : str
+        La ruta del archivo .npz resultante.
+
+    """
+
+    with open(ruta_geojson, "r", encoding="utf-8") as archivo:
+        geojson = json.load(archivo)
+
+    cves = list()
+    coordenadas = list()
+    anillos = [0]
+    poligonos = [0]
+    municipios = [0]
+
+    for feature in geojson["features"]:
+        cves.append(int(feature["properties"]["CVEGEO"]))
+
+        for poligono in _poligonos(feature["geometry"]):
+            for numero, anillo in enumerate(poligono):
+                puntos = _cuantizar(anillo)
+
+                # Los anillos que se reducen a menos de cuatro puntos
+                # ya no tienen área visible. Si es el anillo exterior,
+                # se descarta el polígono completo con sus huecos.
+                if len(puntos) < 4:
+                    if numero == 0:
+                        break
+
+                    continue
+
+                coordenadas.append(puntos)
+                anillos.append(anillos[-1] + len(puntos))
+
+            if len(anillos) - 1 > poligonos[-1]:
+                poligonos.append(len(anillos) - 1)
+
+        municipios.append(len(poligonos) - 1)
+
+    huella = _huella(ruta_geojson)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    np.savez(
+        ruta_cache,
+        cves=np.array(cves, dtype=np.int32),
+        coordenadas=np.concatenate(coordenadas or [np.empty((0, 2), np.int32)]),
+        anillos=np.array(anillos, dtype=np.int64),
+        poligonos=np.array(poligonos, dtype=np.int64),
+        municipios=np.array(municipios, dtype=np.int64),
+        tamaño=huella["tamaño"],
+        mtime=huella["mtime"],
+        sha256=huella["sha256"],
+    )
+
+
+def _vigente(ruta_geojson, ruta_cache):
+    """
+    Indica si el archivo .npz corresponde a la versión actual del GeoJSON.
+
+    """
+
+    if not os.path.exists(ruta_cache):
+        return False
+
+    with np.load(ruta_cache) as cache:
+        estado = os.stat(ruta_geojson)
+
+        # Si el tamaño y la fecha de modificación coinciden no
+        # es necesario volver a calcular el hash del archivo.
+        if cache["tamaño"] == estado.st_size and cache["mtime"] == estado.st_mtime_ns:
+            return True
+
+        return str(cache["sha256"]) == _huella(ruta_geojson)["sha256"]
+
+
+def _cache_entidad(nombre):
+    """
+    Regresa la ruta del archivo .npz de una entidad,
+    creándolo si no existe o si el GeoJSON cambió.
+
+    Parameters
+    ----------
+    nombre : str
+        El nombre del archivo GeoJSON en ASSETS_DIR, sin la extensión.
+
+    Returns
+    -------
+    str
+        La ruta del archivo .npz.
+
+    """
+
+    ruta_geojson = os.path.join(ASSETS_DIR, f"{nombre}.json")
+    ruta_cache = os.path.join(CACHE_DIR, f"geometria_{nombre}.npz")
+
+    if not _vigente(ruta_geojson, ruta_cache):
+        _construir_geometria(ruta_geojson, ruta_cache)
+
+    return ruta_cache
+
+
+@perfilar
+def cargar_geometria(nombre):
+    """
+    Regresa las geometrías de los municipios de una entidad
+    como un FeatureCollection listo para plotly.
+
+    El GeoJSON solo se lee la primera vez. Sus geometrías cuantizadas
+    se guardan en CACHE_DIR y en las siguientes ejecuciones se leen
+    directamente de ahí. Cada feature tiene el CVEGEO como 'id' y no
+    tiene propiedades, por lo que las trazas deben usar featureidkey='id'.
+
+    Parameters
+    ----------
+    nombre : str
+        El nombre del archivo GeoJSON en ASSETS_DIR, sin la extensión.
+        Por ejemplo, 'Chihuahua'.
+
+    Returns
+    -------
+    dict
+        El FeatureCollection con las geometrías. Es el mismo objeto
+        en todas las llamadas, por lo que no se debe modificar.
+
+    """
+
+    if nombre in _GEOMETRIAS:
+        return _GEOMETRIAS[nombre]
+
+    with np.load(_cache_entidad(nombre)) as cache:
+        cves = cache["cves"]
+        coordenadas = cache["coordenadas"] / 10**DECIMALES
+        anillos = cache["anillos"]
+        poligonos = cache["poligonos"]
+        municipios = cache["municipios"]
+
+    # Convertimos todas las coordenadas a listas de una sola vez
+    # y después las separamos por anillo.
+    coordenadas = coordenadas.round(DECIMALES).tolist()
+    anillos = [
+        coordenadas[inicio:fin] for inicio, fin in zip(anillos[:-1], anillos[1:])
+    ]
+
+    _GEOMETRIAS[nombre] = _feature_collection(cves, anillos, poligonos, municipios)
+
+    return _GEOMETRIAS[nombre]
+
+
+def _feature_collection(cves, anillos, poligonos, municipios):
+    """
+    Arma un FeatureCollection a partir de los anillos de cada municipio.
+
+    Parameters
+    ----------
+    cves : numpy.ndarray
+        El CVEGEO de cada municipio como entero.
+
+    anillos : list
+        Las coordenadas de cada anillo como listas [longitud, latitud].
+
+    poligonos : numpy.ndarray
+        La posición en 'anillos' donde inicia cada polígono, más el final.
+
+    municipios : numpy.ndarray
+        La posición en 'poligonos' donde inicia cada municipio, más el final.
+
+    Returns
+    -------
+    dict
+        El FeatureCollection con el CVEGEO de cinco dígitos como 'id'.
+
+    """
+
+    poligonos = [
+        anillos[inicio:fin] for inicio, fin in zip(poligonos[:-1], poligonos[1:])
+    ]
+
+    features = list()
+
+    for cve, inicio, fin in zip(cves, municipios[:-1], municipios[1:]):
+        if fin - inicio == 1:
+            geometria = {"type": "Polygon", "coordinates": poligonos[inicio]}
+        else:
+            geometria = {"type": "MultiPolygon", "coordinates": poligonos[inicio:fin]}
+
+        features.append(
+            {"type": "Feature", "id": str(cve).zfill(5), "geometry": geometria}
+        )
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def seleccionar(geojson, cves):
+    """
+    Regresa un FeatureCollection con solo los municipios especificados.
+
+    Los features son los mismos objetos del FeatureCollection original,
+    por lo que no se copia ninguna geometría.
+
+    Parameters
+    ----------
+    geojson : dict
+        El FeatureCollection que regresa cargar_geometria().
+
+    cves : list
+        Los CVEGEO de los municipios como texto de cinco dígitos.
+
+    Returns
+    -------
+    dict
+        El FeatureCollection con los municipios seleccionados.
+
+    """
+
+    cves = set(cves)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            feature for feature in geojson["features"] if feature["id"] in cves
+        ],
+    }
+
+
+def nivel_detalle(ancho, extension=EXTENSION_NACIONAL):
+    """
+    Regresa el nivel de detalle adecuado para un mapa del ancho especificado.
+
+    Se usa el nivel más simplificado cuya tolerancia no pasa de un pixel,
+    por lo que la simplificación apenas es visible en la imagen.
+
+    Parameters
+    ----------
+    ancho : int
+        El ancho del mapa en pixeles.
+
+    extension : float, optional
+        Los grados de longitud que abarca el mapa.
+
+    Returns
+    -------
+    float
+        La tolerancia de NIVELES correspondiente.
+
+    """
+
+    pixel = extension / ancho
+
+    candidatos = [nivel for nivel in NIVELES if nivel <= pixel]
+
+    return max(candidatos) if candidatos else NIVELES[0]
+
+
+def _llaves(puntos):
+    """
+    Convierte cada punto cuantizado en un solo entero de 64 bits.
+
+    """
+
+    return (puntos[:, 0].astype(np.int64) << 32) | (
+        puntos[:, 1].astype(np.int64) & 0xFFFFFFFF
+    )
+
+
+def _uniones(anillos):
+    """
+    Encuentra los puntos donde se unen tres o más municipios,
+    o donde termina la frontera compartida entre dos.
+
+    Un punto es una unión si no tiene los mismos vecinos
+    en todos los anillos donde aparece.
+
+    Parameters
+    ----------
+    anillos : list
+        Los anillos abiertos, sin repetir el primer punto al final.
+
+    Returns
+    -------
+    list
+        Un arreglo booleano por anillo, True en las uniones.
+
+    """
+
+    largos = np.array([len(anillo) for anillo in anillos])
+    fin = np.cumsum(largos)
+    inicio = fin - largos
+
+    llaves = _llaves(np.concatenate(anillos))
+
+    # El punto anterior y el siguiente de cada punto dentro de su anillo.
+    posiciones = np.arange(len(llaves))
+
+    anterior = posiciones - 1
+    anterior[inicio] = fin - 1
+
+    siguiente = posiciones + 1
+    siguiente[fin - 1] = inicio
+
+    vecinos = pd.DataFrame(
+        {
+            "llave": llaves,
+            "menor": np.minimum(llaves[anterior], llaves[siguiente]),
+            "mayor": np.maximum(llaves[anterior], llaves[siguiente]),
+        }
+    ).drop_duplicates()
+
+    conteo = vecinos.groupby("llave").size()
+
+    uniones = np.isin(llaves, conteo.index[conteo > 1].to_numpy())
+
+    return np.split(uniones, fin[:-1])
+
+
+def _cortar(puntos, uniones):
+    """
+    Divide un anillo en líneas que van de una unión a la siguiente.
+
+    Parameters
+    ----------
+    puntos : numpy.ndarray
+        El anillo abierto.
+
+    uniones : numpy.ndarray
+        True en los puntos que son uniones.
+
+    Returns
+    -------
+    list
+        Las líneas, cada una con sus dos extremos. Un anillo sin
+        uniones regresa una sola línea cerrada, que empieza en su
+        punto con la llave menor.
+
+    """
+
+    posiciones = np.flatnonzero(uniones)
+
+    if len(posiciones) == 0:
+        puntos = np.roll(puntos, -_llaves(puntos).argmin(), axis=0)
+        return [np.vstack([puntos, puntos[:1]])]
+
+    puntos = np.roll(puntos, -posiciones[0], axis=0)
+    posiciones = np.append(posiciones - posiciones[0], len(puntos))
+
+    cerrado = np.vstack([puntos, puntos[:1]])
+
+    return [
+        cerrado[inicio : fin + 1]
+        for inicio, fin in zip(posiciones[:-1], posiciones[1:])
+    ]
+
+
+def _importancia(puntos, minima):
+    """
+    Calcula con el algoritmo de Douglas-Peucker la tolerancia
+    a partir de la cual se elimina cada punto de una línea.
+
+    Parameters
+    ----------
+    puntos : numpy.ndarray
+        Las coordenadas de la línea en grados.
+
+    minima : float
+        La tolerancia del nivel de mayor detalle. Los puntos
+        por debajo de ella no se guardan en ningún nivel.
+
+    Returns
+    -------
+    numpy.ndarray
+        La tolerancia de cada punto. Los extremos nunca se eliminan.
+
+    """
+
+    importancia = np.zeros(len(puntos))
+    importancia[[0, -1]] = np.inf
+
+    pila = [(0, len(puntos) - 1, np.inf)]
+
+    # Una línea cerrada se divide primero en su punto más lejano al inicio
+    # para que el anillo conserve al menos tres puntos distintos.
+    if len(puntos) > 3 and (puntos[0] == puntos[-1]).all():
+        lejano = np.hypot(*(puntos - puntos[0]).T).argmax()
+        importancia[lejano] = np.inf
+        pila = [(0, lejano, np.inf), (lejano, len(puntos) - 1, np.inf)]
+
+    while pila:
+        inicio, fin, techo = pila.pop()
+
+        if fin - inicio < 2:
+            continue
+
+        a, b = puntos[inicio], puntos[fin]
+        tramo = puntos[inicio + 1 : fin] - a
+
+        # La distancia de cada punto al segmento entre los extremos.
+        dx, dy = b - a
+        largo = np.hypot(dx, dy)
+
+        if largo == 0:
+            distancias = np.hypot(tramo[:, 0], tramo[:, 1])
+        else:
+            distancias = np.abs(dx * tramo[:, 1] - dy * tramo[:, 0]) / largo
+
+        mayor = distancias.argmax()
+
+        if distancias[mayor] < minima:
+            continue
+
+        # Un punto nunca es más importante que el que dividió su tramo.
+        punto = inicio + 1 + mayor
+        importancia[punto] = min(distancias[mayor], techo)
+
+        pila.append((inicio, punto, importancia[punto]))
+        pila.append((punto, fin, importancia[punto]))
+
+    return importancia
+
+
+def _fuentes_nacionales(nombres):
+    """
+    Regresa una huella de los GeoJSON de todas las entidades.
+
+    """
+
+    huellas = list()
+
+    for nombre in nombres:
+        with np.load(_cache_entidad(nombre)) as cache:
+            huellas.append(f"{nombre}:{cache['sha256']}")
+
+    return hashlib.sha256(";".join(huellas).encode("utf-8")).hexdigest()
+
+
+@perfilar
+def _construir_topologia(nombres, ruta_cache):
+    """
+    Une las geometrías de todas las entidades en una topología
+    de líneas compartidas y la guarda en un archivo .npz.
+
+    Cada frontera entre dos municipios se guarda una sola vez y los anillos
+    de ambos hacen referencia a ella, por lo que al simplificarla las dos
+    caras siguen coincidiendo.
+
+    Parameters
+    ----------
+    nombres : list
+        Los nombres de los archivos GeoJSON de cada entidad.
+
+    ruta_cache : str
+        La ruta del archivo .npz resultante.
+
+    """
+
+    cves = list()
+    anillos = list()
+    poligonos = [0]
+    municipios = [0]
+
+    for nombre in nombres:
+        with np.load(_cache_entidad(nombre)) as cache:
+            coordenadas = cache["coordenadas"]
+            limites_anillos = cache["anillos"]
+
+            base_poligonos = len(poligonos) - 1
+            poligonos.extend(cache["poligonos"][1:] + len(anillos))
+            municipios.extend(cache["municipios"][1:] + base_poligonos)
+            cves.extend(cache["cves"])
+
+        # Quitamos el último punto de cada anillo, que repite el primero.
+        for inicio, fin in zip(limites_anillos[:-1], limites_anillos[1:]):
+            anillo = coordenadas[inicio:fin]
+
+            if (anillo[0] == anillo[-1]).all():
+                anillo = anillo[:-1]
+
+            anillos.append(anillo)
+
+    cves = np.array(cves, dtype=np.int32)
+    municipios = np.array(municipios, dtype=np.int64)
+
+    # La entidad de cada anillo, para saber qué líneas son fronteras estatales.
+    entidad_poligono = np.repeat(cves // 1000, np.diff(municipios))
+    entidad_anillo = np.repeat(entidad_poligono, np.diff(poligonos))
+
+    lineas = list()
+    registro = dict()
+    entidades = list()
+    usos = list()
+
+    referencias = list()
+    limites = [0]
+
+    for anillo, uniones, entidad in zip(anillos, _uniones(anillos), entidad_anillo):
+        for linea in _cortar(anillo, uniones):
+            # Buscamos la línea en ambos sentidos.
+            llave = linea.tobytes()
+            inversa = linea[::-1].tobytes()
+
+            if llave in registro:
+                referencia = registro[llave]
+            elif inversa in registro:
+                referencia = ~registro[inversa]
+            else:
+                referencia = registro[llave] = len(lineas)
+                lineas.append(linea)
+                entidades.append(entidad)
+                usos.append(0)
+
+            indice = referencia if referencia >= 0 else ~referencia
+
+            usos[indice] += 1
+
+            # Una línea compartida por dos entidades es frontera estatal.
+            if entidades[indice] != entidad:
+                entidades[indice] = -1
+
+            referencias.append(referencia)
+
+        limites.append(len(referencias))
+
+    # Las líneas de un solo municipio son la costa o la frontera del país.
+    frontera = (np.array(entidades) == -1) | (np.array(usos) == 1)
+
+    importancia = [
+        _importancia(linea / 10**DECIMALES, NIVELES[0]) for linea in lineas
+    ]
+
+    np.savez(
+        ruta_cache,
+        cves=cves,
+        lineas=np.concatenate(lineas),
+        inicio_lineas=np.cumsum([0] + [len(linea) for linea in lineas]),
+        importancia=np.concatenate(importancia).astype(np.float32),
+        frontera=frontera,
+        referencias=np.array(referencias, dtype=np.int32),
+        anillos=np.array(limites, dtype=np.int64),
+        poligonos=np.array(poligonos, dtype=np.int64),
+        municipios=municipios,
+        fuentes=_fuentes_nacionales(nombres),
+    )
+
+
+def _topologia(nombres):
+    """
+    Regresa la topología nacional, creándola si no existe
+    o si alguno de los GeoJSON cambió.
+
+    Parameters
+    ----------
+    nombres : list
+        Los nombres de los archivos GeoJSON de cada entidad.
+
+    Returns
+    -------
+    dict
+        Los arreglos de la topología.
+
+    """
+
+    llave = ("topologia", tuple(nombres))
+
+    if llave in _GEOMETRIAS:
+        return _GEOMETRIAS[llave]
+
+    ruta_cache = os.path.join(CACHE_DIR, "topologia_nacional.npz")
+    fuentes = _fuentes_nacionales(nombres)
+
+    vigente = False
+
+    if os.path.exists(ruta_cache):
+        with np.load(ruta_cache) as cache:
+            vigente = str(cache["fuentes"]) == fuentes
+
+    if not vigente:
+        _construir_topologia(nombres, ruta_cache)
+
+    with np.load(ruta_cache) as cache:
+        _GEOMETRIAS[llave] = {nombre: cache[nombre] for nombre in cache.files}
+
+    return _GEOMETRIAS[llave]
+
+
+def _lineas(topologia, tolerancia):
+    """
+    Simplifica todas las líneas de la topología con la tolerancia especificada.
+
+    Si un anillo queda con menos de cuatro puntos, sus líneas se dejan
+    completas. Como las líneas son compartidas, los anillos vecinos
+    también las usan completas y las fronteras siguen coincidiendo.
+
+    Parameters
+    ----------
+    topologia : dict
+        Los arreglos que regresa _topologia().
+
+    tolerancia : float
+        La tolerancia en grados, normalmente una de NIVELES.
+
+    Returns
+    -------
+    list
+        Las coordenadas de cada línea como listas [longitud, latitud].
+
+    """
+
+    inicio = topologia["inicio_lineas"]
+    largos = np.diff(inicio)
+
+    mascara = topologia["importancia"] >= tolerancia
+
+    referencias = topologia["referencias"]
+    indices = np.where(referencias >= 0, referencias, ~referencias)
+
+    # Cada línea aporta sus puntos menos uno, pues su último
+    # punto es el primero de la siguiente línea del anillo.
+    puntos = np.add.reduceat(mascara.astype(np.int64), inicio[:-1]) - 1
+    puntos = np.add.reduceat(puntos[indices], topologia["anillos"][:-1])
+
+    colapsadas = np.unique(
+        indices[np.repeat(puntos < 3, np.diff(topologia["anillos"]))]
+    )
+
+    mascara |= np.isin(np.repeat(np.arange(len(largos)), largos), colapsadas)
+
+    coordenadas = topologia["lineas"][mascara] / 10**DECIMALES
+    coordenadas = coordenadas.round(DECIMALES).tolist()
+
+    conservados = np.add.reduceat(mascara.astype(np.int64), inicio[:-1])
+    limites = np.concatenate([[0], np.cumsum(conservados)])
+
+    return [coordenadas[a:b] for a, b in zip(limites[:-1], limites[1:])]
+
+
+@perfilar
+def cargar_nacional(nombres, tolerancia):
+    """
+    Regresa las geometrías de los municipios de todo el país,
+    simplificadas con la tolerancia especificada.
+
+    La topología de líneas compartidas y la importancia de cada punto
+    se calculan una sola vez y se guardan en CACHE_DIR, por lo que cualquier
+    nivel de detalle se obtiene solo con filtrar puntos. Las fronteras
+    entre municipios vecinos siguen coincidiendo después de simplificar.
+
+    Parameters
+    ----------
+    nombres : list
+        Los nombres de los archivos GeoJSON de cada entidad en ASSETS_DIR.
+
+    tolerancia : float
+        La tolerancia en grados. Normalmente se obtiene con nivel_detalle().
+
+    Returns
+    -------
+    dict
+        El FeatureCollection con las geometrías, con el mismo formato
+        que el de cargar_geometria().
+
+    """
+
+    llave = ("nacional", tuple(nombres), tolerancia)
+
+    if llave in _GEOMETRIAS:
+        return _GEOMETRIAS[llave]
+
+    topologia = _topologia(nombres)
+    lineas = _lineas(topologia, tolerancia)
+
+    # Armamos cada anillo con sus líneas, en el sentido que le corresponde
+    # y sin repetir el punto donde se une cada línea con la siguiente.
+    referencias = topologia["referencias"].tolist()
+    anillos = list()
+
+    for inicio, fin in zip(topologia["anillos"][:-1], topologia["anillos"][1:]):
+        anillo = list()
+
+        for referencia in referencias[inicio:fin]:
+            linea = lineas[referencia] if referencia >= 0 else lineas[~referencia][::-1]
+            anillo.extend(linea[1:] if anillo else linea)
+
+        anillos.append(anillo)
+
+    _GEOMETRIAS[llave] = _feature_collection(
+        topologia["cves"], anillos, topologia["poligonos"], topologia["municipios"]
+    )
+
+    return _GEOMETRIAS[llave]
+
+
+def fronteras_estatales(nombres, tolerancia):
+    """
+    Regresa las fronteras entre entidades y el contorno del país,
+    simplificadas igual que cargar_nacional().
+
+    Parameters
+    ----------
+    nombres : list
+        Los nombres de los archivos GeoJSON de cada entidad en ASSETS_DIR.
+
+    tolerancia : float
+        La tolerancia en grados.
+
+    Returns
+    -------
+    tuple
+        Las longitudes y las latitudes de todas las líneas,
+        separadas por None, listas para go.Scattergeo().
+
+    """
+
+    topologia = _topologia(nombres)
+    lineas = _lineas(topologia, tolerancia)
+
+    longitudes = list()
+    latitudes = list()
+
+    for linea in np.flatnonzero(topologia["frontera"]):
+        longitudes.extend([punto[0] for punto in lineas[linea]] + [None])
+        latitudes.extend([punto[1] for punto in lineas[linea]] + [None])
+
+    return longitudes, latitudes
+
+
+def centroides(nombres):
+    """
+    Regresa el centroide de cada municipio de las entidades especificadas.
+
+    El centroide se calcula con el área de cada polígono, restando
+    la de sus huecos, a partir de las geometrías cuantizadas.
+
+    Parameters
+    ----------
+    nombres : list
+        Los nombres de los archivos GeoJSON de cada entidad en ASSETS_DIR.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Las columnas 'longitud' y 'latitud' con el CVE como índice.
+
+    """
+
+    tablas = list()
+
+    for nombre in nombres:
+        with np.load(_cache_entidad(nombre)) as cache:
+            cves = cache["cves"]
+            puntos = cache["coordenadas"]
+            anillos = cache["anillos"]
+            poligonos = cache["poligonos"]
+            municipios = cache["municipios"]
+
+        if not len(puntos):
+            continue
+
+        # El punto siguiente de cada punto, regresando al inicio de su anillo.
+        siguiente = np.arange(1, len(puntos) + 1)
+        siguiente[anillos[1:] - 1] = anillos[:-1]
+
+        # Usamos un origen local para que los productos no pierdan precisión.
+        origen = puntos.min(axis=0)
+        x, y = (puntos - origen).astype(np.float64).T
+        cruz = x * y[siguiente] - x[siguiente] * y
+
+        # El área y el momento de cada anillo con la fórmula del polígono.
+        area = np.add.reduceat(cruz, anillos[:-1]) / 2
+        momento_x = np.add.reduceat((x + x[siguiente]) * cruz, anillos[:-1]) / 6
+        momento_y = np.add.reduceat((y + y[siguiente]) * cruz, anillos[:-1]) / 6
+
+        # El primer anillo de cada polígono suma y los demás son huecos,
+        # sin importar el sentido en el que se recorre cada anillo.
+        exterior = np.full(len(area), -1.0)
+        exterior[poligonos[:-1]] = 1.0
+
+        signo = exterior * np.sign(area)
+
+        # El municipio al que pertenece cada anillo.
+        municipio = np.repeat(np.arange(len(cves)), np.diff(poligonos[municipios]))
+
+        pesos = np.bincount(municipio, exterior * np.abs(area), len(cves))
+        suma_x = np.bincount(municipio, signo * momento_x, len(cves))
+        suma_y = np.bincount(municipio, signo * momento_y, len(cves))
+
+        tablas.append(
+            pd.DataFrame(
+                {
+                    "longitud": (suma_x / pesos + origen[0]) / 10**DECIMALES,
+                    "latitud": (suma_y / pesos + origen[1]) / 10**DECIMALES,
+                },
+                index=pd.Index(cves, name="CVE"),
+            )
+        )
+
+    return pd.concat(tablas)
@@ -0,0 +1,506 @@
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+
+import pandas as pd
+
+from bitmaps import _INDICES
+from cubo import _CUBOS, actualizar_cubo, cargar_cubo, cubo_guardado
+from datos import (
+    CACHE_DIR,
+    ESQUEMA,
+    PARTICIONES_DIR,
+    _CASOS,
+    _tipos,
+    casos_guardados,
+    desde_texto,
+    guardar_casos,
+    huella_casos,
+    ruta_fuente,
+)
+from fechas import convertir_fechas
+from perfil import perfilar
+
+
+# Esta columna cambia en todos los registros con cada publicación,
+# por lo que no se toma en cuenta para saber si un registro cambió.
+COLUMNA_ACTUALIZACION = "FECHA_ACTUALIZACION"
+
+# El número de registros que se procesan a la vez del archivo nacional.
+TAMAÑO_BLOQUE = 200_000
+
+# La codificación del archivo nacional. Con utf-8-sig se descarta
+# el BOM que a veces trae al inicio.
+CODIFICACION = "utf-8-sig"
+
+
+def _huellas_registros(df):
+    """
+    Calcula un hash de 64 bits del contenido de cada registro,
+    sin contar la fecha de actualización.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Los registros leídos como texto.
+
+    Returns
+    -------
+    pandas.Series
+        El hash de cada registro con el ID_REGISTRO como índice.
+
+    """
+
+    hashes = pd.util.hash_pandas_object(
+        df.drop(columns=[COLUMNA_ACTUALIZACION]), index=False
+    )
+
+    return pd.Series(
+        hashes.to_numpy(),
+        index=pd.Index(df["ID_REGISTRO"].astype("int32"), name="ID_REGISTRO"),
+        name="hash",
+    )
+
+
+def _huellas_guardadas(año, huella, ruta_csv, ruta):
+    """
+    Regresa el hash de cada registro de la versión procesada anterior.
+
+    Los hashes guardados solo se usan si se calcularon a partir del
+    mismo archivo que la versión procesada. Si no, pero el archivo de
+    ./data sigue siendo el mismo con el que se procesó esa versión,
+    se calculan a partir de él.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    huella : dict
+        La huella de la versión procesada anterior.
+
+    ruta_csv : str
+        La ruta del archivo del año en ./data.
+
+    ruta : str
+        La ruta del archivo nuevo.
+
+    Returns
+    -------
+    pandas.Series
+        El hash de cada registro, o None si no es posible obtenerlo.
+
+    """
+
+    ruta_huellas = os.path.join(CACHE_DIR, f"registros_{año}.pkl")
+
+    if os.path.exists(ruta_huellas):
+        guardadas = pd.read_pickle(ruta_huellas)
+
+        # Las versiones anteriores guardaban solo los hashes, sin la huella.
+        if isinstance(guardadas, dict) and guardadas["sha256"] == huella["sha256"]:
+            return guardadas["huellas"]
+
+    # Las particiones no guardan el texto original de los registros.
+    if not os.path.exists(ruta_csv) or ruta_fuente(año) != ruta_csv:
+        return None
+
+    if os.path.abspath(ruta) == os.path.abspath(ruta_csv):
+        return None
+
+    estado = os.stat(ruta_csv)
+
+    if estado.st_size == huella["tamaño"] and estado.st_mtime_ns == huella["mtime"]:
+        return _huellas_registros(pd.read_csv(ruta_csv, dtype=str))
+
+    return None
+
+
+def _guardar_huellas(año, huellas):
+    """
+    Guarda el hash de cada registro junto con la huella
+    del archivo del que se procesaron.
+
+    Parameters
+    ----------
+    año : int
+        El año al que pertenecen los registros.
+
+    huellas : pandas.Series
+        El hash de cada registro.
+
+    """
+
+    pd.to_pickle(
+        {"sha256": huella_casos(año), "huellas": huellas},
+        os.path.join(CACHE_DIR, f"registros_{año}.pkl"),
+    )
+
+
+@perfilar
+def ingerir(año, ruta=None):
+    """
+    Incorpora una nueva publicación del archivo del año especificado.
+
+    Los registros se comparan por ID_REGISTRO con la versión procesada
+    anterior. Solo los registros insertados o actualizados se convierten
+    con el esquema, y el cubo de conteos se actualiza sumando y restando
+    únicamente esos registros y los eliminados. El índice de bitmaps se
+    reconstruye en la siguiente consulta.
+
+    Si no existe una versión anterior con la cual comparar, o si el
+    archivo del año cambió desde que se procesó, se procesa el archivo
+    completo.
+
+    Parameters
+    ----------
+    año : int
+        El año al que pertenece el archivo.
+
+    ruta : str, optional
+        La ruta del archivo nuevo. Se copia a ./data/{año}.csv o,
+        si el año tiene una partición, reemplaza su contenido.
+        Por defecto se usa el archivo que ya está en ./data.
+
+    Returns
+    -------
+    dict
+        El número de registros insertados, actualizados y eliminados.
+
+    """
+
+    ruta_csv = f"./data/{año}.csv"
+    particion = ruta_fuente(año) != ruta_csv
+
+    if ruta is None:
+        if particion:
+            raise ValueError(
+                f"El año {año} se lee de su partición; especifica el archivo nuevo."
+            )
+
+        ruta = ruta_csv
+
+    # Leemos todo como texto, sin convertir fechas ni tipos.
+    nuevo = pd.read_csv(ruta, dtype=str)
+    huellas_nuevas = _huellas_registros(nuevo)
+
+    anterior = cubo = huellas = None
+    guardado = casos_guardados(año)
+
+    # La versión procesada solo sirve si corresponde al archivo actual,
+    # pues este pudo ser reemplazado a mano después de procesarla.
+    if guardado is not None and guardado[1]["sha256"] == huella_casos(año):
+        anterior, huella = guardado
+        cubo = cubo_guardado(año, huella["sha256"])
+        huellas = _huellas_guardadas(año, huella, ruta_csv, ruta)
+
+    if not particion and os.path.abspath(ruta) != os.path.abspath(ruta_csv):
+        shutil.copyfile(ruta, ruta_csv)
+
+    _INDICES.pop(año, None)
+
+    # Sin una versión anterior completa, procesamos todo el archivo.
+    if anterior is None or cubo is None or huellas is None:
+        _CASOS.pop(año, None)
+        _CUBOS.pop(año, None)
+
+        if particion:
+            _reemplazar_particion(año, desde_texto(nuevo))
+
+        cargar_cubo(año)
+        _guardar_huellas(año, huellas_nuevas)
+
+        return {"insertados": len(nuevo), "actualizados": 0, "eliminados": 0}
+
+    # Comparamos el hash de cada registro con el de la versión anterior.
+    posiciones = huellas.index.get_indexer(huellas_nuevas.index)
+
+    insertados = posiciones < 0
+    actualizados = ~insertados & (
+        huellas.to_numpy()[posiciones] != huellas_nuevas.to_numpy()
+    )
+    eliminados = ~huellas.index.isin(huellas_nuevas.index)
+
+    # La versión anterior de los registros actualizados se quita
+    # y la versión nueva se agrega.
+    ids_quitados = huellas.index[eliminados].union(huellas_nuevas.index[actualizados])
+    quitar = anterior["ID_REGISTRO"].isin(ids_quitados).to_numpy()
+
+    quitados = anterior[quitar]
+    agregados = desde_texto(nuevo[insertados | actualizados])
+
+    df = pd.concat([anterior[~quitar], agregados], ignore_index=True)
+
+    # Conservamos el orden del archivo nuevo y su fecha de actualización.
+    df = df.set_index("ID_REGISTRO").reindex(huellas_nuevas.index).reset_index()
+    df = df[anterior.columns]
+    df[COLUMNA_ACTUALIZACION] = convertir_fechas(nuevo[COLUMNA_ACTUALIZACION])
+
+    if particion:
+        _reemplazar_particion(año, df)
+
+    guardar_casos(año, df)
+    actualizar_cubo(año, cubo, agregados, quitados, huella_casos(año))
+
+    _guardar_huellas(año, huellas_nuevas)
+
+    return {
+        "insertados": int(insertados.sum()),
+        "actualizados": int(actualizados.sum()),
+        "eliminados": int(eliminados.sum()),
+    }
+
+
+def _miembro_csv(archivo_zip):
+    """
+    Regresa el nombre del archivo CSV dentro del archivo comprimido.
+
+    Parameters
+    ----------
+    archivo_zip : zipfile.ZipFile
+        El archivo comprimido.
+
+    Returns
+    -------
+    str
+        El nombre del primer archivo con extensión .csv.
+
+    """
+
+    for nombre in archivo_zip.namelist():
+        if nombre.lower().endswith(".csv"):
+            return nombre
+
+    raise ValueError(f"{archivo_zip.filename} no contiene ningún archivo CSV.")
+
+
+def _agregar_bloque(particion, df):
+    """
+    Agrega los registros de un bloque al final de los archivos
+    de cada columna de una partición.
+
+    Parameters
+    ----------
+    particion : dict
+        La carpeta, el número de registros y la información
+        de cada columna de la partición.
+
+    df : pandas.DataFrame
+        Los registros del bloque con el esquema aplicado.
+
+    """
+
+    for columna in ESQUEMA:
+        serie = df[columna]
+        info = particion["columnas"][columna]
+
+        # Las columnas que aceptan nulos se guardan como enteros
+        # más un arreglo que indica cuáles son nulos.
+        if info["nulos"]:
+            nulos = serie.isna().to_numpy()
+            valores = serie.to_numpy(dtype=info["dtype"], na_value=0)
+
+            with open(
+                os.path.join(particion["carpeta"], f"{columna}.nulos"), "ab"
+            ) as archivo:
+                archivo.write(nulos.tobytes())
+        else:
+            valores = serie.to_numpy()
+
+        datos = valores.tobytes()
+        particion["hashes"][columna].update(datos)
+
+        with open(
+            os.path.join(particion["carpeta"], f"{columna}.bin"), "ab"
+        ) as archivo:
+            archivo.write(datos)
+
+    particion["registros"] += len(df)
+
+
+def _nueva_particion(año, df):
+    """
+    Crea una carpeta vacía para la partición de un año.
+
+    Parameters
+    ----------
+    año : int
+        El año de la partición.
+
+    df : pandas.DataFrame
+        Un bloque de registros con el esquema aplicado,
+        del que se toman los tipos de cada columna.
+
+    Returns
+    -------
+    dict
+        La información de la partición que usa _agregar_bloque().
+
+    """
+
+    carpeta = os.path.join(PARTICIONES_DIR, f"{año}.nuevo")
+
+    # Descartamos lo que haya quedado de un intento anterior.
+    if os.path.exists(carpeta):
+        shutil.rmtree(carpeta)
+
+    os.makedirs(carpeta)
+
+    columnas = dict()
+
+    for columna in ESQUEMA:
+        dtype = df[columna].dtype
+
+        columnas[columna] = {
+            "dtype": str(getattr(dtype, "numpy_dtype", dtype)),
+            "nulos": isinstance(dtype, pd.api.extensions.ExtensionDtype),
+        }
+
+    return {
+        "carpeta": carpeta,
+        "registros": 0,
+        "columnas": columnas,
+        "hashes": {columna: hashlib.sha256() for columna in ESQUEMA},
+    }
+
+
+def _cerrar_particion(año, particion):
+    """
+    Guarda la información de una partición nueva y la pone
+    en lugar de la partición anterior del mismo año.
+
+    Parameters
+    ----------
+    año : int
+        El año de la partición.
+
+    particion : dict
+        La información de la partición.
+
+    """
+
+    # El hash de cada columna forma parte de meta.json, por lo que la huella
+    # de este archivo cambia únicamente si cambia el contenido de la partición.
+    for columna, info in particion["columnas"].items():
+        info["sha256"] = particion["hashes"][columna].hexdigest()
+
+    meta = {"registros": particion["registros"], "columnas": particion["columnas"]}
+
+    with open(
+        os.path.join(particion["carpeta"], "meta.json"), "w", encoding="utf-8"
+    ) as archivo:
+        json.dump(meta, archivo, indent=4)
+
+    destino = os.path.join(PARTICIONES_DIR, str(año))
+
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+
+    os.replace(particion["carpeta"], destino)
+
+
+def _reemplazar_particion(año, df):
+    """
+    Reemplaza la partición de un año con los registros especificados.
+
+    Parameters
+    ----------
+    año : int
+        El año de la partición.
+
+    df : pandas.DataFrame
+        Todos los registros del año con el esquema aplicado.
+
+    """
+
+    particion = _nueva_particion(año, df)
+    _agregar_bloque(particion, df)
+    _cerrar_particion(año, particion)
+
+
+@perfilar
+def ingerir_zip(ruta, tamaño=TAMAÑO_BLOQUE):
+    """
+    Divide el archivo nacional comprimido de la SSA en una partición
+    por año de FECHA_DIAGNOSTICO dentro de PARTICIONES_DIR.
+
+    El CSV se descomprime y se lee por bloques directamente del archivo
+    ZIP, sin escribirlo completo en disco, por lo que la memoria usada
+    depende del tamaño del bloque y no del tamaño del archivo. Cada bloque
+    se convierte con el esquema y sus registros se agregan al final de los
+    archivos binarios de cada columna de su año.
+
+    Los registros sin fecha de diagnóstico, como los casos en estudio,
+    se asignan al año de su fecha de actualización.
+
+    Las particiones de los años que vienen en el archivo se reemplazan
+    completas. Las de los demás años no se modifican.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo ZIP.
+
+    tamaño : int, optional
+        El número de registros de cada bloque.
+
+    Returns
+    -------
+    dict
+        El número de registros de cada año.
+
+    """
+
+    particiones = dict()
+    sin_fecha = 0
+
+    with zipfile.ZipFile(ruta) as archivo_zip:
+        with archivo_zip.open(_miembro_csv(archivo_zip)) as flujo:
+            with pd.read_csv(
+                flujo,
+                dtype=_tipos(),
+                usecols=list(ESQUEMA),
+                chunksize=tamaño,
+                encoding=CODIFICACION,
+            ) as lector:
+                for df in lector:
+                    for columna, tipo in ESQUEMA.items():
+                        if tipo == "fecha":
+                            df[columna] = convertir_fechas(df[columna])
+
+                    años = df["FECHA_DIAGNOSTICO"].dt.year
+                    años = años.fillna(df[COLUMNA_ACTUALIZACION].dt.year)
+
+                    # Los registros sin ninguna de las dos fechas
+                    # no se pueden asignar a ningún año.
+                    validos = años.notna()
+                    sin_fecha += int((~validos).sum())
+
+                    df = df[validos]
+                    años = años[validos].astype(int)
+
+                    for año, filas in df.groupby(años).indices.items():
+                        if año not in particiones:
+                            particiones[año] = _nueva_particion(año, df)
+
+                        _agregar_bloque(particiones[año], df.iloc[filas])
+
+    if sin_fecha:
+        print(
+            f"Se omitieron {sin_fecha:,} registros sin fecha de diagnóstico ni de actualización."
+        )
+
+    for año, particion in particiones.items():
+        _cerrar_particion(año, particion)
+
+        # Los datos de este año ya no son los mismos.
+        _CASOS.pop(año, None)
+        _CUBOS.pop(año, None)
+        _INDICES.pop(año, None)
+
+    return {
+        int(año): particion["registros"]
+        for año, particion in sorted(particiones.items())
+    }
@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+from fechas import fecha_semana_lunes, semana_lunes
+from perfil import perfilar
+from versiones import historial, publicaciones, reconstruir
+
+
+# El diagnóstico de los casos confirmados.
+CONFIRMADO = 1
+
+# Las entidades con menos registros que este número en el denominador
+# de un factor de retraso usan el factor nacional.
+MINIMO_REGISTROS = 10
+
+
+def matriz_retrasos(año, semanas=8):
+    """
+    Construye la matriz de retrasos de los casos confirmados a partir
+    de las publicaciones guardadas con versiones.guardar().
+
+    El retraso de cada caso es el número de semanas entre su semana de
+    diagnóstico y la semana de la primera publicación en la que aparece
+    como confirmado.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    semanas : int, optional
+        El retraso máximo que se modela. Los retrasos mayores
+        se acumulan en la última columna.
+
+    Returns
+    -------
+    tuple
+        La matriz de conteos con las dimensiones entidad × semana
+        de diagnóstico × retraso, donde la entidad 0 es el total nacional;
+        el número de la primera semana de la matriz, la semana de la
+        primera publicación y la semana de la última publicación.
+
+    """
+
+    lista = publicaciones(año)
+
+    if not lista:
+        raise KeyError(f"No hay publicaciones guardadas de {año}.")
+
+    # Tomamos la fecha de diagnóstico y la entidad de la última publicación
+    # y solo consideramos los casos que siguen confirmados en ella.
+    ultima = reconstruir(año, lista[-1]["fecha"], ["FECHA_DIAGNOSTICO", "ENTIDAD_RES"])
+
+    estados = historial(año, "DIAGNOSTICO").reindex(ultima.index).to_numpy()
+    confirmados = estados == CONFIRMADO
+
+    vigentes = confirmados[:, -1] & ultima["FECHA_DIAGNOSTICO"].notna().to_numpy()
+
+    # La semana de cada publicación y de la primera en la que el caso
+    # aparece como confirmado.
+    semanas_publicacion = semana_lunes(
+        pd.Series(pd.to_datetime([publicacion["fecha"] for publicacion in lista]))
+    ).to_numpy(dtype=np.int64)
+
+    primera = semanas_publicacion[confirmados[vigentes].argmax(axis=1)]
+
+    diagnostico = semana_lunes(ultima["FECHA_DIAGNOSTICO"]).to_numpy(dtype=np.int64)
+    diagnostico = diagnostico[vigentes]
+
+    entidad = ultima["ENTIDAD_RES"].to_numpy(dtype=np.int64)[vigentes]
+
+    inicio = diagnostico.min() if len(diagnostico) else semanas_publicacion[-1]
+    fin = semanas_publicacion[-1]
+
+    retraso = np.clip(primera - diagnostico, 0, semanas)
+
+    # Contamos cada combinación de entidad, semana y retraso con un solo bincount.
+    forma = (entidad.max(initial=0) + 1, fin - inicio + 1, semanas + 1)
+    llave = np.ravel_multi_index((entidad, diagnostico - inicio, retraso), forma)
+
+    matriz = np.bincount(llave, minlength=np.prod(forma)).reshape(forma)
+
+    # La entidad 0 no existe en los datos y la usamos para el total nacional.
+    matriz[0] = matriz[1:].sum(axis=0)
+
+    return matriz, inicio, semanas_publicacion[0], fin
+
+
+def completitud(matriz, inicio, primera, ultima):
+    """
+    Estima la fracción de los casos de cada semana que ya fue reportada
+    según su retraso, con el método chain-ladder.
+
+    Los factores de todas las entidades se calculan a la vez. Las entidades
+    con pocos registros usan el factor nacional.
+
+    Parameters
+    ----------
+    matriz : numpy.ndarray
+        La matriz entidad × semana × retraso de matriz_retrasos().
+
+    inicio : int
+        El número de la primera semana de la matriz.
+
+    primera : int
+        La semana de la primera publicación.
+
+    ultima : int
+        La semana de la última publicación.
+
+    Returns
+    -------
+    numpy.ndarray
+        La fracción reportada con las dimensiones entidad × retraso.
+        La última columna siempre es 1.
+
+    """
+
+    semanas = matriz.shape[2] - 1
+
+    acumulados = matriz.cumsum(axis=2)
+
+    # Una celda (t, d) es observable si la semana t + d está entre la primera
+    # y la última publicación. Antes de la primera publicación, todos los
+    # retrasos se acumulan en la primera, por lo que no son confiables.
+    semana = inicio + np.arange(matriz.shape[1])[:, None]
+    retraso = np.arange(semanas)[None, :]
+
+    observables = (semana + retraso >= primera) & (semana + retraso + 1 <= ultima)
+
+    numerador = (acumulados[:, :, 1:] * observables).sum(axis=1)
+    denominador = (acumulados[:, :, :-1] * observables).sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factores = numerador / denominador
+
+    # Sin información suficiente usamos el factor nacional y,
+    # si tampoco hay, suponemos que no hay más casos por reportar.
+    factores = np.where(denominador >= MINIMO_REGISTROS, factores, factores[0])
+    factores = np.where(np.isfinite(factores), factores, 1.0)
+
+    # La fracción reportada con retraso d es el inverso del producto
+    # de los factores de d en adelante.
+    productos = np.cumprod(factores[:, ::-1], axis=1)[:, ::-1]
+
+    return np.concatenate([1 / productos, np.ones((matriz.shape[0], 1))], axis=1)
+
+
+@perfilar
+def nowcast(año, semanas=8, nivel=0.9, simulaciones=2000, semilla=0):
+    """
+    Estima el número final de casos confirmados de las semanas más
+    recientes de todas las entidades, corrigiendo el retraso en la
+    notificación.
+
+    Los casos que faltan por reportar en cada semana se simulan con una
+    distribución binomial negativa con la completitud estimada, para
+    todas las entidades y semanas en un solo arreglo.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    semanas : int, optional
+        El retraso máximo que se modela.
+
+    nivel : float, optional
+        El nivel de las bandas de incertidumbre.
+
+    simulaciones : int, optional
+        El número de simulaciones para las bandas.
+
+    semilla : int, optional
+        La semilla del generador de números aleatorios.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por entidad y semana, con la entidad 0 como total nacional,
+        y las columnas 'observados', 'estimados', 'inferior', 'superior'
+        y 'completitud'.
+
+    """
+
+    matriz, inicio, primera, ultima = matriz_retrasos(año, semanas)
+    fracciones = completitud(matriz, inicio, primera, ultima)
+
+    observados = matriz.sum(axis=2)
+
+    # El retraso que ya transcurrió para cada semana de diagnóstico.
+    transcurrido = np.minimum(ultima - (inicio + np.arange(matriz.shape[1])), semanas)
+    transcurrido = np.maximum(transcurrido, 0)
+
+    probabilidad = fracciones[:, transcurrido]
+
+    estimados = observados / probabilidad
+
+    # Los casos que faltan siguen una binomial negativa con 'observados'
+    # éxitos y probabilidad igual a la completitud. Solo simulamos las
+    # semanas que todavía no están completas.
+    recientes = transcurrido < semanas
+
+    rng = np.random.default_rng(semilla)
+
+    faltantes = rng.negative_binomial(
+        np.maximum(observados[:, recientes], 1),
+        np.clip(probabilidad[:, recientes], 1e-9, 1),
+        size=(simulaciones, matriz.shape[0], recientes.sum()),
+    )
+
+    # Sin casos observados no podemos estimar los faltantes.
+    faltantes[:, observados[:, recientes] == 0] = 0
+
+    alfa = (1 - nivel) / 2
+
+    inferior = observados.astype(np.float64)
+    superior = observados.astype(np.float64)
+
+    inferior[:, recientes] += np.quantile(faltantes, alfa, axis=0)
+    superior[:, recientes] += np.quantile(faltantes, 1 - alfa, axis=0)
+
+    indice = pd.MultiIndex.from_product(
+        [
+            np.arange(matriz.shape[0]),
+            fecha_semana_lunes(np.arange(inicio, inicio + matriz.shape[1])),
+        ],
+        names=["ENTIDAD_RES", "SEMANA"],
+    )
+
+    return pd.DataFrame(
+        {
+            "observados": observados.ravel(),
+            "estimados": estimados.ravel(),
+            "inferior": inferior.ravel(),
+            "superior": superior.ravel(),
+            "completitud": probabilidad.ravel(),
+        },
+        index=indice,
+    )
@@ -0,0 +1,391 @@
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Si esta variable de entorno existe, el perfilado se activa al importar
+# el módulo y su valor se usa como prefijo de los archivos resultantes.
+VARIABLE_ENTORNO = "SARAMPION_PERFIL"
+
+# Cuando no es None, cada etapa medida se agrega a esta lista.
+_ETAPAS = None
+
+# Las etapas que están abiertas en este momento, de la más externa
+# a la más interna.
+_PILA = list()
+
+# El instante en que se activó el perfilado, para que los tiempos
+# del trace comiencen en cero.
+_INICIO = 0
+
+
+def activar():
+    """
+    Activa el registro de etapas y el rastreo de memoria con tracemalloc.
+
+    Mientras no se active, las funciones decoradas con perfilar()
+    se ejecutan sin ninguna medición adicional.
+
+    """
+
+    global _ETAPAS, _INICIO
+
+    _ETAPAS = list()
+    _PILA.clear()
+    _INICIO = time.perf_counter_ns()
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def desactivar():
+    """
+    Detiene el registro de etapas y el rastreo de memoria.
+
+    Returns
+    -------
+    list
+        Las etapas registradas desde la activación.
+
+    """
+
+    global _ETAPAS
+
+    etapas = _ETAPAS or list()
+    _ETAPAS = None
+
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    return etapas
+
+
+def activo():
+    """
+    Indica si el perfilado está activo.
+
+    Returns
+    -------
+    bool
+        True si las etapas se están registrando.
+
+    """
+
+    return _ETAPAS is not None
+
+
+def _acumular_pico():
+    """
+    Pasa el pico de memoria actual a todas las etapas abiertas
+    y reinicia el pico de tracemalloc.
+
+    tracemalloc solo tiene un pico global, por lo que cada etapa
+    guarda el máximo que ha visto antes de que una etapa interna
+    lo reinicie.
+
+    """
+
+    _, pico = tracemalloc.get_traced_memory()
+
+    for etapa in _PILA:
+        etapa["pico"] = max(etapa["pico"], pico)
+
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def etapa(nombre, filas=None):
+    """
+    Mide el tiempo y el pico de memoria del bloque de código.
+
+    Parameters
+    ----------
+    nombre : str
+        El nombre con el que se registra la etapa.
+
+    filas : int, optional
+        El número de registros procesados en la etapa. También
+        se puede asignar dentro del bloque con registrar_filas().
+
+    Examples
+    --------
+    >>> with etapa("read_csv"):
+    ...     df = pd.read_csv(ruta)
+
+    """
+
+    if _ETAPAS is None:
+        yield
+        return
+
+    _acumular_pico()
+
+    actual, _ = tracemalloc.get_traced_memory()
+
+    registro = {
+        "nombre": nombre,
+        "inicio": time.perf_counter_ns(),
+        "memoria_inicial": actual,
+        "pico": actual,
+        "filas": filas,
+        "nivel": len(_PILA),
+    }
+
+    _PILA.append(registro)
+
+    try:
+        yield
+    finally:
+        fin = time.perf_counter_ns()
+
+        _acumular_pico()
+        _PILA.pop()
+
+        # El pico se reporta como la memoria adicional sobre la que
+        # ya estaba ocupada al iniciar la etapa.
+        _ETAPAS.append(
+            {
+                "nombre": registro["nombre"],
+                "nivel": registro["nivel"],
+                "inicio_us": (registro["inicio"] - _INICIO) / 1000,
+                "duracion_us": (fin - registro["inicio"]) / 1000,
+                "pico_bytes": registro["pico"] - registro["memoria_inicial"],
+                "filas": registro["filas"],
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+        )
+
+
+def registrar_filas(filas):
+    """
+    Asigna el número de registros procesados a la etapa abierta más interna.
+
+    Parameters
+    ----------
+    filas : int
+        El número de registros.
+
+    """
+
+    if _PILA:
+        _PILA[-1]["filas"] = int(filas)
+
+
+def perfilar(funcion):
+    """
+    Decorador que registra cada llamada de la función como una etapa.
+
+    Si la función regresa un DataFrame o una Series, su número de filas
+    se guarda como el número de registros de la etapa.
+
+    Parameters
+    ----------
+    funcion : callable
+        La función que se desea medir.
+
+    Returns
+    -------
+    callable
+        La función decorada.
+
+    """
+
+    nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if _ETAPAS is None:
+            return funcion(*args, **kwargs)
+
+        with etapa(nombre):
+            resultado = funcion(*args, **kwargs)
+
+            if hasattr(resultado, "shape") and hasattr(resultado, "index"):
+                registrar_filas(len(resultado))
+
+        return resultado
+
+    return envoltura
+
+
+def _tiempo_propio(etapas):
+    """
+    Calcula el tiempo de cada etapa sin contar sus etapas internas.
+
+    Parameters
+    ----------
+    etapas : list
+        Las etapas registradas.
+
+    Returns
+    -------
+    list
+        El tiempo propio de cada etapa en microsegundos, en el mismo orden.
+
+    """
+
+    propio = [etapa["duracion_us"] for etapa in etapas]
+
+    # Las etapas se registran al terminar, por lo que las internas
+    # aparecen antes que la etapa que las contiene.
+    abiertas = list()
+
+    for i, etapa in enumerate(etapas):
+        fin = etapa["inicio_us"] + etapa["duracion_us"]
+
+        while abiertas:
+            j = abiertas[-1]
+
+            if (
+                etapas[j]["inicio_us"] >= etapa["inicio_us"]
+                and etapas[j]["nivel"] == etapa["nivel"] + 1
+                and etapas[j]["inicio_us"] + etapas[j]["duracion_us"] <= fin
+            ):
+                propio[i] -= etapas[j]["duracion_us"]
+                abiertas.pop()
+            else:
+                break
+
+        abiertas.append(i)
+
+    return propio
+
+
+def resumen(etapas=None):
+    """
+    Regresa una línea con el tiempo total, el pico de memoria
+    y las tres etapas con mayor tiempo propio.
+
+    Parameters
+    ----------
+    etapas : list, optional
+        Las etapas registradas. Por defecto se usan las actuales.
+
+    Returns
+    -------
+    str
+        El resumen de la ejecución.
+
+    """
+
+    etapas = _ETAPAS if etapas is None else etapas
+
+    if not etapas:
+        return "Perfil: sin etapas registradas."
+
+    raices = [etapa for etapa in etapas if etapa["nivel"] == 0]
+    total = sum(etapa["duracion_us"] for etapa in raices) / 1e6
+    pico = max(etapa["pico_bytes"] for etapa in raices) / 1024**2
+
+    # Agrupamos el tiempo propio por nombre de etapa.
+    por_nombre = dict()
+
+    for etapa, propio in zip(etapas, _tiempo_propio(etapas)):
+        por_nombre[etapa["nombre"]] = por_nombre.get(etapa["nombre"], 0) + propio
+
+    lentas = sorted(por_nombre.items(), key=lambda item: item[1], reverse=True)[:3]
+    lentas = ", ".join(f"{nombre} {tiempo / 1e6:.2f} s" for nombre, tiempo in lentas)
+
+    return (
+        f"Perfil: {len(etapas)} etapas en {total:.2f} s, "
+        f"pico de {pico:,.1f} MB; más lentas: {lentas}."
+    )
+
+
+def exportar_json(ruta, etapas=None):
+    """
+    Guarda las etapas registradas en un archivo JSON.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo resultante.
+
+    etapas : list, optional
+        Las etapas registradas. Por defecto se usan las actuales.
+
+    """
+
+    etapas = _ETAPAS if etapas is None else etapas
+
+    for etapa, propio in zip(etapas, _tiempo_propio(etapas)):
+        etapa["propio_us"] = propio
+
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(etapas, archivo, indent=4, ensure_ascii=False)
+
+
+def exportar_chrome(ruta, etapas=None):
+    """
+    Guarda las etapas registradas en el formato de Chrome Trace,
+    que se puede abrir en chrome://tracing o en ui.perfetto.dev.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo resultante.
+
+    etapas : list, optional
+        Las etapas registradas. Por defecto se usan las actuales.
+
+    """
+
+    etapas = _ETAPAS if etapas is None else etapas
+
+    eventos = [
+        {
+            "name": etapa["nombre"],
+            "cat": etapa["nombre"].split(".")[0],
+            "ph": "X",
+            "ts": etapa["inicio_us"],
+            "dur": etapa["duracion_us"],
+            "pid": etapa["pid"],
+            "tid": etapa["tid"],
+            "args": {"pico_bytes": etapa["pico_bytes"], "filas": etapa["filas"]},
+        }
+        for etapa in etapas
+    ]
+
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(
+            {"traceEvents": eventos, "displayTimeUnit": "ms"},
+            archivo,
+            ensure_ascii=False,
+        )
+
+
+def finalizar(prefijo):
+    """
+    Detiene el perfilado, guarda los archivos {prefijo}.json
+    y {prefijo}.trace.json e imprime el resumen.
+
+    Parameters
+    ----------
+    prefijo : str
+        La ruta de los archivos resultantes sin extensión.
+
+    """
+
+    if _ETAPAS is None:
+        return
+
+    etapas = desactivar()
+
+    exportar_json(f"{prefijo}.json", etapas)
+    exportar_chrome(f"{prefijo}.trace.json", etapas)
+
+    print(resumen(etapas))
+
+
+# Los procesos del pool heredan la variable de entorno, pero solo
+# el proceso principal registra y guarda el perfil.
+if os.environ.get(VARIABLE_ENTORNO) and multiprocessing.parent_process() is None:
+    activar()
+    atexit.register(finalizar, os.environ[VARIABLE_ENTORNO])
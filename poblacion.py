@@ -0,0 +1,296 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datos import CACHE_DIR
+from perfil import perfilar
+
+
+# Los archivos de población que usamos como fuente.
+RUTA_MUNICIPIOS = "./assets/poblacion.csv"
+RUTAS_QUINQUENAL = {
+    "hombres": "./assets/poblacion_quinquenal/hombres.csv",
+    "mujeres": "./assets/poblacion_quinquenal/mujeres.csv",
+    "total": "./assets/poblacion_quinquenal/total.csv",
+}
+
+# Renombramos algunos estados a sus nombres más comunes.
+NOMBRES_COMUNES = {
+    "Coahuila de Zaragoza": "Coahuila",
+    "México": "Estado de México",
+    "Michoacán de Ocampo": "Michoacán",
+    "Veracruz de Ignacio de la Llave": "Veracruz",
+}
+
+# El índice de población que ya fue cargado durante esta ejecución.
+_INDICE = dict()
+
+
+def _fuentes():
+    """
+    Regresa el tamaño y la fecha de modificación de cada archivo fuente.
+
+    Returns
+    -------
+    dict
+        Un diccionario con la ruta de cada archivo como llave.
+
+    """
+
+    fuentes = dict()
+
+    for ruta in [RUTA_MUNICIPIOS, *RUTAS_QUINQUENAL.values()]:
+        estado = os.stat(ruta)
+        fuentes[ruta] = [estado.st_size, estado.st_mtime_ns]
+
+    return fuentes
+
+
+@perfilar
+def _construir_indice():
+    """
+    Lee los CSV de población y guarda en CACHE_DIR las matrices
+    de enteros junto con un archivo JSON con sus etiquetas.
+
+    """
+
+    pop = pd.read_csv(RUTA_MUNICIPIOS, dtype={"CVE": "int32"}, index_col=0)
+    pop = pop.sort_index()
+
+    pop["Entidad"] = pop["Entidad"].replace(NOMBRES_COMUNES)
+
+    años_municipios = [int(columna) for columna in pop.columns[2:]]
+
+    # La matriz de municipios tiene una fila por CVE y una columna por año.
+    municipios = pop.iloc[:, 2:].to_numpy(dtype=np.int32)
+
+    # La matriz quinquenal tiene las dimensiones grupo de edad × año × sexo.
+    quinquenal = list()
+
+    for ruta in RUTAS_QUINQUENAL.values():
+        temp = pd.read_csv(ruta, index_col=0)
+        quinquenal.append(temp.to_numpy(dtype=np.int32))
+
+    quinquenal = np.stack(quinquenal, axis=-1)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    np.save(os.path.join(CACHE_DIR, "poblacion_municipios.npy"), municipios)
+    np.save(os.path.join(CACHE_DIR, "poblacion_quinquenal.npy"), quinquenal)
+
+    meta = {
+        "fuentes": _fuentes(),
+        "cves": pop.index.tolist(),
+        "entidades": pop["Entidad"].tolist(),
+        "municipios": pop["Municipio"].tolist(),
+        "años_municipios": años_municipios,
+        "grupos": temp.index.tolist(),
+        "años_quinquenal": [int(columna) for columna in temp.columns],
+        "sexos": list(RUTAS_QUINQUENAL),
+    }
+
+    with open(
+        os.path.join(CACHE_DIR, "poblacion.json"), "w", encoding="utf-8"
+    ) as archivo:
+        json.dump(meta, archivo, ensure_ascii=False)
+
+
+def _indice():
+    """
+    Regresa el índice de población, construyéndolo si no existe
+    o si alguno de los archivos fuente cambió.
+
+    Las matrices se abren como memory maps, por lo que solo se leen
+    las partes que realmente se consultan.
+
+    Returns
+    -------
+    dict
+        Un diccionario con las matrices, las etiquetas y las tablas
+        de búsqueda por CVE, entidad, año y grupo de edad.
+
+    """
+
+    if _INDICE:
+        return _INDICE
+
+    ruta_meta = os.path.join(CACHE_DIR, "poblacion.json")
+    meta = None
+
+    if os.path.exists(ruta_meta):
+        with open(ruta_meta, "r", encoding="utf-8") as archivo:
+            meta = json.load(archivo)
+
+    if meta is None or meta["fuentes"] != _fuentes():
+        _construir_indice()
+
+        with open(ruta_meta, "r", encoding="utf-8") as archivo:
+            meta = json.load(archivo)
+
+    cves = np.array(meta["cves"], dtype=np.int32)
+
+    # Esta tabla convierte un CVE en su número de fila. Los CVE
+    # que no existen apuntan a -1.
+    fila_cve = np.full(cves.max() + 1, -1, dtype=np.int32)
+    fila_cve[cves] = np.arange(len(cves), dtype=np.int32)
+
+    # Como los CVE están ordenados, los municipios de cada
+    # entidad ocupan un rango continuo de filas.
+    entidades = cves // 1000
+    filas_entidad = {
+        int(entidad): (
+            int(np.searchsorted(entidades, entidad, side="left")),
+            int(np.searchsorted(entidades, entidad, side="right")),
+        )
+        for entidad in np.unique(entidades)
+    }
+
+    _INDICE.update(
+        {
+            "municipios": np.load(
+                os.path.join(CACHE_DIR, "poblacion_municipios.npy"), mmap_mode="r"
+            ),
+            "quinquenal": np.load(
+                os.path.join(CACHE_DIR, "poblacion_quinquenal.npy"), mmap_mode="r"
+            ),
+            "cves": cves,
+            "nombres": pd.DataFrame(
+                {"entidad": meta["entidades"], "municipio": meta["municipios"]},
+                index=pd.Index(cves, name="CVE"),
+            ),
+            "fila_cve": fila_cve,
+            "filas_entidad": filas_entidad,
+            "columna_año": {año: i for i, año in enumerate(meta["años_municipios"])},
+            "grupos": meta["grupos"],
+            "columna_año_quinquenal": {
+                año: i for i, año in enumerate(meta["años_quinquenal"])
+            },
+            "sexos": {sexo: i for i, sexo in enumerate(meta["sexos"])},
+        }
+    )
+
+    return _INDICE
+
+
+def poblacion_municipio(cve, año):
+    """
+    Regresa la población de un municipio en el año especificado.
+
+    Parameters
+    ----------
+    cve : int
+        El CVE del municipio, por ejemplo 8017.
+
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    int
+        La población del municipio.
+
+    """
+
+    indice = _indice()
+
+    fila_cve = indice["fila_cve"]
+
+    # Los CVE fuera del arreglo tampoco existen en el catálogo.
+    fila = fila_cve[cve] if 0 <= cve < len(fila_cve) else -1
+
+    if fila < 0:
+        raise KeyError(f"CVE desconocido: {cve}")
+
+    return int(indice["municipios"][fila, indice["columna_año"][año]])
+
+
+@perfilar
+def poblacion_municipios(año, entidad=None):
+    """
+    Regresa la población de todos los municipios en el año especificado.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    entidad : int, optional
+        Si se especifica, solo se regresan los municipios de esa entidad.
+
+    Returns
+    -------
+    pandas.Series
+        La población de cada municipio con el CVE como índice.
+
+    """
+
+    indice = _indice()
+
+    if entidad is None:
+        inicio, fin = 0, len(indice["cves"])
+    else:
+        inicio, fin = indice["filas_entidad"][entidad]
+
+    return pd.Series(
+        indice["municipios"][inicio:fin, indice["columna_año"][año]],
+        index=pd.Index(indice["cves"][inicio:fin], name="CVE"),
+        name=str(año),
+    )
+
+
+@perfilar
+def tabla_municipios(año):
+    """
+    Regresa el nombre de la entidad, el nombre del municipio
+    y la población de todos los municipios en el año especificado.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un DataFrame con las columnas 'entidad', 'municipio' y
+        'poblacion' y el CVE como índice.
+
+    """
+
+    pop = _indice()["nombres"].copy()
+    pop["poblacion"] = poblacion_municipios(año).to_numpy()
+
+    return pop
+
+
+@perfilar
+def poblacion_quinquenal(sexo, año):
+    """
+    Regresa la población nacional por grupo quinquenal de edad.
+
+    Parameters
+    ----------
+    sexo : str
+        'hombres', 'mujeres' o 'total'.
+
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    pandas.Series
+        La población de cada grupo de edad con su etiqueta como índice.
+
+    """
+
+    indice = _indice()
+
+    return pd.Series(
+        indice["quinquenal"][
+            :, indice["columna_año_quinquenal"][año], indice["sexos"][sexo]
+        ],
+        index=pd.Index(indice["grupos"], name="Grupo edad"),
+        name=str(año),
+    )
@@ -0,0 +1,514 @@
+"""
+Dibuja los mapas choropleth directamente con Pillow, sin plotly ni kaleido.
+
+Los polígonos se proyectan con la proyección ortográfica, igual que en
+plotly, y se rellenan en un búfer de imagen. La escala de colores, la barra
+de colores y las anotaciones usan los mismos valores que la versión de
+plotly, por lo que ambas imágenes se pueden comparar pixel por pixel
+con benchmarks/comparar_mapas.py.
+
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+# La escala 'portland' de plotly: la posición y el color de cada punto.
+PORTLAND = [
+    (0.0, (12, 51, 131)),
+    (0.25, (10, 136, 186)),
+    (0.5, (242, 211, 56)),
+    (0.75, (242, 143, 56)),
+    (1.0, (217, 30, 30)),
+]
+
+# Las fuentes que se buscan en el sistema, en orden de preferencia.
+# Las gráficas de plotly usan Inter.
+FUENTES = ["Inter-Regular.ttf", "Inter.ttf", "DejaVuSans.ttf"]
+FUENTES_NEGRITAS = ["Inter-Bold.ttf", "DejaVuSans-Bold.ttf"]
+
+# Cada imagen se dibuja a esta escala y después se reduce,
+# para suavizar los bordes de los polígonos y las líneas.
+SUPERMUESTREO = 2
+
+# Las capas fijas de los mapas de cada entidad y resolución,
+# de la menos a la más recientemente usada. Cada una ocupa cerca
+# de 130 MB con el supermuestreo, por lo que solo guardamos unas cuantas.
+_CAPAS = dict()
+MAXIMO_CAPAS = 4
+
+
+@lru_cache(maxsize=None)
+def _fuente(tamaño, negritas=False):
+    """
+    Regresa la primera fuente disponible del tamaño especificado.
+
+    """
+
+    for nombre in FUENTES_NEGRITAS if negritas else FUENTES:
+        try:
+            return ImageFont.truetype(nombre, tamaño)
+        except OSError:
+            continue
+
+    return ImageFont.load_default(tamaño)
+
+
+def _hex(color):
+    """
+    Convierte un color como '#3B1C32' en una tupla RGB.
+
+    """
+
+    return tuple(int(color[i : i + 2], 16) for i in (1, 3, 5))
+
+
+def colores(valores, zmin, zmax):
+    """
+    Asigna a cada valor su color de la escala PORTLAND.
+
+    Parameters
+    ----------
+    valores : array_like
+        Los valores que se desean colorear.
+
+    zmin : float
+        El valor que corresponde al inicio de la escala.
+
+    zmax : float
+        El valor que corresponde al final de la escala. Los valores
+        mayores reciben el último color.
+
+    Returns
+    -------
+    numpy.ndarray
+        Un arreglo de uint8 con un color RGB por valor.
+
+    """
+
+    posiciones = np.clip(
+        (np.asarray(valores, dtype=np.float64) - zmin) / (zmax - zmin), 0, 1
+    )
+
+    puntos = [punto for punto, _ in PORTLAND]
+    canales = np.array([color for _, color in PORTLAND], dtype=np.float64)
+
+    return (
+        np.stack(
+            [np.interp(posiciones, puntos, canales[:, i]) for i in range(3)], axis=1
+        )
+        .round()
+        .astype(np.uint8)
+    )
+
+
+def _proyectar(lon, lat, lon0, lat0):
+    """
+    Aplica la proyección ortográfica centrada en (lon0, lat0).
+
+    Returns
+    -------
+    tuple
+        Las coordenadas x, y proyectadas, con y hacia arriba.
+
+    """
+
+    lon, lat = np.radians(lon), np.radians(lat)
+    lon0, lat0 = np.radians(lon0), np.radians(lat0)
+
+    x = np.cos(lat) * np.sin(lon - lon0)
+    y = np.cos(lat0) * np.sin(lat) - np.sin(lat0) * np.cos(lat) * np.cos(lon - lon0)
+
+    return x, y
+
+
+def _anillos(feature):
+    """
+    Regresa los polígonos de un feature, cada uno como una lista
+    de anillos en arreglos de numpy.
+
+    """
+
+    geometria = feature["geometry"]
+
+    if geometria["type"] == "Polygon":
+        poligonos = [geometria["coordinates"]]
+    else:
+        poligonos = geometria["coordinates"]
+
+    return [[np.asarray(anillo) for anillo in poligono] for poligono in poligonos]
+
+
+def _segmentos(texto, tamaño):
+    """
+    Divide un texto con etiquetas <b> en segmentos con su fuente.
+
+    """
+
+    segmentos = list()
+    negritas = False
+
+    for parte in re.split(r"(</?b>)", texto):
+        if parte == "<b>":
+            negritas = True
+        elif parte == "</b>":
+            negritas = False
+        elif parte:
+            segmentos.append((parte, _fuente(tamaño, negritas)))
+
+    return segmentos
+
+
+@lru_cache(maxsize=256)
+def _imagen_texto(texto, tamaño, color, angulo=0):
+    """
+    Dibuja un texto de una línea en una imagen transparente
+    del tamaño justo para contenerlo, girada en sentido antihorario.
+
+    Las imágenes se guardan en memoria, por lo que los textos que se repiten
+    en cada mapa, como el título de la barra de colores, solo se dibujan
+    una vez. No se deben modificar.
+
+    """
+
+    segmentos = _segmentos(texto, tamaño)
+
+    ancho = sum(round(fuente.getlength(parte)) for parte, fuente in segmentos)
+    ascenso, descenso = _fuente(tamaño).getmetrics()
+
+    imagen = Image.new("RGBA", (max(ancho, 1), ascenso + descenso), (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(imagen)
+
+    x = 0
+
+    for parte, fuente in segmentos:
+        dibujo.text((x, 0), parte, font=fuente, fill=color)
+        x += round(fuente.getlength(parte))
+
+    # Recortamos el espacio vacío arriba y abajo de las letras,
+    # pues plotly alinea las anotaciones por el texto y no por la fuente.
+    caja = imagen.getbbox()
+
+    if caja is not None:
+        imagen = imagen.crop((0, caja[1], imagen.width, caja[3]))
+
+    if angulo:
+        imagen = imagen.rotate(angulo, expand=True)
+
+    return imagen
+
+
+def _pegar(imagen, texto, x, y, xanchor, yanchor):
+    """
+    Pega la imagen de un texto alineándola como una anotación de plotly.
+
+    """
+
+    ancho, alto = texto.size
+
+    x -= {"left": 0, "center": ancho / 2, "right": ancho}[xanchor]
+    y -= {"top": 0, "middle": alto / 2, "bottom": alto}[yanchor]
+
+    imagen.alpha_composite(texto, (round(x), round(y)))
+
+
+def _capas(geojson, bordes, extras, ancho, alto, margenes, fondo):
+    """
+    Dibuja las capas del mapa que no dependen de los valores: el fondo
+    con el recuadro del mapa, y encima la división política, el marco
+    y el degradado de la barra de colores.
+
+    Las capas se guardan en memoria por entidad y resolución, así que los
+    mapas de varios años de una misma entidad solo dibujan los municipios
+    con casos, las marcas de la barra y las anotaciones.
+
+    Parameters
+    ----------
+    geojson : dict
+        El FeatureCollection de cargar_geometria().
+
+    bordes : tuple
+        Los CVEGEO de los municipios cuya división se dibuja.
+
+    extras : tuple
+        Los CVEGEO con valores que no están en 'bordes'. También
+        se consideran para ajustar la proyección.
+
+    ancho, alto, margenes, fondo
+        Los mismos de dibujar_mapa().
+
+    Returns
+    -------
+    dict
+        Las capas 'fondo' y 'encima' a la escala de SUPERMUESTREO,
+        la función 'a_pixeles' que proyecta un anillo y los
+        extremos de la barra de colores en pixeles de la imagen final.
+
+    """
+
+    llave = (id(geojson), bordes, extras, ancho, alto, margenes, fondo)
+
+    if llave in _CAPAS:
+        # La movemos al final para marcarla como la más reciente.
+        _CAPAS[llave] = _CAPAS.pop(llave)
+        return _CAPAS[llave]
+
+    escala = SUPERMUESTREO
+    arriba, derecha, abajo, izquierda = margenes
+
+    # El área de la gráfica, sin márgenes, en pixeles de la imagen final.
+    area_x, area_y = izquierda, arriba
+    area_ancho, area_alto = ancho - izquierda - derecha, alto - arriba - abajo
+
+    features = {feature["id"]: feature for feature in geojson["features"]}
+
+    # Centramos la proyección en el recuadro de todos los municipios
+    # y la ajustamos al área de la gráfica, como fitbounds='geojson'.
+    puntos = np.concatenate(
+        [
+            anillo
+            for cve in set(bordes) | set(extras)
+            for poligono in _anillos(features[cve])
+            for anillo in poligono
+        ]
+    )
+
+    lon0 = (puntos[:, 0].min() + puntos[:, 0].max()) / 2
+    lat0 = (puntos[:, 1].min() + puntos[:, 1].max()) / 2
+
+    x, y = _proyectar(puntos[:, 0], puntos[:, 1], lon0, lat0)
+
+    factor = min(area_ancho / np.ptp(x), area_alto / np.ptp(y))
+
+    mapa_ancho, mapa_alto = np.ptp(x) * factor, np.ptp(y) * factor
+    mapa_x = area_x + (area_ancho - mapa_ancho) / 2
+    mapa_y = area_y + (area_alto - mapa_alto) / 2
+
+    x_min, y_max = x.min(), y.max()
+
+    def a_pixeles(anillo):
+        px, py = _proyectar(anillo[:, 0], anillo[:, 1], lon0, lat0)
+        px = mapa_x + (px - x_min) * factor
+        py = mapa_y + (y_max - py) * factor
+        return np.column_stack([px, py]) * escala
+
+    tamaño = (ancho * escala, alto * escala)
+    marco = [
+        mapa_x * escala,
+        mapa_y * escala,
+        (mapa_x + mapa_ancho) * escala,
+        (mapa_y + mapa_alto) * escala,
+    ]
+
+    # El fondo de la imagen y el del mapa.
+    base = Image.new("RGBA", tamaño, _hex(fondo) + (255,))
+    ImageDraw.Draw(base).rectangle(marco, fill=(0, 0, 0))
+
+    encima = Image.new("RGBA", tamaño, (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(encima)
+
+    # La división política y el marco del mapa.
+    for cve in bordes:
+        for poligono in _anillos(features[cve]):
+            for anillo in poligono:
+                dibujo.line(
+                    a_pixeles(anillo).ravel().tolist(),
+                    fill=(255, 255, 255),
+                    width=2 * escala,
+                )
+
+    dibujo.rectangle(marco, outline=(255, 255, 255), width=2 * escala)
+
+    # La barra de colores: 30 pixeles de ancho, a lo alto del área
+    # de la gráfica menos 50 pixeles arriba y abajo. El degradado siempre
+    # recorre toda la escala, sin importar los valores.
+    barra_x = area_x + 0.065 * area_ancho + 10
+    barra_y0, barra_y1 = area_y + 50, area_y + area_alto - 50
+
+    gradiente = colores(np.linspace(1, 0, round((barra_y1 - barra_y0) * escala)), 0, 1)
+    gradiente = Image.fromarray(
+        np.repeat(gradiente[:, None, :], 30 * escala, axis=1), "RGB"
+    )
+    encima.paste(gradiente, (round(barra_x * escala), round(barra_y0 * escala)))
+
+    dibujo.rectangle(
+        [
+            barra_x * escala,
+            barra_y0 * escala,
+            (barra_x + 30) * escala,
+            barra_y1 * escala,
+        ],
+        outline=(255, 255, 255),
+        width=2 * escala,
+    )
+
+    if len(_CAPAS) >= MAXIMO_CAPAS:
+        del _CAPAS[next(iter(_CAPAS))]
+
+    # Guardamos también el GeoJSON para que su id() no se pueda reutilizar
+    # mientras la llave siga en memoria.
+    _CAPAS[llave] = {
+        "geojson": geojson,
+        "fondo": base,
+        "encima": encima,
+        "a_pixeles": a_pixeles,
+        "area": (area_x, area_y, area_ancho, area_alto),
+        "barra": (barra_x, barra_y0, barra_y1),
+    }
+
+    return _CAPAS[llave]
+
+
+def dibujar_mapa(
+    geojson,
+    valores,
+    bordes,
+    zmin,
+    zmax,
+    marcas,
+    etiquetas,
+    anotaciones,
+    ancho=2000,
+    alto=2000,
+    margenes=(80, 0, 80, 0),
+    fondo="#3B1C32",
+    tamaño_fuente=28,
+):
+    """
+    Dibuja un mapa choropleth con su barra de colores y sus anotaciones.
+
+    Las capas que no dependen de los valores se dibujan una sola vez
+    por entidad y resolución (ver _capas()), y en cada mapa solo se
+    dibujan los municipios con valores encima de ellas.
+
+    Parameters
+    ----------
+    geojson : dict
+        El FeatureCollection de cargar_geometria(), con el CVEGEO como 'id'.
+
+    valores : pandas.Series
+        El valor de cada municipio con el CVEGEO de cinco dígitos como índice.
+
+    bordes : list
+        Los CVEGEO de los municipios cuya división se dibuja.
+
+    zmin, zmax : float
+        Los extremos de la escala de colores.
+
+    marcas : list
+        Los valores de las marcas de la barra de colores.
+
+    etiquetas : list
+        El texto de cada marca.
+
+    anotaciones : list
+        Las anotaciones como diccionarios de plotly, con 'x', 'y', 'text',
+        'xanchor', 'yanchor' y opcionalmente 'font_size' y 'textangle'.
+
+    ancho, alto : int, optional
+        El tamaño de la imagen en pixeles.
+
+    margenes : tuple, optional
+        Los márgenes superior, derecho, inferior e izquierdo.
+
+    fondo : str, optional
+        El color de fondo de la imagen.
+
+    tamaño_fuente : int, optional
+        El tamaño de las anotaciones que no especifican uno.
+
+    Returns
+    -------
+    PIL.Image.Image
+        La imagen resultante.
+
+    """
+
+    escala = SUPERMUESTREO
+
+    features = {feature["id"]: feature for feature in geojson["features"]}
+    bordes = tuple(cve for cve in bordes if cve in features)
+    extras = tuple(sorted(set(valores.index) - set(bordes)))
+
+    capas = _capas(geojson, bordes, extras, ancho, alto, tuple(margenes), fondo)
+
+    a_pixeles = capas["a_pixeles"]
+    area_x, area_y, area_ancho, area_alto = capas["area"]
+    barra_x, barra_y0, barra_y1 = capas["barra"]
+
+    imagen = capas["fondo"].copy()
+
+    # Cada municipio se rellena con una máscara de su recuadro,
+    # para que sus huecos no borren a los municipios que contienen.
+    for cve, color in zip(valores.index, colores(valores.to_numpy(), zmin, zmax)):
+        poligonos = [
+            [a_pixeles(anillo) for anillo in poligono]
+            for poligono in _anillos(features[cve])
+        ]
+
+        coordenadas = np.concatenate([poligono[0] for poligono in poligonos])
+        x0, y0 = np.floor(coordenadas.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(coordenadas.max(axis=0)).astype(int)
+
+        mascara = Image.new("L", (x1 - x0 + 1, y1 - y0 + 1), 0)
+        pincel = ImageDraw.Draw(mascara)
+
+        for poligono in poligonos:
+            for numero, anillo in enumerate(poligono):
+                pincel.polygon(
+                    (anillo - (x0, y0)).ravel().tolist(), fill=0 if numero else 255
+                )
+
+        imagen.paste(tuple(color.tolist()) + (255,), (x0, y0), mascara)
+
+    # La división política, el marco y el degradado de la barra van encima.
+    imagen.alpha_composite(capas["encima"])
+
+    dibujo = ImageDraw.Draw(imagen)
+
+    # Las marcas van hacia afuera, del lado derecho, con su etiqueta.
+    for marca, etiqueta in zip(marcas, etiquetas):
+        marca_y = barra_y1 - (marca - zmin) / (zmax - zmin) * (barra_y1 - barra_y0)
+
+        dibujo.line(
+            [
+                ((barra_x + 30) * escala, marca_y * escala),
+                ((barra_x + 40) * escala, marca_y * escala),
+            ],
+            fill=(255, 255, 255),
+            width=3 * escala,
+        )
+
+        _pegar(
+            imagen,
+            _imagen_texto(etiqueta, 24 * escala, (255, 255, 255)),
+            (barra_x + 43) * escala,
+            marca_y * escala,
+            "left",
+            "middle",
+        )
+
+    # Las anotaciones usan coordenadas relativas al área de la gráfica.
+    for anotacion in anotaciones:
+        texto = _imagen_texto(
+            anotacion["text"],
+            anotacion.get("font_size", tamaño_fuente) * escala,
+            (255, 255, 255),
+            -anotacion.get("textangle", 0),
+        )
+
+        _pegar(
+            imagen,
+            texto,
+            (area_x + anotacion["x"] * area_ancho) * escala,
+            (area_y + (1 - anotacion["y"]) * area_alto) * escala,
+            anotacion.get("xanchor", "center"),
+            anotacion.get("yanchor", "middle"),
+        )
+
+    imagen = imagen.convert("RGB").resize((ancho, alto), Image.Resampling.LANCZOS)
+
+    return imagen
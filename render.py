@@ -0,0 +1,555 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from datos import CACHE_DIR
+from perfil import etapa, perfilar
+
+
+# El manifiesto guarda el hash de la especificación de cada imagen generada.
+RUTA_MANIFIESTO = os.path.join(CACHE_DIR, "manifiesto.json")
+
+# Cuando no es None, las figuras se guardan en esta lista en lugar
+# de exportarse inmediatamente.
+_PENDIENTES = None
+
+# Las imágenes que se guardaron directamente, sin pasar por kaleido.
+_DIRECTAS = list()
+
+# Si el navegador de kaleido de este proceso está abierto y si ya
+# registramos su cierre al terminar el proceso.
+_NAVEGADOR_ACTIVO = False
+_CIERRE_REGISTRADO = False
+
+# Los segundos que esperamos a que el navegador exporte una figura de prueba.
+ESPERA_PRUEBA = 30
+
+
+def exportar(fig, ruta):
+    """
+    Exporta la figura como imagen o, si hay un lote de renderizado
+    en curso, la agrega a la lista de figuras pendientes.
+
+    Fuera de un lote, el navegador de kaleido se abre con la primera
+    imagen y se reutiliza para las demás hasta que termina el proceso.
+
+    Parameters
+    ----------
+    fig : plotly.graph_objects.Figure
+        La figura que se desea exportar.
+
+    ruta : str
+        La ruta del archivo resultante.
+
+    """
+
+    if _PENDIENTES is None:
+        iniciar_renderizador()
+
+        with etapa("render.kaleido"):
+            _en_servidor(fig.write_image, ruta)
+    else:
+        with etapa("render.to_json"):
+            _PENDIENTES.append((fig.to_json(), ruta))
+
+
+def exportar_imagen(imagen, ruta):
+    """
+    Guarda una imagen dibujada sin plotly, como las de raster.py.
+
+    A diferencia de las figuras, se guarda inmediatamente aunque haya
+    un lote de renderizado en curso, pues no necesita el navegador.
+
+    Parameters
+    ----------
+    imagen : PIL.Image.Image
+        La imagen que se desea guardar.
+
+    ruta : str
+        La ruta del archivo resultante.
+
+    """
+
+    with etapa("render.pillow"):
+        imagen.save(ruta)
+
+    _DIRECTAS.append(ruta)
+
+
+def _servidor_vivo():
+    """
+    Verifica que el hilo del servidor de kaleido siga corriendo.
+
+    kaleido no expone este estado: si el navegador no pudo abrirse
+    (por ejemplo, porque no está instalado Chrome), el hilo termina
+    pero el servidor sigue marcado como abierto.
+
+    Returns
+    -------
+    bool
+        True si el hilo del servidor está vivo.
+
+    """
+
+    import kaleido
+
+    hilo = getattr(kaleido._global_server, "_thread", None)
+
+    return hilo is not None and hilo.is_alive()
+
+
+def _en_servidor(funcion, *argumentos, espera=None):
+    """
+    Ejecuta una función que usa el navegador de kaleido en un hilo aparte,
+    para no quedarnos esperando si el servidor deja de responder.
+
+    Parameters
+    ----------
+    funcion : callable
+        La función que se desea ejecutar, por ejemplo fig.write_image.
+
+    argumentos : tuple
+        Los argumentos de la función.
+
+    espera : float, optional
+        Los segundos máximos de espera. Por defecto se espera
+        mientras el servidor siga vivo.
+
+    Returns
+    -------
+    object
+        Lo que regresa la función.
+
+    """
+
+    resultado = dict()
+
+    def ejecutar():
+        try:
+            resultado["valor"] = funcion(*argumentos)
+        except BaseException as error:
+            resultado["error"] = error
+
+    hilo = threading.Thread(target=ejecutar, daemon=True)
+    hilo.start()
+
+    limite = None if espera is None else time.monotonic() + espera
+
+    while hilo.is_alive():
+        hilo.join(0.1)
+
+        if not hilo.is_alive():
+            break
+
+        # Si el servidor murió, la tarea nunca recibirá respuesta.
+        if _NAVEGADOR_ACTIVO and not _servidor_vivo():
+            raise RuntimeError("El navegador de kaleido dejó de responder.")
+
+        if limite is not None and time.monotonic() > limite:
+            raise TimeoutError(f"kaleido no respondió en {espera} segundos.")
+
+    if "error" in resultado:
+        raise resultado["error"]
+
+    return resultado.get("valor")
+
+
+def iniciar_renderizador():
+    """
+    Inicia el navegador de kaleido que será reutilizado por todas
+    las exportaciones de este proceso, en lugar de abrir y cerrar
+    uno por cada imagen. Si ya está abierto, no hace nada.
+
+    El servidor se abre en otro hilo, por lo que se verifica con
+    una figura de prueba. Si no responde, se cierra y se lanza
+    el error de kaleido.
+
+    """
+
+    global _NAVEGADOR_ACTIVO, _CIERRE_REGISTRADO
+
+    if _NAVEGADOR_ACTIVO:
+        return
+
+    import kaleido
+
+    kaleido.start_sync_server(silence_warnings=True)
+    _NAVEGADOR_ACTIVO = True
+
+    if not _CIERRE_REGISTRADO:
+        atexit.register(detener_renderizador)
+        _CIERRE_REGISTRADO = True
+
+    if renderizador_sano():
+        return
+
+    detener_renderizador()
+
+    # Sin el servidor, kaleido abre un navegador solo para
+    # la figura de prueba y lanza el error original.
+    _exportar_prueba()
+
+    raise RuntimeError("El navegador de kaleido no respondió.")
+
+
+def detener_renderizador():
+    """
+    Cierra el navegador de kaleido de este proceso, si está abierto.
+
+    """
+
+    global _NAVEGADOR_ACTIVO
+
+    if not _NAVEGADOR_ACTIVO:
+        return
+
+    import kaleido
+
+    kaleido.stop_sync_server(silence_warnings=True)
+    _NAVEGADOR_ACTIVO = False
+
+
+def _exportar_prueba():
+    """
+    Exporta una figura vacía muy pequeña.
+
+    """
+
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    pio.to_image(go.Figure(), format="png", width=10, height=10)
+
+
+def renderizador_sano():
+    """
+    Verifica que el navegador de kaleido responda exportando
+    una figura vacía muy pequeña en menos de ESPERA_PRUEBA segundos.
+
+    Returns
+    -------
+    bool
+        True si la exportación funcionó.
+
+    """
+
+    try:
+        _en_servidor(_exportar_prueba, espera=ESPERA_PRUEBA)
+    except Exception:
+        return False
+
+    return True
+
+
+@perfilar
+def _escribir(spec, ruta):
+    """
+    Convierte la especificación JSON de una figura en imagen.
+    Esta función se ejecuta dentro de los procesos del pool.
+
+    Si la exportación falla y el navegador de kaleido ya no responde,
+    se reinicia y se intenta una vez más.
+
+    Parameters
+    ----------
+    spec : str
+        La figura serializada con fig.to_json().
+
+    ruta : str
+        La ruta del archivo resultante.
+
+    Returns
+    -------
+    str
+        La ruta del archivo resultante.
+
+    """
+
+    import plotly.io as pio
+
+    fig = pio.from_json(spec)
+
+    try:
+        _en_servidor(fig.write_image, ruta)
+    except Exception:
+        if renderizador_sano():
+            raise
+
+        detener_renderizador()
+        iniciar_renderizador()
+
+        _en_servidor(fig.write_image, ruta)
+
+    return ruta
+
+
+def _escribir_lote(lote):
+    """
+    Exporta un lote de figuras con un solo navegador de kaleido.
+    Esta función se ejecuta dentro de los procesos del pool.
+
+    Los procesos del pool terminan sin ejecutar las funciones de atexit,
+    por lo que el navegador se cierra aquí al terminar el lote.
+
+    Parameters
+    ----------
+    lote : list
+        Una lista de tuplas (especificación JSON, ruta).
+
+    Returns
+    -------
+    list
+        Una lista de tuplas (ruta, traceback), con None
+        como traceback si la imagen se exportó correctamente.
+
+    """
+
+    global _NAVEGADOR_ACTIVO
+
+    import kaleido
+
+    # Un proceso creado con fork hereda el estado del servidor del
+    # proceso principal, pero no su hilo.
+    kaleido.stop_sync_server(silence_warnings=True)
+    _NAVEGADOR_ACTIVO = False
+
+    resultados = list()
+
+    try:
+        iniciar_renderizador()
+    except Exception:
+        error = traceback.format_exc()
+        return [(ruta, error) for _, ruta in lote]
+
+    try:
+        for spec, ruta in lote:
+            try:
+                resultados.append((_escribir(spec, ruta), None))
+            except Exception:
+                resultados.append((ruta, traceback.format_exc()))
+    finally:
+        detener_renderizador()
+
+    return resultados
+
+
+def construir(tareas):
+    """
+    Ejecuta las funciones de las gráficas sin exportar las imágenes.
+
+    Parameters
+    ----------
+    tareas : list
+        Una lista de tuplas (función, argumentos), por ejemplo
+        [(script.tendencia, (2025,))].
+
+    Returns
+    -------
+    tuple
+        Una lista de tuplas (especificación JSON, ruta) con las figuras
+        construidas y un diccionario con los errores de cada gráfica.
+
+    """
+
+    global _PENDIENTES
+
+    errores = dict()
+    _PENDIENTES = list()
+
+    try:
+        for funcion, argumentos in tareas:
+            try:
+                funcion(*argumentos)
+            except Exception:
+                nombre = f"{funcion.__name__}{tuple(argumentos)}"
+                errores[nombre] = traceback.format_exc()
+    finally:
+        pendientes = _PENDIENTES
+        _PENDIENTES = None
+
+    return pendientes, errores
+
+
+def _cargar_manifiesto():
+    """
+    Lee el manifiesto con el hash de la especificación
+    de cada imagen generada anteriormente.
+
+    Returns
+    -------
+    dict
+        Un diccionario con la ruta de cada imagen como llave.
+
+    """
+
+    if not os.path.exists(RUTA_MANIFIESTO):
+        return dict()
+
+    with open(RUTA_MANIFIESTO, "r", encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def _guardar_manifiesto(manifiesto):
+    """
+    Guarda el manifiesto de las imágenes generadas.
+
+    Parameters
+    ----------
+    manifiesto : dict
+        Un diccionario con la ruta de cada imagen como llave.
+
+    """
+
+    os.makedirs(os.path.dirname(RUTA_MANIFIESTO), exist_ok=True)
+
+    with open(RUTA_MANIFIESTO, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=4, sort_keys=True)
+
+
+def renderizar(tareas, jobs=1, forzar=False):
+    """
+    Ejecuta las funciones de las gráficas en el proceso principal
+    y reparte la exportación de las imágenes entre varios procesos.
+
+    Cada proceso inicia un solo navegador de kaleido que reutiliza
+    para todas sus imágenes. Un error en una gráfica no detiene
+    el resto del lote.
+
+    La especificación de cada figura ya contiene los datos, las
+    poblaciones y la geometría que usa, por lo que si su hash es igual
+    al registrado en el manifiesto y la imagen existe, no se vuelve
+    a exportar.
+
+    Parameters
+    ----------
+    tareas : list
+        Una lista de tuplas (función, argumentos), por ejemplo
+        [(script.tendencia, (2025,))].
+
+    jobs : int, optional
+        El número de procesos que exportarán las imágenes.
+
+    forzar : bool, optional
+        Si es True, se exportan todas las imágenes aunque no hayan cambiado.
+
+    Returns
+    -------
+    tuple
+        La lista de imágenes generadas, la lista de imágenes omitidas
+        y un diccionario con el nombre de cada gráfica o archivo
+        que falló y el traceback de su error.
+
+    """
+
+    # Primero construimos todas las figuras. Las imágenes que no usan
+    # plotly se guardan durante este paso.
+    directas = len(_DIRECTAS)
+    pendientes, errores = construir(tareas)
+
+    manifiesto = _cargar_manifiesto()
+
+    hashes = dict()
+    por_exportar = list()
+    omitidas = list()
+
+    for spec, ruta in pendientes:
+        hashes[ruta] = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+        if not forzar and manifiesto.get(ruta) == hashes[ruta] and os.path.exists(ruta):
+            omitidas.append(ruta)
+        else:
+            por_exportar.append((spec, ruta))
+
+    generadas = _DIRECTAS[directas:]
+
+    # Con un solo proceso no vale la pena crear el pool.
+    if jobs <= 1:
+        # Solo cerramos el navegador si lo abrimos aquí.
+        iniciado = bool(por_exportar) and not _NAVEGADOR_ACTIVO
+
+        if iniciado:
+            iniciar_renderizador()
+
+        try:
+            for spec, ruta in por_exportar:
+                try:
+                    generadas.append(_escribir(spec, ruta))
+                except Exception:
+                    errores[ruta] = traceback.format_exc()
+        finally:
+            if iniciado:
+                detener_renderizador()
+    else:
+        # Cada proceso recibe un solo lote para abrir y cerrar su navegador
+        # una sola vez. Las imágenes se reparten de forma intercalada.
+        lotes = [por_exportar[i::jobs] for i in range(jobs)]
+        lotes = [lote for lote in lotes if lote]
+
+        with ProcessPoolExecutor(max_workers=max(len(lotes), 1)) as pool:
+            futuros = {pool.submit(_escribir_lote, lote): lote for lote in lotes}
+
+            for futuro in as_completed(futuros):
+                try:
+                    resultados = futuro.result()
+                except Exception:
+                    error = traceback.format_exc()
+                    resultados = [(ruta, error) for _, ruta in futuros[futuro]]
+
+                for ruta, error in resultados:
+                    if error is None:
+                        generadas.append(ruta)
+                    else:
+                        errores[ruta] = error
+
+    # Solo registramos las imágenes que se exportaron correctamente.
+    for ruta in generadas:
+        if ruta in hashes:
+            manifiesto[ruta] = hashes[ruta]
+
+    _guardar_manifiesto(manifiesto)
+
+    return generadas, omitidas, errores
+
+
+def tareas_completas(años, entidades=None, motor="plotly"):
+    """
+    Regresa la lista de tareas para generar todas las gráficas
+    nacionales y estatales de los años especificados.
+
+    Parameters
+    ----------
+    años : list
+        Los años que se desean graficar.
+
+    entidades : list, optional
+        Las entidades que se desean graficar. Por defecto
+        se grafican todas las entidades con casos confirmados.
+
+    motor : str, optional
+        El motor con el que se dibujan los mapas estatales: 'plotly' o 'raster'.
+
+    Returns
+    -------
+    list
+        Una lista de tuplas (función, argumentos).
+
+    """
+
+    import estatal
+    import script
+
+    tareas = list()
+
+    for año in años:
+        tareas.append((script.tsas_edad_sexo, (año,)))
+        tareas.append((script.evolucion_casos, (año,)))
+        tareas.append((script.tendencia, (año,)))
+        tareas.append((script.crear_tabla_absolutos, (año,)))
+        tareas.extend(estatal.tareas_estatales(año, entidades, motor))
+
+    return tareas
@@ -0,0 +1,596 @@
+"""
+Interfaz de línea de comandos para generar las gráficas y consultar los datos.
+
+Los módulos se importan dentro de cada comando. Los comandos de datos
+(conteos y tasas) solo cargan pandas y nunca importan plotly ni kaleido,
+por lo que se pueden ejecutar rápidamente desde cron o scripts de shell.
+
+Ejemplos:
+    python sarampion.py graficas --años 2020-2025 --jobs 4
+    python sarampion.py grafica tendencia --año 2020 --hasta 2025
+    python sarampion.py grafica tendencia --año 2025 --estimar-retraso
+    python sarampion.py estado 8 --años 2025
+    python sarampion.py conteos --años 2025 --por ENTIDAD_RES --filtro DIAGNOSTICO=1
+    python sarampion.py tasas --año 2025 --entidad 8 --formato csv --salida tasas.csv
+    python sarampion.py ingerir 2025 ./descargas/2025.csv
+    python sarampion.py ingerir-zip ./descargas/datos_abiertos.zip
+    python sarampion.py versiones guardar 2025 ./descargas/2025.csv
+    python sarampion.py versiones listar 2025
+    python sarampion.py cumulos --año 2025 --espacio-tiempo --jobs 4
+
+"""
+
+import argparse
+import sys
+
+
+# Las gráficas individuales, con el módulo y la función que las genera.
+GRAFICAS = {
+    "tasas-edad": ("script", "tsas_edad_sexo"),
+    "evolucion": ("script", "evolucion_casos"),
+    "tendencia": ("script", "tendencia"),
+    "tabla": ("script", "crear_tabla_absolutos"),
+    "mapa": ("estatal", "crear_mapa"),
+    "mapa-nacional": ("estatal", "crear_mapa_nacional"),
+    "tabla-estatal": ("estatal", "crear_tabla_absolutos"),
+}
+
+# Las gráficas que necesitan una entidad.
+GRAFICAS_ESTATALES = {"mapa", "tabla-estatal"}
+
+
+def _años(texto):
+    """
+    Convierte un año o un rango de años como '2020-2025' en una lista.
+
+    Parameters
+    ----------
+    texto : str
+        El año o el rango de años.
+
+    Returns
+    -------
+    list
+        Los años, incluyendo ambos extremos del rango.
+
+    """
+
+    if "-" in texto:
+        inicio, fin = texto.split("-")
+        return list(range(int(inicio), int(fin) + 1))
+
+    return [int(texto)]
+
+
+def _filtro(texto):
+    """
+    Convierte un filtro como 'DIAGNOSTICO=1' o 'ENTIDAD_RES=8,9'
+    en una tupla (dimensión, valores).
+
+    Parameters
+    ----------
+    texto : str
+        El filtro en formato DIMENSION=VALOR[,VALOR...].
+
+    Returns
+    -------
+    tuple
+        El nombre de la dimensión y la lista de valores aceptados.
+
+    """
+
+    dimension, valores = texto.split("=")
+
+    return dimension, [int(valor) for valor in valores.split(",")]
+
+
+def _aplanar(listas):
+    """
+    Une las listas de años que regresa _años() en una sola lista ordenada.
+
+    Parameters
+    ----------
+    listas : list
+        Una lista de listas de años.
+
+    Returns
+    -------
+    list
+        Los años sin repetir, ordenados.
+
+    """
+
+    return sorted({año for lista in listas for año in lista})
+
+
+def _escribir_tabla(df, formato, salida):
+    """
+    Imprime o guarda un DataFrame en el formato especificado.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        La tabla que se desea escribir.
+
+    formato : str
+        'texto', 'csv' o 'json'.
+
+    salida : str
+        La ruta del archivo resultante. Si es None, se usa la salida estándar.
+
+    """
+
+    if formato == "csv":
+        texto = df.to_csv()
+    elif formato == "json":
+        texto = df.reset_index().to_json(orient="records", force_ascii=False)
+    else:
+        texto = df.to_string()
+
+    if salida is None:
+        sys.stdout.write(texto.rstrip("\n") + "\n")
+    else:
+        with open(salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+
+
+def _renderizar(tareas, args):
+    """
+    Exporta las gráficas de las tareas e imprime el resumen.
+
+    Parameters
+    ----------
+    tareas : list
+        Una lista de tuplas (función, argumentos).
+
+    args : argparse.Namespace
+        Los argumentos del comando, con 'jobs' y 'forzar'.
+
+    """
+
+    import render
+
+    generadas, omitidas, errores = render.renderizar(tareas, args.jobs, args.forzar)
+
+    for nombre, error in errores.items():
+        print(f"Error en {nombre}:\n{error}")
+
+    for ruta in generadas:
+        print(f"Generada: {ruta}")
+
+    print(
+        f"{len(generadas)} imágenes generadas, {len(omitidas)} sin cambios "
+        f"y {len(errores)} errores."
+    )
+
+    return 1 if errores else 0
+
+
+def comando_graficas(args):
+    """
+    Genera todas las gráficas nacionales y estatales de los años especificados.
+
+    """
+
+    import render
+
+    return _renderizar(
+        render.tareas_completas(_aplanar(args.años), args.entidades, args.motor),
+        args,
+    )
+
+
+def comando_grafica(args):
+    """
+    Genera una sola gráfica.
+
+    """
+
+    import importlib
+
+    modulo, nombre = GRAFICAS[args.nombre]
+    funcion = getattr(importlib.import_module(modulo), nombre)
+
+    if args.nombre in GRAFICAS_ESTATALES:
+        if args.entidad is None:
+            raise SystemExit(f"La gráfica '{args.nombre}' necesita --entidad.")
+
+        argumentos = (args.año, args.entidad)
+
+        if args.nombre == "mapa":
+            argumentos += (None, args.motor)
+    elif args.nombre == "tendencia":
+        argumentos = (args.año, args.hasta, args.estimar_retraso)
+    else:
+        argumentos = (args.año,)
+
+    return _renderizar([(funcion, argumentos)], args)
+
+
+def comando_estado(args):
+    """
+    Genera el mapa y la tabla de una entidad.
+
+    """
+
+    import estatal
+
+    tareas = list()
+
+    for año in _aplanar(args.años):
+        tareas.extend(estatal.tareas_estatales(año, [args.entidad], args.motor))
+
+    return _renderizar(tareas, args)
+
+
+def comando_conteos(args):
+    """
+    Imprime o exporta los registros agrupados por las dimensiones del cubo.
+
+    Si todas las columnas pedidas tienen índice de bitmaps, los conteos
+    se obtienen de ahí sin leer el cubo ni los registros.
+
+    """
+
+    import pandas as pd
+
+    import bitmaps
+
+    años = _aplanar(args.años)
+    filtros = dict(args.filtro)
+
+    # Con varios años siempre separamos los totales por año.
+    por = list(args.por)
+
+    if len(años) > 1 and "AÑO" not in por:
+        por.insert(0, "AÑO")
+
+    columnas = [columna for columna in por if columna != "AÑO"]
+
+    if len(columnas) <= 1 and set(columnas + list(filtros)) <= set(bitmaps.COLUMNAS):
+        resultado = _conteos_bitmaps(años, por, columnas, filtros)
+    else:
+        from cubo import cargar_cubo, consultar
+
+        cubo = pd.concat([cargar_cubo(año) for año in años], ignore_index=True)
+        resultado = consultar(cubo, por or None, **filtros)
+
+    if not por:
+        resultado = pd.DataFrame({"total": [resultado]})
+    else:
+        resultado = resultado.to_frame("total")
+
+    _escribir_tabla(resultado, args.formato, args.salida)
+
+    return 0
+
+
+def _conteos_bitmaps(años, por, columnas, filtros):
+    """
+    Cuenta los registros con los índices de bitmaps de cada año.
+
+    Parameters
+    ----------
+    años : list
+        Los años que se desean contar.
+
+    por : list
+        Las columnas por las que se agrupa, incluyendo 'AÑO' si aplica.
+
+    columnas : list
+        Las columnas de 'por' sin 'AÑO'. Tiene a lo mucho un elemento.
+
+    filtros : dict
+        Las columnas y la lista de valores aceptados.
+
+    Returns
+    -------
+    pandas.Series or int
+        Los totales agrupados como los regresa cubo.consultar().
+
+    """
+
+    import pandas as pd
+
+    import bitmaps
+
+    if not por:
+        return sum(bitmaps.contar(año, **filtros) for año in años)
+
+    if not columnas:
+        return pd.Series(
+            [bitmaps.contar(año, **filtros) for año in años],
+            index=pd.Index(años, name="AÑO"),
+        )
+
+    resultado = pd.concat(
+        {año: bitmaps.contar_por(año, columnas[0], **filtros) for año in años},
+        names=["AÑO"],
+    )
+
+    if "AÑO" not in por:
+        resultado = resultado.droplevel("AÑO")
+
+    return resultado
+
+
+def comando_tasas(args):
+    """
+    Imprime o exporta los casos confirmados y la tasa de incidencia
+    por municipio.
+
+    """
+
+    from estatal import tasas_municipios
+
+    df = tasas_municipios(args.año, args.entidad)
+
+    if args.limite:
+        df = df.head(args.limite)
+
+    _escribir_tabla(df, args.formato, args.salida)
+
+    return 0
+
+
+def comando_cumulos(args):
+    """
+    Imprime o exporta los cúmulos de casos del escaneo espacial
+    o espacio-temporal.
+
+    """
+
+    from cumulos import escaneo_espacial, escaneo_espacio_tiempo
+
+    opciones = dict(
+        entidades=args.entidades,
+        fraccion=args.fraccion,
+        simulaciones=args.simulaciones,
+        jobs=args.jobs,
+        semilla=args.semilla,
+    )
+
+    if args.espacio_tiempo:
+        df = escaneo_espacio_tiempo(
+            args.año, semanas=args.semanas, prospectivo=args.prospectivo, **opciones
+        )
+
+        for columna in ["inicio", "fin"]:
+            df[columna] = df[columna].dt.strftime("%Y-%m-%d")
+    else:
+        df = escaneo_espacial(args.año, **opciones)
+
+    # En texto y CSV la lista de municipios va separada por espacios.
+    if args.formato != "json":
+        df["cves"] = df["cves"].map(lambda cves: " ".join(map(str, cves)))
+
+    _escribir_tabla(df, args.formato, args.salida)
+
+    return 0
+
+
+def comando_ingerir(args):
+    """
+    Incorpora una nueva publicación de la SSA aplicando solo los cambios.
+
+    """
+
+    from ingesta import ingerir
+
+    cambios = ingerir(args.año, args.ruta)
+
+    print(
+        f"{cambios['insertados']:,} registros insertados, "
+        f"{cambios['actualizados']:,} actualizados y "
+        f"{cambios['eliminados']:,} eliminados."
+    )
+
+    return 0
+
+
+def comando_ingerir_zip(args):
+    """
+    Divide el archivo nacional comprimido en una partición por año.
+
+    """
+
+    from ingesta import TAMAÑO_BLOQUE, ingerir_zip
+
+    años = ingerir_zip(args.ruta, args.tamaño or TAMAÑO_BLOQUE)
+
+    for año, registros in años.items():
+        print(f"{año}: {registros:,} registros")
+
+    return 0
+
+
+def comando_versiones(args):
+    """
+    Guarda una publicación de la SSA o lista las publicaciones guardadas.
+
+    """
+
+    import versiones
+
+    if args.accion == "guardar":
+        ruta = versiones.guardar(args.año, args.ruta, args.fecha)
+        print(f"Publicación guardada: {ruta}")
+    else:
+        for publicacion in versiones.publicaciones(args.año):
+            print(
+                f"{publicacion['fecha']}: {publicacion['registros']:,} registros, "
+                f"cambios en {', '.join(publicacion['columnas']) or 'ninguna columna'}"
+            )
+
+    return 0
+
+
+def crear_parser():
+    """
+    Crea el parser con todos los subcomandos.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        El parser de la línea de comandos.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="sarampion", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument(
+        "--perfil",
+        default=None,
+        help="Prefijo de los archivos JSON y Chrome Trace con el perfil de la ejecución.",
+    )
+
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    # Estos argumentos son comunes a los comandos que exportan imágenes.
+    exportacion = argparse.ArgumentParser(add_help=False)
+    exportacion.add_argument("--jobs", type=int, default=1)
+    exportacion.add_argument("--forzar", action="store_true")
+    exportacion.add_argument(
+        "--motor",
+        choices=["plotly", "raster"],
+        default="plotly",
+        help="Dibuja los mapas estatales con plotly o directamente con Pillow (ver raster.py).",
+    )
+
+    # Estos argumentos son comunes a los comandos de datos.
+    salida = argparse.ArgumentParser(add_help=False)
+    salida.add_argument("--formato", choices=["texto", "csv", "json"], default="texto")
+    salida.add_argument("--salida", default=None)
+
+    sub = subparsers.add_parser(
+        "graficas", parents=[exportacion], help="Genera todas las gráficas."
+    )
+    sub.add_argument("--años", type=_años, nargs="+", default=[[2025]])
+    sub.add_argument("--entidades", type=int, nargs="+", default=None)
+    sub.set_defaults(funcion=comando_graficas)
+
+    sub = subparsers.add_parser(
+        "grafica", parents=[exportacion], help="Genera una sola gráfica."
+    )
+    sub.add_argument("nombre", choices=list(GRAFICAS))
+    sub.add_argument("--año", type=int, default=2025)
+    sub.add_argument("--hasta", type=int, default=None)
+    sub.add_argument("--entidad", type=int, default=None)
+    sub.add_argument(
+        "--estimar-retraso",
+        action="store_true",
+        help="Agrega a la tendencia los casos que faltan por reportar (ver nowcast.py).",
+    )
+    sub.set_defaults(funcion=comando_grafica)
+
+    sub = subparsers.add_parser(
+        "estado",
+        parents=[exportacion],
+        help="Genera el mapa y la tabla de una entidad.",
+    )
+    sub.add_argument("entidad", type=int)
+    sub.add_argument("--años", type=_años, nargs="+", default=[[2025]])
+    sub.set_defaults(funcion=comando_estado)
+
+    sub = subparsers.add_parser(
+        "conteos", parents=[salida], help="Cuenta los registros por dimensión."
+    )
+    sub.add_argument("--años", type=_años, nargs="+", default=[[2025]])
+    sub.add_argument("--por", nargs="*", default=[])
+    sub.add_argument("--filtro", type=_filtro, nargs="*", default=[])
+    sub.set_defaults(funcion=comando_conteos)
+
+    sub = subparsers.add_parser(
+        "tasas", parents=[salida], help="Calcula la tasa de incidencia por municipio."
+    )
+    sub.add_argument("--año", type=int, default=2025)
+    sub.add_argument("--entidad", type=int, default=None)
+    sub.add_argument("--limite", type=int, default=None)
+    sub.set_defaults(funcion=comando_tasas)
+
+    sub = subparsers.add_parser(
+        "cumulos",
+        parents=[salida],
+        help="Busca cúmulos de casos con la estadística de escaneo de Kulldorff.",
+    )
+    sub.add_argument("--año", type=int, default=2025)
+    sub.add_argument("--entidades", type=int, nargs="+", default=None)
+    sub.add_argument("--fraccion", type=float, default=0.5)
+    sub.add_argument("--simulaciones", type=int, default=999)
+    sub.add_argument("--jobs", type=int, default=1)
+    sub.add_argument("--semilla", type=int, default=0)
+    sub.add_argument(
+        "--espacio-tiempo",
+        action="store_true",
+        help="Busca brotes en municipios y semanas en lugar de solo en el espacio.",
+    )
+    sub.add_argument("--semanas", type=int, default=None)
+    sub.add_argument("--prospectivo", action="store_true")
+    sub.set_defaults(funcion=comando_cumulos)
+
+    sub = subparsers.add_parser(
+        "ingerir", help="Incorpora una nueva publicación de la SSA."
+    )
+    sub.add_argument("año", type=int)
+    sub.add_argument("ruta", nargs="?", default=None)
+    sub.set_defaults(funcion=comando_ingerir)
+
+    sub = subparsers.add_parser(
+        "ingerir-zip",
+        help="Divide el archivo nacional comprimido en una partición por año.",
+    )
+    sub.add_argument("ruta")
+    sub.add_argument("--tamaño", type=int, default=None)
+    sub.set_defaults(funcion=comando_ingerir_zip)
+
+    sub = subparsers.add_parser(
+        "versiones", help="Guarda o lista las publicaciones históricas de la SSA."
+    )
+    acciones = sub.add_subparsers(dest="accion", required=True)
+
+    accion = acciones.add_parser("guardar")
+    accion.add_argument("año", type=int)
+    accion.add_argument("ruta", nargs="?", default=None)
+    accion.add_argument("--fecha", default=None)
+    accion.set_defaults(funcion=comando_versiones)
+
+    accion = acciones.add_parser("listar")
+    accion.add_argument("año", type=int)
+    accion.set_defaults(funcion=comando_versiones)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Ejecuta el subcomando especificado en la línea de comandos.
+
+    Parameters
+    ----------
+    argv : list, optional
+        Los argumentos. Por defecto se usan los de sys.argv.
+
+    Returns
+    -------
+    int
+        El código de salida.
+
+    """
+
+    args = crear_parser().parse_args(argv)
+
+    if args.perfil:
+        import perfil
+
+        perfil.activar()
+
+    try:
+        return args.funcion(args)
+    finally:
+        if args.perfil:
+            perfil.finalizar(args.perfil)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,14 @@ import json
 
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
 
+from conteos import curva_semanal, flujo, histograma_edad_sexo, sankey
+from cubo import cargar_cubo, consultar
+from datos import fecha_fuente
+from perfil import perfilar
+from poblacion import poblacion_quinquenal, tabla_municipios
+from render import exportar
 
-# La fecha del corte de los datos.
-FECHA_FUENTE = "12/06/2025"
 
 # Estos colores serán la paleta para todas las gráficas.
 PLOT_COLOR = "#1A1A1D"
@@ -34,6 +37,13 @@ EDADES = [
     (85, 120),
 ]
 
+# Las etapas del diagrama sankey y el nombre de cada uno de sus códigos.
+ETAPAS = {
+    "VACUNACION": {1: "Vacunados", 2: "No vacunados"},
+    "COMPLICACIONES": {1: "Con complicaciones*", 2: "Sin complicaciones"},
+    "DEFUNCION": {1: "Defunción", 2: "Sin defunción"},
+}
+
 MESES = {
     1: "Ene.",
     2: "Feb.",
@@ -50,6 +60,7 @@ MESES = {
 }
 
 
+@perfilar
 def tsas_edad_sexo(año):
     """
     Crea una gráfica de dispersión mostrando las distintas
@@ -62,38 +73,23 @@ def tsas_edad_sexo(año):
 
     """
 
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv(f"./data/{año}.csv")
+    import plotly.graph_objects as go
+
+    # Cargamos el cubo de conteos del año especificado.
+    cubo = cargar_cubo(año)
 
     # Seleccionamos los casos confirmados de sarampión.
-    df = df[df["DIAGNOSTICO"] == 1]
-
-    data = list()
-
-    # Iteramos sobre todos nuestros grupos de edad y contamos los registros
-    # para cada uno.
-    for a, b in EDADES:
-        temp_mujeres = df[(df["SEXO"] == 1) & (df["EDAD_ANOS"].between(a, b))]
-        temp_hombres = df[(df["SEXO"] == 2) & (df["EDAD_ANOS"].between(a, b))]
-
-        # Para el último grupo de edad le agregamos el símbolo de 'mayor o igual que'
-        # para que coincida con el índice de los datasets de población quinquenal.
-        data.append(
-            {
-                "edad": f"{a}-{b}" if a < 85 else "≥85",
-                "mujeres": len(temp_mujeres),
-                "hombres": len(temp_hombres),
-            }
-        )
+    df = cubo[cubo["DIAGNOSTICO"] == 1]
 
-    # Creamos un DataFrame con los conteos de cada grupo de edad y sexo.
-    final = pd.DataFrame.from_records(data, index="edad")
+    # Para el último grupo de edad le agregamos el símbolo de 'mayor o igual que'
+    # para que coincida con el índice de los datasets de población quinquenal.
+    etiquetas = [f"{a}-{b}" if a < 85 else "≥85" for a, b in EDADES]
 
-    # Cargamos el dataset de la población de hombres por grupos de edad.
-    hombres_pop = pd.read_csv("./assets/poblacion_quinquenal/hombres.csv", index_col=0)
+    # Contamos los registros de cada grupo de edad y sexo en una sola pasada.
+    final = histograma_edad_sexo(df, EDADES, etiquetas, pesos="total")
 
-    # Seleccionamos la población del año que nos interesa.
-    hombres_pop = hombres_pop["2025"]
+    # Seleccionamos la población de hombres por grupos de edad del año que nos interesa.
+    hombres_pop = poblacion_quinquenal("hombres", año)
 
     # Agregamos la columna de población de hombres.
     final["poblacion_hombres"] = hombres_pop
@@ -101,11 +97,8 @@ def tsas_edad_sexo(año):
     # Calculamos la tasa por cada 100k hombres para cada grupo de edad.
     final["tasa_hombres"] = final["hombres"] / final["poblacion_hombres"] * 100000
 
-    # Cargamos el dataset de la población de mujeres por grupos de edad.
-    mujeres_pop = pd.read_csv("./assets/poblacion_quinquenal/mujeres.csv", index_col=0)
-
-    # Seleccionamos la población del año que nos interesa.
-    mujeres_pop = mujeres_pop["2025"]
+    # Seleccionamos la población de mujeres por grupos de edad del año que nos interesa.
+    mujeres_pop = poblacion_quinquenal("mujeres", año)
 
     # Agregamos la columna de población de mujeres.
     final["poblacion_mujeres"] = mujeres_pop
@@ -207,7 +200,7 @@ def tsas_edad_sexo(año):
                 yref="paper",
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(año)})",
             ),
             dict(
                 x=0.5,
@@ -231,10 +224,11 @@ def tsas_edad_sexo(año):
     )
 
     # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./tasas_edad_{año}.png")
+    exportar(fig, f"./tasas_edad_{año}.png")
 
 
-def tendencia(año):
+@perfilar
+def tendencia(año, hasta=None, estimar_retraso=False):
     """
     Genera una gráfica de barras con la incidencia
     semanal de sarampión.
@@ -244,30 +238,52 @@ def tendencia(año):
     año : int
         El año que se desea graficar.
 
+    hasta : int, optional
+        Si se especifica, se grafica la serie continua
+        desde 'año' hasta este año.
+
+    estimar_retraso : bool, optional
+        Si es True, se agregan los casos confirmados que se estima faltan
+        por reportar en las últimas semanas, con su intervalo del 90%.
+        Requiere las publicaciones guardadas con versiones.guardar().
+
     """
 
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv("./data/2025.csv")
+    import plotly.graph_objects as go
 
-    # Quitamos las fechas inválidas.
-    df = df[df["FECHA_DIAGNOSTICO"] != "9999-99-99"]
+    if hasta is None:
+        hasta = año
 
-    # Convertimos el resto de fechas a datetime.
-    df["FECHA_DIAGNOSTICO"] = pd.to_datetime(df["FECHA_DIAGNOSTICO"], dayfirst=True)
+    # Sumamos los registros por semana y diagnóstico de todos los años.
+    # Las semanas van de lunes a viernes y las fechas inválidas se omiten.
+    df = curva_semanal(range(año, hasta + 1))
 
-    df = df.pivot_table(
-        index="FECHA_DIAGNOSTICO",
-        columns="DIAGNOSTICO",
-        values="ID_REGISTRO",
-        aggfunc="count",
-        fill_value=0,
-    )
+    # Nos aseguramos de tener las columnas de casos confirmados (1)
+    # y descartados (3), aunque algún periodo no tenga registros.
+    df = df.reindex(columns=[1, 3], fill_value=0)
+
+    # Estimamos los casos confirmados que faltan por reportar
+    # en las semanas que todavía no están completas.
+    if estimar_retraso:
+        from nowcast import nowcast
 
-    # Haremos un remuestreo semanal de lunes a viernes.
-    df = df.resample("W-MON", label="left", closed="left").sum()
+        estimacion = nowcast(hasta).loc[0].reindex(df.index)
+        estimacion = estimacion[estimacion["completitud"] < 1]
 
     # Creamos las etiquetas para nuestro eje horizontal.
-    etiquetas = [f"{item.day:02}<br>{MESES[item.month]}" for item in df.index]
+    # Cuando son varios años, solo marcamos el inicio de cada trimestre.
+    if hasta == año:
+        marcas = df.index
+        etiquetas = [f"{item.day:02}<br>{MESES[item.month]}" for item in df.index]
+        periodo = f"durante el {año}"
+    else:
+        marcas = [
+            item
+            for i, item in enumerate(df.index)
+            if item.month % 3 == 1 and (i == 0 or df.index[i - 1].month != item.month)
+        ]
+        etiquetas = [f"{MESES[item.month]}<br>{item.year}" for item in marcas]
+        periodo = f"entre {año} y {hasta}"
 
     # Crearemos una gráfica de barras apilada.
     # Una será de casos confirmados y otra de casos descartados.
@@ -283,6 +299,39 @@ def tendencia(año):
         )
     )
 
+    # Los casos estimados se apilan sobre los confirmados y su intervalo
+    # se dibuja como barras de error sobre el total estimado.
+    if estimar_retraso:
+        fig.add_trace(
+            go.Bar(
+                x=estimacion.index,
+                y=estimacion["estimados"] - estimacion["observados"],
+                name=f"Estimado por rezago en la notificación<br>(total estimado: <b>{estimacion['estimados'].sum() - estimacion['observados'].sum():,.0f}</b>)",
+                marker_line_width=0,
+                marker_color="#ffcc80",
+            )
+        )
+
+        fig.add_trace(
+            go.Scatter(
+                x=estimacion.index,
+                y=estimacion["estimados"],
+                mode="markers",
+                marker_size=1,
+                marker_color="#FFFFFF",
+                error_y=dict(
+                    type="data",
+                    symmetric=False,
+                    array=estimacion["superior"] - estimacion["estimados"],
+                    arrayminus=estimacion["estimados"] - estimacion["inferior"],
+                    color="#FFFFFF",
+                    thickness=2,
+                    width=8,
+                ),
+                showlegend=False,
+            )
+        )
+
     fig.add_trace(
         go.Bar(
             x=df.index,
@@ -294,7 +343,7 @@ def tendencia(año):
     )
 
     fig.update_xaxes(
-        tickvals=df.index,
+        tickvals=marcas,
         ticktext=etiquetas,
         ticks="outside",
         ticklen=10,
@@ -338,7 +387,7 @@ def tendencia(año):
         font_family="Lato",
         font_color="#FFFFFF",
         font_size=24,
-        title_text="Evolución de la incidencia de <b>sarampión</b> en México durante el 2025",
+        title_text=f"Evolución de la incidencia de <b>sarampión</b> en México {periodo}",
         title_x=0.5,
         title_y=0.965,
         margin_t=80,
@@ -356,7 +405,7 @@ def tendencia(año):
                 yref="paper",
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(hasta)})",
             ),
             dict(
                 x=0.5,
@@ -380,9 +429,46 @@ def tendencia(año):
     )
 
     # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./tendencia_{año}.png")
+    nombre = f"tendencia_{año}" if hasta == año else f"tendencia_{año}_{hasta}"
+
+    if estimar_retraso:
+        nombre += "_estimado"
 
+    exportar(fig, f"./{nombre}.png")
+
+
+def color_etapa(ruta):
+    """
+    Regresa el color del nodo del diagrama sankey
+    que corresponde a la ruta especificada.
 
+    Parameters
+    ----------
+    ruta : tuple
+        Los códigos de vacunación, complicaciones y defunción del nodo.
+
+    Returns
+    -------
+    str
+        El color en formato hexadecimal.
+
+    """
+
+    if len(ruta) == 0:
+        return "#1de9b6"
+    elif len(ruta) == 1:
+        return {1: "#42a5f5", 2: "#ffca28"}.get(ruta[0], "#bdbdbd")
+    elif len(ruta) == 2:
+        return {1: "#ba68c8", 2: "#fb8c00"}.get(ruta[0], "#bdbdbd")
+
+    # Resaltamos las defunciones de personas no vacunadas con complicaciones.
+    if ruta == (2, 1, 1):
+        return "#d32f2f"
+
+    return "#bdbdbd"
+
+
+@perfilar
 def evolucion_casos(año):
     """
     Genera un diagrama sankey con la evolución
@@ -395,95 +481,60 @@ def evolucion_casos(año):
 
     """
 
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv("./data/2025.csv")
+    import plotly.graph_objects as go
+
+    # Cargamos el cubo de conteos del año especificado.
+    cubo = cargar_cubo(año)
 
     # Seleccionamos los casos confirmados de sarampión.
-    df = df[df["DIAGNOSTICO"] == 1]
+    cubo = cubo[cubo["DIAGNOSTICO"] == 1]
+
+    # Calculamos los totales de todas las etapas con una sola agrupación.
+    # Los códigos distintos a sí (1) y no (2) aparecerán como 'Se desconoce'.
+    nodos = flujo(
+        cubo,
+        list(ETAPAS),
+        valores={columna: [1, 2] for columna in ETAPAS},
+        pesos="total",
+    )
 
-    # Vamos a calcular los totales para cada etapa.
-    casos_confirmados = len(df)
+    # De la última etapa solo mostramos las defunciones.
+    nodos = nodos[nodos["ruta"].map(lambda ruta: len(ruta) < 3 or ruta[2] != 2)]
 
-    vac_si = df[df["VACUNACION"] == 1]
-    vac_no = df[df["VACUNACION"] == 2]
+    fuente, destino, valor = sankey(nodos)
 
-    vac_si_comp_si = vac_si[vac_si["COMPLICACIONES"] == 1]
-    vac_si_comp_no = vac_si[vac_si["COMPLICACIONES"] == 2]
+    # Este valor es para evitar que los nodos de las defunciones no aparezcan.
+    epsilon = 30
 
-    vac_no_comp_si = vac_no[vac_no["COMPLICACIONES"] == 1]
-    vac_no_comp_no = vac_no[vac_no["COMPLICACIONES"] == 2]
+    valor = [
+        total + epsilon if len(nodos["ruta"].iloc[i]) == 3 else total
+        for i, total in zip(destino, valor)
+    ]
 
-    def_vac_si_comp_si = vac_si_comp_si[vac_si_comp_si["DEFUNCION"] == 1]
-    def_vac_si_comp_no = vac_si_comp_no[vac_si_comp_no["DEFUNCION"] == 1]
+    etiquetas = list()
 
-    def_vac_no_comp_si = vac_no_comp_si[vac_no_comp_si["DEFUNCION"] == 1]
-    def_vac_no_comp_no = vac_no_comp_no[vac_no_comp_no["DEFUNCION"] == 1]
+    for ruta, total in zip(nodos["ruta"], nodos["total"]):
+        if ruta:
+            nombre = ETAPAS[list(ETAPAS)[len(ruta) - 1]].get(ruta[-1], "Se desconoce")
+        else:
+            nombre = "Casos confirmados"
 
-    # Este valor es para evitar que los nodos de las defunciones no aparezcan.
-    epsilon = 30
+        etiquetas.append(f"<b>{nombre}</b><br>({total:,})")
 
-    # Un diagrama sankey requiere especificar todos los valores.
-    # Para nuestros 11 nodos ya tenemos los cálculos ya hechos.
     fig = go.Figure()
 
     fig.add_trace(
         go.Sankey(
             node=dict(
                 pad=50,
-                label=[
-                    f"<b>Casos confirmados</b><br>({casos_confirmados:,})",
-                    f"<b>Vacunados</b><br>({len(vac_si):,})",
-                    f"<b>No vacunados</b><br>({len(vac_no):,})",
-                    f"<b>Con complicaciones*</b><br>({len(vac_si_comp_si):,})",
-                    f"<b>Sin complicaciones</b><br>({len(vac_si_comp_no):,})",
-                    f"<b>Con complicaciones*</b><br>({len(vac_no_comp_si):,})",
-                    f"<b>Sin complicaciones</b><br>({len(vac_no_comp_no):,})",
-                    f"<b>Defunción</b><br>({len(def_vac_si_comp_si):,})",
-                    f"<b>Defunción</b><br>({len(def_vac_si_comp_no):,})",
-                    f"<b>Defunción</b><br>({len(def_vac_no_comp_si):,})",
-                    f"<b>Defunción</b><br>({len(def_vac_no_comp_no):,})",
-                ],
-                color=[
-                    "#1de9b6",
-                    "#42a5f5",
-                    "#ffca28",
-                    "#ba68c8",
-                    "#ba68c8",
-                    "#fb8c00",
-                    "#fb8c00",
-                    "#bdbdbd",
-                    "#bdbdbd",
-                    "#d32f2f",
-                    "#bdbdbd",
-                ],
+                label=etiquetas,
+                color=[color_etapa(ruta) for ruta in nodos["ruta"]],
             ),
             link=dict(
                 color="hsla(0, 100, 100, 0.25)",
-                source=[
-                    0,
-                    0,
-                    1,
-                    1,
-                    2,
-                    2,
-                    3,
-                    4,
-                    5,
-                    6,
-                ],
-                target=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
-                value=[
-                    len(vac_si),
-                    len(vac_no),
-                    len(vac_si_comp_si),
-                    len(vac_si_comp_no),
-                    len(vac_no_comp_si),
-                    len(vac_no_comp_no),
-                    len(def_vac_si_comp_si) + epsilon,
-                    len(def_vac_si_comp_no) + epsilon,
-                    len(def_vac_no_comp_si) + epsilon,
-                    len(def_vac_no_comp_no) + epsilon,
-                ],
+                source=fuente,
+                target=destino,
+                value=valor,
             ),
         )
     )
@@ -521,7 +572,7 @@ def evolucion_casos(año):
                 yref="paper",
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(año)})",
             ),
             dict(
                 x=0.5,
@@ -545,9 +596,10 @@ def evolucion_casos(año):
     )
 
     # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./evolucion_{año}.png")
+    exportar(fig, f"./evolucion_{año}.png")
 
 
+@perfilar
 def crear_tabla_absolutos(año):
     """
     Genera una tabla con la incidencia de sarampión
@@ -560,39 +612,16 @@ def crear_tabla_absolutos(año):
 
     """
 
-    # Cargamos el dataset de población por municipio.
-    pop = pd.read_csv("./assets/poblacion.csv", dtype={"CVE": str}, index_col=0)
-
-    # Renombramos algunos estados a sus nombres más comunes.
-    pop["Entidad"] = pop["Entidad"].replace(
-        {
-            "Coahuila de Zaragoza": "Coahuila",
-            "México": "Estado de México",
-            "Michoacán de Ocampo": "Michoacán",
-            "Veracruz de Ignacio de la Llave": "Veracruz",
-        }
-    )
-
-    # Seleccionamos las columnas de nuestro interés.
-    pop = pop[["Entidad", "Municipio", str(año)]]
-
-    # Renombramos las columnas.
-    pop.columns = ["entidad", "municipio", "poblacion"]
+    import plotly.graph_objects as go
 
-    # Cargamos el dataset del año especificado.
-    df = pd.read_csv(
-        f"./data/{año}.csv",
-        dtype={"ENTIDAD_RES": str, "MUNICIPIO_RES": str},
-    )
+    # Cargamos la población por municipio del año especificado.
+    pop = tabla_municipios(año)
 
-    # Creamos el CVE para entidad y municipio.
-    df["CVE"] = df["ENTIDAD_RES"].str.zfill(2) + df["MUNICIPIO_RES"].str.zfill(3)
-
-    # Seleccionamos los casos confirmados de sarampión.
-    df = df[df["DIAGNOSTICO"] == 1]
+    # Cargamos el cubo de conteos del año especificado.
+    cubo = cargar_cubo(año)
 
-    # Contamos los registros por municipio.
-    df = df["CVE"].value_counts().to_frame("total")
+    # Contamos los casos confirmados por municipio.
+    df = consultar(cubo, ["CVE"], DIAGNOSTICO=1).to_frame("total")
 
     # Unimos los DataFrames.
     df = df.join(pop)
@@ -604,7 +633,8 @@ def crear_tabla_absolutos(año):
     df["nombre"] = df["municipio"] + ", " + df["entidad"]
 
     # Ordenamos los resultados por número de registros de mayor a menor.
-    df.sort_values("total", ascending=False, inplace=True)
+    # Los empates quedan ordenados por CVE.
+    df = df.sort_index().sort_values("total", ascending=False, kind="stable")
 
     # Reseteamos el índice y solo escogemos el top 30.
     df.reset_index(inplace=True)
@@ -667,7 +697,7 @@ def crear_tabla_absolutos(año):
                 y=0.02,
                 xanchor="left",
                 yanchor="top",
-                text=f"Fuente: SSA ({FECHA_FUENTE})",
+                text=f"Fuente: SSA ({fecha_fuente(año)})",
             ),
             dict(
                 x=0.57,
@@ -683,7 +713,7 @@ def crear_tabla_absolutos(año):
     )
 
     # Nombramos el archivo resultante con los parámetros de la función.
-    fig.write_image(f"./tabla_{año}.png")
+    exportar(fig, f"./tabla_{año}.png")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,393 @@
+"""
+Almacén de las publicaciones históricas de la SSA.
+
+Cada publicación se guarda como diferencias por columna contra la
+anterior: los ID_REGISTRO agregados y eliminados y, por cada columna,
+solo los registros cuyo valor cambió. La primera publicación de cada
+año se guarda completa.
+
+Uso: python sarampion.py versiones guardar 2025 ./descargas/2025.csv
+     python sarampion.py versiones listar 2025
+
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datos import ESQUEMA, desde_texto, fecha_publicacion
+from perfil import perfilar
+
+
+# Carpeta donde se guardan las publicaciones. A diferencia de CACHE_DIR,
+# su contenido no se puede volver a generar a partir de ./data.
+VERSIONES_DIR = "./versiones"
+
+# Las columnas originales del archivo, sin la llave.
+COLUMNAS = [columna for columna in ESQUEMA if columna != "ID_REGISTRO"]
+
+
+def _carpeta(año, fecha=None):
+    """
+    Regresa la carpeta de un año o de una de sus publicaciones.
+
+    """
+
+    if fecha is None:
+        return os.path.join(VERSIONES_DIR, str(año))
+
+    return os.path.join(VERSIONES_DIR, str(año), fecha)
+
+
+def publicaciones(año):
+    """
+    Regresa la lista de publicaciones guardadas del año especificado.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    Returns
+    -------
+    list
+        Un diccionario por publicación, de la más antigua a la más reciente,
+        con su fecha, su número de registros y las columnas que cambiaron.
+
+    """
+
+    ruta = os.path.join(_carpeta(año), "publicaciones.json")
+
+    if not os.path.exists(ruta):
+        return list()
+
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def _leer_publicacion(ruta):
+    """
+    Lee un archivo de la SSA con los tipos del esquema,
+    ordenado por ID_REGISTRO.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo CSV.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Las columnas originales con el ID_REGISTRO como índice.
+
+    """
+
+    df = desde_texto(pd.read_csv(ruta, dtype=str))
+
+    return df.set_index("ID_REGISTRO")[COLUMNAS].sort_index()
+
+
+def _distintos(anterior, nuevo):
+    """
+    Compara dos arreglos tratando los valores nulos como iguales entre sí.
+
+    Returns
+    -------
+    numpy.ndarray
+        True donde los valores son distintos.
+
+    """
+
+    anterior = pd.Series(anterior)
+    nuevo = pd.Series(nuevo)
+
+    nulos = anterior.isna().to_numpy() & nuevo.isna().to_numpy()
+    distintos = (anterior != nuevo).to_numpy(dtype=bool, na_value=True)
+
+    return distintos & ~nulos
+
+
+@perfilar
+def guardar(año, ruta=None, fecha=None):
+    """
+    Guarda una publicación como diferencias contra la publicación anterior.
+
+    Parameters
+    ----------
+    año : int
+        El año al que pertenece el archivo.
+
+    ruta : str, optional
+        La ruta del archivo. Por defecto, ./data/{año}.csv.
+
+    fecha : str, optional
+        La fecha de la publicación en formato AAAA-MM-DD. Por defecto
+        se obtiene de la columna FECHA_ACTUALIZACION.
+
+    Returns
+    -------
+    str
+        La fecha con la que se guardó la publicación.
+
+    """
+
+    if ruta is None:
+        ruta = f"./data/{año}.csv"
+
+    df = _leer_publicacion(ruta)
+
+    if fecha is None:
+        fecha = fecha_publicacion(df["FECHA_ACTUALIZACION"]).strftime("%Y-%m-%d")
+
+    lista = publicaciones(año)
+
+    if lista and fecha <= lista[-1]["fecha"]:
+        raise ValueError(
+            f"La publicación {fecha} no es posterior a la última guardada "
+            f"({lista[-1]['fecha']})."
+        )
+
+    # La publicación anterior completa se guarda aparte para no tener
+    # que reconstruirla cada vez que llega una nueva.
+    ruta_ultima = os.path.join(_carpeta(año), "ultima.pkl")
+
+    if lista:
+        anterior = pd.read_pickle(ruta_ultima)
+    else:
+        anterior = df.iloc[:0]
+
+    carpeta = _carpeta(año, fecha)
+    os.makedirs(carpeta, exist_ok=True)
+
+    ids_anteriores = anterior.index.to_numpy()
+    ids = df.index.to_numpy()
+
+    pd.to_pickle(
+        {
+            "agregados": np.setdiff1d(ids, ids_anteriores),
+            "eliminados": np.setdiff1d(ids_anteriores, ids),
+        },
+        os.path.join(carpeta, "_ids.pkl"),
+    )
+
+    # Para cada registro, su posición en la publicación anterior.
+    posiciones = np.searchsorted(ids_anteriores, ids)
+    posiciones = np.minimum(posiciones, max(len(ids_anteriores) - 1, 0))
+    existentes = (
+        ids_anteriores[posiciones] == ids
+        if len(ids_anteriores)
+        else np.zeros(len(ids), dtype=bool)
+    )
+
+    cambiadas = list()
+
+    for columna in COLUMNAS:
+        valores = df[columna]
+
+        # Los registros nuevos siempre cuentan como cambios.
+        cambios = ~existentes
+
+        if existentes.any():
+            cambios[existentes] = _distintos(
+                anterior[columna].to_numpy()[posiciones[existentes]],
+                valores.to_numpy()[existentes],
+            )
+
+        if not cambios.any():
+            continue
+
+        cambiadas.append(columna)
+
+        delta = valores[cambios]
+
+        # Si todos los registros de la publicación recibieron el mismo valor,
+        # como FECHA_ACTUALIZACION, basta con guardar ese valor.
+        if cambios.all() and len(delta) and delta.nunique(dropna=False) == 1:
+            delta = {"constante": delta.iloc[0], "dtype": str(delta.dtype)}
+
+        pd.to_pickle(delta, os.path.join(carpeta, f"{columna}.pkl"))
+
+    df.to_pickle(ruta_ultima)
+
+    lista.append({"fecha": fecha, "registros": len(df), "columnas": cambiadas})
+
+    with open(
+        os.path.join(_carpeta(año), "publicaciones.json"), "w", encoding="utf-8"
+    ) as archivo:
+        json.dump(lista, archivo, indent=4)
+
+    return fecha
+
+
+def _aplicar(serie, ids, delta):
+    """
+    Aplica las diferencias de una columna a su valor en la publicación anterior.
+
+    Parameters
+    ----------
+    serie : pandas.Series
+        Los valores de la publicación anterior, con el ID_REGISTRO como índice.
+
+    ids : numpy.ndarray
+        Los ID_REGISTRO de la publicación nueva, ordenados.
+
+    delta : pandas.Series or dict
+        Los valores que cambiaron o el valor constante de la columna.
+        None si la columna no cambió.
+
+    Returns
+    -------
+    pandas.Series
+        Los valores de la publicación nueva.
+
+    """
+
+    if isinstance(delta, dict):
+        return pd.Series(
+            np.repeat(delta["constante"], len(ids)),
+            index=pd.Index(ids, name="ID_REGISTRO"),
+            name=serie.name,
+        ).astype(delta["dtype"])
+
+    # Los registros nuevos toman cualquier valor aquí,
+    # pues siempre vienen incluidos en las diferencias.
+    anteriores = serie.index.to_numpy()
+    posiciones = np.searchsorted(anteriores, ids)
+    posiciones = np.minimum(posiciones, max(len(anteriores) - 1, 0))
+
+    if len(anteriores):
+        valores = serie.array.take(posiciones)
+    else:
+        valores = delta.array.take(np.zeros(len(ids), dtype=np.int64))
+
+    resultado = pd.Series(valores, index=pd.Index(ids, name="ID_REGISTRO"))
+
+    if delta is not None and len(delta):
+        resultado.iloc[np.searchsorted(ids, delta.index.to_numpy())] = delta.array
+
+    return resultado.rename(serie.name)
+
+
+def _recorrer(año, columnas):
+    """
+    Reconstruye las columnas especificadas en cada publicación,
+    de la más antigua a la más reciente.
+
+    Solo se leen los archivos de las columnas solicitadas.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    columnas : list
+        Las columnas que se desean reconstruir.
+
+    Yields
+    ------
+    tuple
+        La fecha de la publicación y un DataFrame con las columnas,
+        con el ID_REGISTRO como índice.
+
+    """
+
+    ids = np.array([], dtype=np.int32)
+    series = {
+        columna: pd.Series([], dtype=_dtype(columna), name=columna)
+        for columna in columnas
+    }
+
+    for publicacion in publicaciones(año):
+        carpeta = _carpeta(año, publicacion["fecha"])
+
+        cambios_ids = pd.read_pickle(os.path.join(carpeta, "_ids.pkl"))
+
+        ids = np.union1d(
+            np.setdiff1d(ids, cambios_ids["eliminados"]), cambios_ids["agregados"]
+        ).astype(np.int32)
+
+        for columna in columnas:
+            delta = None
+
+            if columna in publicacion["columnas"]:
+                delta = pd.read_pickle(os.path.join(carpeta, f"{columna}.pkl"))
+
+            series[columna] = _aplicar(series[columna], ids, delta)
+
+        yield publicacion["fecha"], pd.DataFrame(
+            series, index=pd.Index(ids, name="ID_REGISTRO")
+        )
+
+
+def _dtype(columna):
+    """
+    Regresa el tipo de pandas con el que se guarda una columna.
+
+    """
+
+    return "datetime64[us]" if ESQUEMA[columna] == "fecha" else ESQUEMA[columna]
+
+
+def reconstruir(año, fecha, columnas=None):
+    """
+    Regresa los registros tal como estaban publicados en la fecha especificada.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    fecha : str
+        La fecha en formato AAAA-MM-DD. Se usa la publicación más
+        reciente que no sea posterior a esta fecha.
+
+    columnas : list, optional
+        Las columnas que se desean reconstruir. Por defecto, todas.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los registros con el ID_REGISTRO como índice, ordenados.
+
+    """
+
+    if columnas is None:
+        columnas = COLUMNAS
+
+    resultado = None
+
+    for fecha_publicacion, df in _recorrer(año, columnas):
+        if fecha_publicacion > fecha:
+            break
+
+        resultado = df
+
+    if resultado is None:
+        raise KeyError(f"No hay publicaciones de {año} hasta el {fecha}.")
+
+    return resultado
+
+
+def historial(año, columna):
+    """
+    Regresa el valor de una columna en todas las publicaciones.
+
+    Parameters
+    ----------
+    año : int
+        El año que nos interesa.
+
+    columna : str
+        La columna que se desea consultar, por ejemplo 'DIAGNOSTICO'.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Una fila por ID_REGISTRO y una columna por fecha de publicación.
+        Los registros que no existían en una publicación quedan vacíos.
+
+    """
+
+    return pd.DataFrame({fecha: df[columna] for fecha, df in _recorrer(año, [columna])})